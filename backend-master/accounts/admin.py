@@ -2,19 +2,106 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
+from django.contrib import messages
+from django.contrib.admin import helpers
 from django.contrib.auth import get_user_model
-from .models import Invite
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from . import bulk
+from .export import export_response
+from .models import Invite, InviteEmail
+from .search import search_users
 
 User = get_user_model()
 
+# Users listed by name on the delete confirmation page.
+CONFIRM_LIST_SIZE = 100
+
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_display = ("email", "first_name", "last_name", "role", "department", "is_active")
     search_fields = ("email", "first_name", "last_name")
     list_filter = ("role", "department", "is_active", "is_staff")
+    actions = ["export_csv", "export_ndjson", "deactivate_users", "reactivate_users", "delete_users"]
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the token index instead of icontains scans over three columns.
+        if not search_term.strip():
+            return queryset, False
+        return search_users(search_term, queryset), False
+
+    @admin.action(description="Export selected users (CSV)")
+    def export_csv(self, request, queryset):
+        return export_response(queryset, "csv")
+
+    @admin.action(description="Export selected users (NDJSON)")
+    def export_ndjson(self, request, queryset):
+        return export_response(queryset, "ndjson")
+
+    def _bulk(self, request, queryset, action):
+        ids = list(queryset.exclude(pk=request.user.pk).values_list("pk", flat=True))
+        if len(ids) < queryset.count():
+            self.message_user(request, "Your own account was left out.", messages.WARNING)
+        return bulk.apply(action, ids)
+
+    @admin.action(description="Deactivate selected users", permissions=["change"])
+    def deactivate_users(self, request, queryset):
+        counts = self._bulk(request, queryset, bulk.DEACTIVATE)
+        self.message_user(request, f"Deactivated {counts['users']} users.", messages.SUCCESS)
+
+    @admin.action(description="Reactivate selected users", permissions=["change"])
+    def reactivate_users(self, request, queryset):
+        counts = bulk.apply(bulk.REACTIVATE, queryset.values_list("pk", flat=True))
+        self.message_user(request, f"Reactivated {counts['users']} users.", messages.SUCCESS)
+
+    @admin.action(description="Delete selected users and their invites", permissions=["delete"])
+    def delete_users(self, request, queryset):
+        # Like the built-in delete_selected: an intermediate page, then the
+        # same POST again with "post" set.
+        if request.POST.get("post"):
+            counts = self._bulk(request, queryset, bulk.DELETE)
+            self.message_user(
+                request, f"Deleted {counts['users']} users and {counts['invites']} invites.", messages.SUCCESS
+            )
+            return None
+
+        ids = list(queryset.values_list("pk", flat=True))
+        others = queryset.exclude(pk=request.user.pk)
+        count = len(ids) - (request.user.pk in ids)
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "Delete users",
+            "opts": self.model._meta,
+            "media": self.media,
+            "ids": ids,
+            "count": count,
+            "own_account": request.user.pk in ids,
+            "users": others.only("email").order_by("email")[:CONFIRM_LIST_SIZE],
+            "more": max(count - CONFIRM_LIST_SIZE, 0),
+            "invites": Invite.objects.filter(created_by__in=others).count(),
+            "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+        }
+        request.current_app = self.admin_site.name
+        return TemplateResponse(request, "admin/accounts/user/delete_users_confirmation.html", context)
 
 @admin.register(Invite)
 class InviteAdmin(admin.ModelAdmin):
-    list_display = ("email", "department", "created_by", "is_accepted", "created_at")
+    list_display = ("email", "department", "created_by", "is_accepted", "created_at", "expires_at")
     search_fields = ("email",)
     list_filter = ("is_accepted", "department")
+
+
+@admin.register(InviteEmail)
+class InviteEmailAdmin(admin.ModelAdmin):
+    list_display = ("to_email", "status", "attempts", "available_at", "created_at", "finished_at")
+    search_fields = ("to_email",)
+    list_filter = ("status",)
+    readonly_fields = ("invite_id", "to_email", "attempts", "last_error", "created_at", "finished_at")
+    actions = ["retry_now"]
+
+    @admin.action(description="Retry selected emails now", permissions=["change"])
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status=InviteEmail.Status.SENT).update(
+            status=InviteEmail.Status.PENDING, attempts=0, available_at=timezone.now(), finished_at=None
+        )
+        self.message_user(request, f"Queued {count} emails for delivery.", messages.SUCCESS)
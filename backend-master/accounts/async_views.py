@@ -0,0 +1,160 @@
+"""
+Async variants of the hot accounts endpoints, for ASGI deployments.
+
+DRF views are synchronous, so under an ASGI server each of them occupies a
+thread for the whole request. These are plain Django async views: the JWT is
+checked by ``ClaimsJWTAuthentication.aauthenticate`` (user cache, then the
+async ORM), reads use the async ORM, and password hashing is awaited on the
+shared hashing pool, so one event loop can keep many requests in flight.
+Writes that go through serializers and signal handlers run in a worker thread
+via ``sync_to_async``.
+
+They return the same payloads and status codes as their DRF counterparts in
+``accounts.views`` and are wired in by ``accounts.urls`` when
+``settings.ACCOUNTS_ASYNC_VIEWS`` is on.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from rest_framework.exceptions import APIException, NotAuthenticated, ParseError, PermissionDenied
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from . import invites, login, versioning
+from .authentication import ClaimsJWTAuthentication
+from .models import RowVersionConflict
+from .pagination import KeysetPagination
+from .projection import projection
+from .serializers import AcceptInviteSerializer, InviteCreateSerializer, UserListSerializer, UserMeSerializer
+from .views import ADMIN_ROLES, filter_users
+
+User = get_user_model()
+
+authenticator = ClaimsJWTAuthentication()
+
+
+def api_response(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def error_response(exc):
+    """Render a DRF ``APIException`` the way DRF's exception handler would."""
+    detail = exc.detail if isinstance(exc.detail, (dict, list)) else {"detail": exc.detail}
+    response = api_response(detail, status=exc.status_code)
+    if exc.status_code == 401:
+        response["WWW-Authenticate"] = f'{jwt_settings.AUTH_HEADER_TYPES[0]} realm="api"'
+    if getattr(exc, "wait", None) is not None:
+        response["Retry-After"] = "%d" % exc.wait
+    return response
+
+
+def api_view(methods, auth=True, admin=False):
+    """
+    Wrap an ``async def view(request, user)``: method check, CSRF exemption
+    (JWT only, like DRF views), authentication, admin check and errors.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @require_http_methods(methods)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                user = None
+                if auth:
+                    result = await authenticator.aauthenticate(request)
+                    if result is None:
+                        raise NotAuthenticated
+                    user = result[0]
+                    if admin and getattr(user, "role", "") not in ADMIN_ROLES:
+                        raise PermissionDenied
+                return await view(request, user, *args, **kwargs)
+            except APIException as exc:
+                return error_response(exc)
+        return wrapper
+    return decorator
+
+
+def parse_body(request):
+    if not request.body:
+        return {}
+    try:
+        return json.loads(request.body)
+    except ValueError as exc:
+        raise ParseError(f"JSON parse error - {exc}")
+
+
+@api_view(["GET", "PATCH"])
+async def me(request, user):
+    if request.method == "PATCH":
+        # Compared against the current row, not the (possibly cached) authenticated user.
+        user = await User.objects.aget(pk=user.pk)
+        serializer = UserMeSerializer(user, data=parse_body(request), partial=True)
+        if not await sync_to_async(serializer.is_valid)():
+            return api_response(serializer.errors, status=400)
+        me = projection(UserMeSerializer)
+        try:
+            await sync_to_async(serializer.save)()
+        except RowVersionConflict:
+            current = await User.objects.aget(pk=user.pk)
+            return api_response({
+                "detail": "The profile was changed since it was loaded.",
+                "code": "row_version_conflict",
+                "current": me.compile_instance(me.field_names)(current),
+            }, status=409)
+        validators = await versioning.avalidators([versioning.user_key(user.pk)], request.get_full_path())
+        return versioning.apply_validators(api_response(me.compile_instance(me.field_names)(user)), *validators)
+
+    etag, last_modified = await versioning.avalidators([versioning.user_key(user.pk)], request.get_full_path())
+    response = versioning.not_modified(request, etag, last_modified)
+    if response is None:
+        # Read after the validators, so the body is at least as new as the ETag.
+        me = projection(UserMeSerializer)
+        user = await User.objects.aget(pk=user.pk)
+        response = api_response(me.compile_instance(me.select(request.GET))(user))
+    return versioning.apply_validators(response, etag, last_modified)
+
+
+@api_view(["GET"], admin=True)
+async def users_list(request, user):
+    etag, last_modified = await versioning.avalidators([versioning.USERS], request.get_full_path())
+    response = versioning.not_modified(request, etag, last_modified)
+    if response is not None:
+        return versioning.apply_validators(response, etag, last_modified)
+
+    users = projection(UserListSerializer)
+    names = users.select(request.GET)
+    extract = users.compile(names)
+    rows = (
+        filter_users(User.objects.all(), request.GET)
+        .order_by("-date_joined", "-id")
+        .values(*users.sources(names, extra=("id", "date_joined")))
+    )
+    paginator = KeysetPagination()
+    page = await paginator.apaginate_queryset(rows, request)
+    if page is None:
+        data = [extract(row) async for row in rows]
+    else:
+        data = {"next": paginator.get_next_link(), "results": [extract(row) for row in page]}
+    return versioning.apply_validators(api_response(data), etag, last_modified)
+
+
+@api_view(["POST"], admin=True)
+async def invite_create(request, user):
+    serializer = InviteCreateSerializer(data=parse_body(request))
+    if not serializer.is_valid():
+        return api_response(serializer.errors, status=400)
+    invite = await sync_to_async(invites.issue)(created_by=user, **serializer.validated_data)
+    return api_response(InviteCreateSerializer(invite).data, status=201)
+
+
+@api_view(["POST"], auth=False)
+async def invite_accept(request, user):
+    serializer = AcceptInviteSerializer(data=parse_body(request))
+    if not await sync_to_async(serializer.is_valid)():
+        return api_response(serializer.errors, status=400)
+    password_hash = await login.ahash_password(serializer.validated_data["password"])
+    await sync_to_async(serializer.save)(password_hash=password_hash)
+    return api_response(serializer.data, status=201)
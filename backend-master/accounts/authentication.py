@@ -0,0 +1,336 @@
+"""
+JWT authentication that resolves ``request.user`` from a cache.
+
+``JWTAuthentication`` runs one ``SELECT`` on the user table per request just to
+rebuild ``request.user``. ``CachedJWTAuthentication`` keeps recently seen users
+in a bounded in-process LRU (with TTL) and, optionally, in a shared Django cache
+so that hot endpoints do no user queries in steady state. Entries are dropped
+from ``accounts.signals`` whenever a user is saved or deleted; other processes
+see a change at the latest after ``TTL`` seconds.
+
+``ClaimsJWTAuthentication`` (the default) goes further for tokens carrying the
+claims added by ``accounts.tokens``: it only checks the token's version against
+``token_versions`` and hands out a ``ClaimsUser`` that loads the user lazily.
+Token versions revoke access, so workers keep them only briefly: a version is
+read from ``SHARED_CACHE`` or, without one, from the database, then kept in
+process for ``TOKEN_VERSION_TTL`` seconds. A revocation applies at once in the
+process that made it and within that delay everywhere else.
+
+Configured with ``settings.ACCOUNTS_USER_CACHE``::
+
+    ACCOUNTS_USER_CACHE = {
+        "MAXSIZE": 10000,      # users kept per process
+        "TTL": 30,             # seconds an in-process entry stays valid
+        "SHARED_CACHE": None,  # optional django cache alias, e.g. "default"
+        "SHARED_TTL": 300,
+        "TOKEN_VERSION_TTL": 5,  # seconds a process keeps a token version; 0 disables
+    }
+"""
+import copy
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from core.lru import LRUCache
+
+from . import tokens
+
+DEFAULTS = {
+    "MAXSIZE": 10000,
+    "TTL": 30,
+    "SHARED_CACHE": None,
+    "SHARED_TTL": 300,
+    "TOKEN_VERSION_TTL": 5,
+}
+
+
+class UserCache:
+    key_prefix = "accounts:user:"
+
+    def __init__(self, options=None):
+        self.options = {**DEFAULTS, **(options or {})}
+        self.local = LRUCache(maxsize=self.options["MAXSIZE"], ttl=self.options["TTL"])
+        self.shared_hits = 0
+        self.invalidations = 0
+
+    @property
+    def shared(self):
+        alias = self.options["SHARED_CACHE"]
+        return caches[alias] if alias else None
+
+    def _key(self, user_id):
+        return f"{self.key_prefix}{user_id}"
+
+    def get(self, user_id):
+        user = self.local.get(str(user_id))
+        if user is None and self.shared is not None:
+            user = self.shared.get(self._key(user_id))
+            if user is not None:
+                self.shared_hits += 1
+                self.local.set(str(user_id), user)
+        # Hand out a copy so request code can't mutate the cached instance.
+        return copy.copy(user) if user is not None else None
+
+    def set(self, user):
+        user = copy.copy(user)
+        self.local.set(str(user.pk), user)
+        if self.shared is not None:
+            self.shared.set(self._key(user.pk), user, self.options["SHARED_TTL"])
+
+    async def aget(self, user_id):
+        user = self.local.get(str(user_id))
+        if user is None and self.shared is not None:
+            user = await self.shared.aget(self._key(user_id))
+            if user is not None:
+                self.shared_hits += 1
+                self.local.set(str(user_id), user)
+        return copy.copy(user) if user is not None else None
+
+    async def aset(self, user):
+        user = copy.copy(user)
+        self.local.set(str(user.pk), user)
+        if self.shared is not None:
+            await self.shared.aset(self._key(user.pk), user, self.options["SHARED_TTL"])
+
+    def invalidate(self, user_id):
+        self.invalidations += 1
+        self.local.delete(str(user_id))
+        if self.shared is not None:
+            self.shared.delete(self._key(user_id))
+
+    def clear(self):
+        self.local.clear()
+
+    def stats(self):
+        return {
+            **self.local.stats(),
+            "shared_hits": self.shared_hits,
+            "invalidations": self.invalidations,
+        }
+
+
+user_cache = UserCache(getattr(settings, "ACCOUNTS_USER_CACHE", None))
+
+# Cached for users that no longer exist, so their tokens don't hit the database.
+_DELETED = (None, False)
+
+
+class TokenVersionCache:
+    """
+    user id -> ``(token_version, is_active)``, read with one primary-key query
+    on two columns. Lets ``ClaimsJWTAuthentication`` revoke tokens without
+    loading users.
+
+    States are kept per process for ``TOKEN_VERSION_TTL`` seconds, which is
+    how long a revocation made elsewhere can take to reach this worker (user
+    writes drop the entry in the writing process and in ``SHARED_CACHE`` at
+    once). Past that, they come from ``SHARED_CACHE`` or that query.
+    """
+    key_prefix = "accounts:token_version:"
+
+    def __init__(self, options=None):
+        self.options = {**DEFAULTS, **(options or {})}
+        ttl = self.options["TOKEN_VERSION_TTL"]
+        self.local = LRUCache(maxsize=self.options["MAXSIZE"], ttl=ttl) if ttl else None
+        self.queries = 0
+        self.local_hits = 0
+        self.shared_hits = 0
+
+    @property
+    def shared(self):
+        alias = self.options["SHARED_CACHE"]
+        return caches[alias] if alias else None
+
+    def _key(self, user_id):
+        return f"{self.key_prefix}{user_id}"
+
+    def _query(self, user_id):
+        return get_user_model().objects.filter(pk=user_id).values_list("token_version", "is_active")
+
+    def _local_get(self, user_id):
+        state = self.local.get(str(user_id)) if self.local is not None else None
+        if state is not None:
+            self.local_hits += 1
+        return state
+
+    def _local_set(self, user_id, state):
+        if self.local is not None:
+            self.local.set(str(user_id), state)
+        return state
+
+    def get(self, user_id):
+        state = self._local_get(user_id)
+        if state is not None:
+            return state
+        shared = self.shared
+        if shared is not None:
+            state = shared.get(self._key(user_id))
+            if state is not None:
+                self.shared_hits += 1
+                return self._local_set(user_id, state)
+        self.queries += 1
+        state = self._query(user_id).first() or _DELETED
+        if shared is not None:
+            shared.set(self._key(user_id), state, self.options["SHARED_TTL"])
+        return self._local_set(user_id, state)
+
+    async def aget(self, user_id):
+        state = self._local_get(user_id)
+        if state is not None:
+            return state
+        shared = self.shared
+        if shared is not None:
+            state = await shared.aget(self._key(user_id))
+            if state is not None:
+                self.shared_hits += 1
+                return self._local_set(user_id, state)
+        self.queries += 1
+        state = await self._query(user_id).afirst() or _DELETED
+        if shared is not None:
+            await shared.aset(self._key(user_id), state, self.options["SHARED_TTL"])
+        return self._local_set(user_id, state)
+
+    def invalidate(self, user_id):
+        if self.local is not None:
+            self.local.delete(str(user_id))
+        if self.shared is not None:
+            self.shared.delete(self._key(user_id))
+
+    def clear(self):
+        if self.local is not None:
+            self.local.clear()
+
+    def stats(self):
+        return {"queries": self.queries, "local_hits": self.local_hits, "shared_hits": self.shared_hits}
+
+
+token_versions = TokenVersionCache(getattr(settings, "ACCOUNTS_USER_CACHE", None))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+    def check_user(self, user, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user)
+            return user
+
+        return self.check_user(user, validated_token)
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+
+        user = await user_cache.aget(user_id)
+        if user is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            self.check_user(user, validated_token)
+            await user_cache.aset(user)
+            return user
+
+        return self.check_user(user, validated_token)
+
+    async def aauthenticate(self, request):
+        """
+        ``authenticate`` for plain Django async views (``request`` is an
+        ``HttpRequest``). Token parsing is CPU only; the user comes from the
+        cache or the async ORM.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+
+class ClaimsUser(SimpleLazyObject):
+    """
+    ``request.user`` built from token claims: ``pk``/``id``, ``role`` and
+    ``is_active`` come from the token, anything else loads the real user
+    (through the user cache) on first access.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, claims, load):
+        super().__init__(load)
+        # Bypass LazyObject.__setattr__, which would load the user.
+        self.__dict__["_claims"] = claims
+
+    def __getattr__(self, name):
+        claims = self.__dict__["_claims"]
+        if name in claims:
+            return claims[name]
+        return super().__getattr__(name)
+
+    def __bool__(self):
+        return True
+
+
+class ClaimsJWTAuthentication(CachedJWTAuthentication):
+    """
+    Authenticate from the claims added by ``accounts.tokens``: the token's
+    version is checked against ``token_versions`` and ``request.user`` is a
+    ``ClaimsUser``, so role-gated endpoints don't load the user at all.
+    Tokens without the claims (issued before they existed) and the
+    ``CHECK_REVOKE_TOKEN`` mode fall back to ``CachedJWTAuthentication``.
+    """
+    revoked_message = _("Token has been revoked.")
+
+    def uses_claims(self, validated_token):
+        return tokens.VERSION_CLAIM in validated_token and not api_settings.CHECK_REVOKE_TOKEN
+
+    def get_user(self, validated_token):
+        if not self.uses_claims(validated_token):
+            return super().get_user(validated_token)
+
+        user_id = self.user_model._meta.pk.to_python(self.get_user_id(validated_token))
+        if not tokens.is_current(validated_token, token_versions.get(user_id)):
+            raise AuthenticationFailed(self.revoked_message, code="token_revoked")
+
+        claims = {
+            "pk": user_id,
+            "id": user_id,
+            "role": validated_token[tokens.ROLE_CLAIM],
+            "is_active": validated_token[tokens.ACTIVE_CLAIM],
+        }
+        return ClaimsUser(claims, lambda: CachedJWTAuthentication.get_user(self, validated_token))
+
+    async def aget_user(self, validated_token):
+        # Async views read the user without a thread to lazily load it in, so
+        # they get the full user; the version check still applies.
+        if self.uses_claims(validated_token):
+            user_id = self.user_model._meta.pk.to_python(self.get_user_id(validated_token))
+            if not tokens.is_current(validated_token, await token_versions.aget(user_id)):
+                raise AuthenticationFailed(self.revoked_message, code="token_revoked")
+        return await super().aget_user(validated_token)
@@ -0,0 +1,138 @@
+"""
+Set-based bulk deactivation and deletion of users.
+
+``Model.delete()`` runs Django's deletion collector: it loads every related
+row into Python, sends a pair of signals per object and deletes in many small
+statements. Offboarding hundreds of users that way is slow and chatty. Here
+users are processed in chunks, each in its own transaction, and every
+relation is handled with one statement per chunk:
+
+* rows that cascade (invites the users created, search tokens, report
+  snapshots, admin log entries) are deleted with a single ``DELETE ... IN``;
+* nullable references (property owners) are cleared with a single ``UPDATE``;
+* many-to-many rows (groups, permissions) are deleted from the through table.
+
+Deactivation is a soft delete: one ``UPDATE`` of ``is_active`` (and of
+``token_version``, which revokes the users' tokens) per chunk.
+
+The per-row signals are skipped, so their work is done once per chunk
+instead: the JWT user cache is invalidated, the version counters bumped,
+the changes appended to the change log and, if indexed fields changed, the
+users reindexed for search (deleted users' tokens go with the cascade).
+Deletions also send ``accounts.signals.users_bulk_deleted``, so other apps
+can update what they derived from the users (``rentals`` re-keys the
+rollups of the properties whose owner was cleared).
+"""
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.db.models import F
+
+from core.db import write_lock
+
+from . import changelog, search, versioning
+from .authentication import token_versions, user_cache
+from .models import Invite
+from .signals import users_bulk_deleted
+
+User = get_user_model()
+
+DEFAULT_CHUNK_SIZE = 500
+
+DEACTIVATE = "deactivate"
+REACTIVATE = "reactivate"
+DELETE = "delete"
+ACTIONS = (DEACTIVATE, REACTIVATE, DELETE)
+
+
+def _chunks(ids, size):
+    ids = list(dict.fromkeys(ids))
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _after_write(ids, op, fields=()):
+    # What the User post_save/post_delete receivers would have done per row;
+    # ``fields`` are the columns an upsert changed.
+    def invalidate():
+        for pk in ids:
+            user_cache.invalidate(pk)
+            token_versions.invalidate(pk)
+
+    invalidate()
+    transaction.on_commit(invalidate)
+    versioning.bump(versioning.USERS, *(versioning.user_key(pk) for pk in ids))
+    changelog.record(changelog.USER, op, ids)
+    if op == changelog.UPSERT and search.INDEXED_FIELDS.intersection(fields):
+        search.index_users(ids)
+
+
+def _raw_delete(queryset):
+    return queryset._raw_delete(queryset.db)
+
+
+def _delete_related(ids):
+    """Handle every relation pointing at the users ``ids``; return deleted invites."""
+    invites = 0
+    for relation in User._meta.related_objects:
+        field = relation.field
+        related = relation.related_model._base_manager.filter(**{f"{field.name}__in": ids})
+        if relation.on_delete is models.SET_NULL:
+            related.update(**{field.name: None})
+        elif relation.on_delete is models.CASCADE and not relation.related_model._meta.related_objects:
+            # Nothing depends on these rows, so they can go without the collector.
+            if relation.related_model is Invite:
+                changelog.record(changelog.INVITE, changelog.DELETE, related.values_list("pk", flat=True))
+                invites = _raw_delete(related)
+            else:
+                _raw_delete(related)
+        else:
+            related.delete()
+    for field in User._meta.many_to_many:
+        through = field.remote_field.through
+        _raw_delete(through._base_manager.filter(**{f"{field.m2m_field_name()}__in": ids}))
+    return invites
+
+
+def set_active(ids, active, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Activate or deactivate users; return how many actually changed."""
+    changed = 0
+    for chunk in _chunks(ids, chunk_size):
+        with transaction.atomic():
+            write_lock(User)
+            updated = list(
+                User.objects.filter(pk__in=chunk, is_active=not active).values_list("pk", flat=True)
+            )
+            if not updated:
+                continue
+            # Bumping token_version revokes the users' outstanding JWTs (see accounts.tokens).
+            changed += User.objects.filter(pk__in=updated).update(
+                is_active=active, token_version=F("token_version") + 1, row_version=F("row_version") + 1
+            )
+            _after_write(updated, changelog.UPSERT, fields=("is_active",))
+    return changed
+
+
+def delete_users(ids, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Delete users and everything that cascades from them; return ``{"users": n, "invites": n}``."""
+    counts = {"users": 0, "invites": 0}
+    for chunk in _chunks(ids, chunk_size):
+        with transaction.atomic():
+            write_lock(User)
+            chunk = list(User.objects.filter(pk__in=chunk).values_list("pk", flat=True))
+            if not chunk:
+                continue
+            invites = _delete_related(chunk)
+            counts["invites"] += invites
+            counts["users"] += _raw_delete(User.objects.filter(pk__in=chunk))
+            _after_write(chunk, changelog.DELETE)
+            users_bulk_deleted.send(sender=User, ids=chunk)
+            if invites:
+                versioning.bump(versioning.INVITES)
+    return counts
+
+
+def apply(action, ids, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Run ``action`` on ``ids`` and return the affected counts."""
+    if action == DELETE:
+        return delete_users(ids, chunk_size)
+    return {"users": set_active(ids, action == REACTIVATE, chunk_size)}
@@ -0,0 +1,228 @@
+"""
+Change log of users and invites for incremental sync.
+
+Every write to a ``User`` or an ``Invite`` appends a ``ChangeLogEntry``
+(``upsert`` or ``delete``) in the writing transaction: from
+``accounts.signals`` for ordinary saves and deletes, and explicitly from the
+paths that bypass signals (``accounts.bulk``, invite cleanup, bulk import,
+accepting an invite). The sync cursor of
+``GET /api/users/changes/?since=<cursor>`` is the entries' ``seq``; the
+endpoint returns the current state of everything that changed after the
+cursor: one ``upsert`` with the row (as in the user list) or a ``delete``
+tombstone per object, oldest change first.
+
+Entry ids can't be the cursor: they are taken when a row is inserted, and on
+Postgres a transaction can commit after one that took a later id, so a
+reader could move past an id that is about to appear. ``seq`` follows commit
+order instead. Entries are inserted without one; ``sequence`` numbers the
+committed entries that have none, after a counter row it locks for that
+short transaction only, so later commits always get higher numbers and no
+writer waits on another. It runs after every writing transaction commits,
+and readers run it too in case that was missed (e.g. the process died).
+
+``compact`` (``manage.py compact_changelog``) keeps the table bounded: it
+drops entries superseded by a newer one for the same object, which never
+changes what a sync returns, and entries older than ``RETENTION_DAYS``. The
+highest ``seq`` dropped for age is the horizon: a cursor below it has missed
+changes and gets ``410 Gone``, after which the client reloads the full list.
+
+Configured with ``settings.ACCOUNTS_CHANGELOG``::
+
+    ACCOUNTS_CHANGELOG = {
+        "RETENTION_DAYS": 30,
+        "PAGE_SIZE": 500,            # changes per response (``limit`` up to MAX_PAGE_SIZE)
+        "MAX_PAGE_SIZE": 2000,
+        "COMPACT_BATCH_SIZE": 1000,
+    }
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, F, Max, Min, OuterRef
+from django.utils import timezone
+
+from core.db import write_lock
+
+from .models import ChangeLogEntry, Invite, ResourceVersion
+
+User = get_user_model()
+
+DEFAULTS = {
+    "RETENTION_DAYS": 30,
+    "PAGE_SIZE": 500,
+    "MAX_PAGE_SIZE": 2000,
+    "COMPACT_BATCH_SIZE": 1000,
+}
+
+USER = ChangeLogEntry.Kind.USER
+INVITE = ChangeLogEntry.Kind.INVITE
+UPSERT = ChangeLogEntry.Op.UPSERT
+DELETE = ChangeLogEntry.Op.DELETE
+
+# Highest seq handed out, and highest seq removed for age, kept as ResourceVersion rows.
+SEQ_KEY = "changes:seq"
+HORIZON_KEY = "changes:horizon"
+
+
+class CursorExpired(Exception):
+    pass
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, "ACCOUNTS_CHANGELOG", {})}
+
+
+# ---------- Writing ----------
+def record(kind, op, ids):
+    """Append one ``op`` entry per object in ``ids``; call inside the writing transaction."""
+    ids = list(dict.fromkeys(str(pk) for pk in ids))
+    if len(ids) == 1:
+        ChangeLogEntry.objects.create(kind=kind, object_id=ids[0], op=op)
+    elif ids:
+        ChangeLogEntry.objects.bulk_create([ChangeLogEntry(kind=kind, object_id=pk, op=op) for pk in ids])
+    else:
+        return
+    # Failures are logged, not raised: the next reader sequences what is left.
+    transaction.on_commit(sequence, robust=True)
+
+
+def _unsequenced():
+    return ChangeLogEntry.objects.filter(seq__isnull=True)
+
+
+def sequence():
+    """
+    Number the committed entries that have no ``seq`` yet, after every
+    ``seq`` handed out so far, in id order. Entries committed meanwhile are
+    left for the next call, which numbers them higher.
+    """
+    if not _unsequenced().exists():
+        return
+    with transaction.atomic():
+        write_lock(ResourceVersion)
+        counter, _ = ResourceVersion.objects.select_for_update().get_or_create(
+            key=SEQ_KEY, defaults={"version": 0, "modified": timezone.now()}
+        )
+        bounds = _unsequenced().aggregate(low=Min("pk"), high=Max("pk"))
+        if bounds["low"] is None:
+            return
+        # One UPDATE: seq = id shifted past the counter. Bounding the ids keeps
+        # the numbers of this call between the old and the new counter.
+        offset = counter.version + 1 - bounds["low"]
+        _unsequenced().filter(pk__gte=bounds["low"], pk__lte=bounds["high"]).update(seq=F("pk") + offset)
+        counter.version = bounds["high"] + offset
+        counter.modified = timezone.now()
+        counter.save(update_fields=["version", "modified"])
+
+
+# ---------- Reading ----------
+def head():
+    """
+    The highest ``seq`` handed out (where a client that just loaded everything
+    starts), which compaction never lowers.
+    """
+    return ResourceVersion.objects.filter(key=SEQ_KEY).values_list("version", flat=True).first() or 0
+
+
+def horizon():
+    return ResourceVersion.objects.filter(key=HORIZON_KEY).values_list("version", flat=True).first() or 0
+
+
+def _sources():
+    # Imported here: serializers -> bulk -> changelog, and DRF need not load with the signals.
+    from .projection import projection
+    from .serializers import InviteListSerializer, UserListSerializer
+
+    return {USER: (User, projection(UserListSerializer)), INVITE: (Invite, projection(InviteListSerializer))}
+
+
+def changes(since, limit=None):
+    """
+    What changed after cursor ``since``: ``{"cursor", "has_more", "changes"}``.
+
+    Raises ``CursorExpired`` when entries after ``since`` were already purged.
+    """
+    options = get_options()
+    limit = min(limit or options["PAGE_SIZE"], options["MAX_PAGE_SIZE"])
+    if since < horizon():
+        raise CursorExpired
+
+    sequence()
+    entries = list(
+        ChangeLogEntry.objects.filter(seq__gt=since).order_by("seq")
+        .values_list("seq", "kind", "object_id")[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # One result per object, at the position of its latest entry.
+    latest = {}
+    for _, kind, object_id in entries:
+        latest.pop((kind, object_id), None)
+        latest[(kind, object_id)] = None
+
+    # The current rows, one query per kind; objects without a row are gone.
+    found = {}
+    for kind, (model, rows) in _sources().items():
+        ids = [object_id for k, object_id in latest if k == kind]
+        if ids:
+            columns = rows.sources(rows.field_names, extra=("id",))
+            found[kind] = (
+                rows.compile(rows.field_names),
+                {str(row["id"]): row for row in model.objects.filter(pk__in=ids).values(*columns)},
+            )
+
+    result = []
+    for kind, object_id in latest:
+        extract, current = found[kind]
+        row = current.get(object_id)
+        pk = int(object_id) if kind == USER else object_id
+        if row is None:
+            result.append({"type": kind, "op": DELETE, "id": pk})
+        else:
+            result.append({"type": kind, "op": UPSERT, "id": pk, "data": extract(row)})
+
+    cursor = entries[-1][0] if entries else since
+    return {"cursor": str(cursor), "has_more": has_more, "changes": result}
+
+
+# ---------- Compaction ----------
+def compact(batch_size=None, retention_days=None, dry_run=False, now=None):
+    """
+    Delete superseded entries and entries older than ``retention_days``.
+    Returns ``{"superseded": n, "expired": n}`` (what would go with ``dry_run``).
+    """
+    options = get_options()
+    batch_size = batch_size or options["COMPACT_BATCH_SIZE"]
+    if retention_days is None:
+        retention_days = options["RETENTION_DAYS"]
+    cutoff = (now or timezone.now()) - timedelta(days=retention_days)
+
+    # Only sequenced entries: "newer" is by seq, the order clients see them in.
+    newer = ChangeLogEntry.objects.filter(kind=OuterRef("kind"), object_id=OuterRef("object_id"), seq__gt=OuterRef("seq"))
+    superseded = ChangeLogEntry.objects.filter(Exists(newer)).order_by("seq")
+    expired = ChangeLogEntry.objects.filter(created_at__lt=cutoff, seq__isnull=False).order_by("seq")
+    if dry_run:
+        return {"superseded": superseded.count(), "expired": expired.exclude(Exists(newer)).count()}
+
+    result = {"superseded": 0, "expired": 0}
+    for name, queryset in (("superseded", superseded), ("expired", expired)):
+        while True:
+            with transaction.atomic():
+                write_lock(ChangeLogEntry)
+                rows = list(queryset.values_list("pk", "seq")[:batch_size])
+                if not rows:
+                    break
+                ids = [pk for pk, _ in rows]
+                if name == "expired":
+                    # Record the horizon first, so no reader can miss the gap.
+                    ResourceVersion.objects.update_or_create(
+                        key=HORIZON_KEY,
+                        defaults={"version": max(rows[-1][1], horizon()), "modified": timezone.now()},
+                    )
+                result[name] += ChangeLogEntry.objects.filter(pk__in=ids)._raw_delete(ChangeLogEntry.objects.db)
+            if len(ids) < batch_size:
+                break
+    return result
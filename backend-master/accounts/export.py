@@ -0,0 +1,91 @@
+"""
+Streaming user directory export.
+
+Rows are fetched with ``values_list().iterator(chunk_size=...)`` and encoded a
+batch at a time into a ``StreamingHttpResponse``, optionally gzip-compressed on
+the fly, so neither the queryset nor the rendered body is ever held in memory.
+"""
+import csv
+import json
+import zlib
+from datetime import datetime, timezone
+
+from django.http import StreamingHttpResponse
+
+from .projection import datetime_repr
+from .serializers import UserListSerializer
+
+EXPORT_FIELDS = list(UserListSerializer.Meta.fields)
+CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+
+
+def _format_value(value):
+    # Datetimes as the API renders them.
+    return datetime_repr(value) if isinstance(value, datetime) else value
+
+
+class _Echo:
+    """File-like object whose ``write`` just hands the value back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def iter_rows(queryset, chunk_size=CHUNK_SIZE):
+    rows = queryset.order_by("id").values_list(*EXPORT_FIELDS)
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield [_format_value(v) for v in row]
+
+
+def iter_csv(queryset, chunk_size=CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    batch = []
+    for row in iter_rows(queryset, chunk_size):
+        batch.append(writer.writerow(["true" if v is True else "false" if v is False else v for v in row]))
+        if len(batch) >= chunk_size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def iter_ndjson(queryset, chunk_size=CHUNK_SIZE):
+    batch = []
+    for row in iter_rows(queryset, chunk_size):
+        batch.append(json.dumps(dict(zip(EXPORT_FIELDS, row))) + "\n")
+        if len(batch) >= chunk_size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(queryset, fmt="csv", compress=False):
+    chunks = iter_csv(queryset) if fmt == "csv" else iter_ndjson(queryset)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    filename = f"users-{stamp}.{fmt}"
+
+    if compress:
+        response = StreamingHttpResponse(gzip_stream(chunks), content_type="application/gzip")
+        filename += ".gz"
+    else:
+        response = StreamingHttpResponse(
+            (chunk.encode("utf-8") for chunk in chunks), content_type=CONTENT_TYPES[fmt]
+        )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
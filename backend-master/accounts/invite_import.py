@@ -0,0 +1,212 @@
+"""
+Streaming bulk import of invites from CSV or NDJSON.
+
+Rows are read lazily from the upload, validated and de-duplicated in chunks,
+checked against existing users and live pending invites with one set-based
+query each, and inserted with ``bulk_create`` (replacing expired invites for
+the same emails), with their emails queued in the same transaction
+(``accounts.outbox``). Results are yielded row by row so the caller can stream the
+report back; memory use depends on the chunk size, not on the size of the file.
+
+The report is streamed after the response status went out, so ``open_upload``
+checks the start of the file (UTF-8, a CSV header with an ``email`` column)
+beforehand and errors later on are reported in the stream itself: a chunk
+that fails to save is rolled back and its rows reported ``failed``, and a
+file that stops being readable ends the report with an ``error`` line.
+"""
+import csv
+import itertools
+import json
+import logging
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from . import changelog, invites, outbox, versioning
+from .models import Invite
+
+User = get_user_model()
+
+CSV = "csv"
+NDJSON = "ndjson"
+
+CSV_CONTENT_TYPES = {"text/csv", "application/csv", "text/plain"}
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines"}
+
+DEFAULT_CHUNK_SIZE = 500
+NAME_MAX_LENGTH = Invite._meta.get_field("first_name").max_length
+
+logger = logging.getLogger("accounts.invite_import")
+
+
+class InvalidUpload(ValueError):
+    pass
+
+
+def detect_format(content_type, filename=""):
+    filename = (filename or "").lower()
+    if filename.endswith(".csv"):
+        return CSV
+    if filename.endswith((".ndjson", ".jsonl")):
+        return NDJSON
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in CSV_CONTENT_TYPES:
+        return CSV
+    if content_type in NDJSON_CONTENT_TYPES:
+        return NDJSON
+    return None
+
+
+def _text_lines(lines):
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode("utf-8")
+            except UnicodeDecodeError:
+                raise InvalidUpload(f"Line {number} is not valid UTF-8.")
+        yield line.lstrip("\ufeff") if number == 1 else line
+
+
+def open_upload(lines, fmt):
+    """
+    Check the first line of an upload and return its records (as
+    ``iter_records``). Raises ``InvalidUpload`` if it is empty, not UTF-8 or,
+    for CSV, has no ``email`` column.
+    """
+    lines = _text_lines(lines)
+    first = next(lines, None)
+    if first is None or not first.strip():
+        raise InvalidUpload("The upload is empty.")
+    if fmt == CSV:
+        header = next(csv.reader([first]), [])
+        if "email" not in {name.strip().lower() for name in header}:
+            raise InvalidUpload("The CSV header has no 'email' column.")
+    return iter_records(itertools.chain([first], lines), fmt)
+
+
+def iter_records(lines, fmt):
+    """Yield ``(row_number, record_or_None)`` from an iterable of raw lines."""
+    lines = _text_lines(lines)
+    if fmt == CSV:
+        reader = csv.DictReader(lines)
+        for record in reader:
+            # Header is line 1, so the first record is row 2 as in a spreadsheet.
+            yield reader.line_num, {(k or "").strip().lower(): (v or "") for k, v in record.items()}
+    else:
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield number, record if isinstance(record, dict) else None
+
+
+def _clean(record):
+    """Return ``(cleaned_fields, error)`` for one input record."""
+    if record is None:
+        return None, "Malformed row."
+
+    email = str(record.get("email") or "").strip()
+    if not email:
+        return None, "Missing email."
+    email = User.objects.normalize_email(email)
+    try:
+        validate_email(email)
+    except ValidationError:
+        return None, "Enter a valid email address."
+
+    first_name = str(record.get("first_name") or "").strip()
+    last_name = str(record.get("last_name") or "").strip()
+    if len(first_name) > NAME_MAX_LENGTH or len(last_name) > NAME_MAX_LENGTH:
+        return None, f"Names must be at most {NAME_MAX_LENGTH} characters."
+
+    return {"email": email, "first_name": first_name, "last_name": last_name}, None
+
+
+def _process_chunk(chunk, created_by):
+    results = []
+    candidates = []
+    for number, record in chunk:
+        fields, error = _clean(record)
+        if error:
+            results.append({"row": number, "status": "invalid", "error": error})
+        else:
+            candidates.append((number, fields))
+
+    emails = {fields["email"] for _, fields in candidates}
+    existing_users = set(User.objects.filter(email__in=emails).values_list("email", flat=True))
+    pending = set(invites.pending().filter(email__in=emails).values_list("email", flat=True))
+
+    to_create = []
+    for number, fields in candidates:
+        email = fields["email"]
+        if email in existing_users:
+            results.append({"row": number, "email": email, "status": "skipped", "reason": "user_exists"})
+        elif email in pending:
+            results.append({"row": number, "email": email, "status": "skipped", "reason": "invite_pending"})
+        else:
+            # Later rows with the same email in this chunk are duplicates.
+            pending.add(email)
+            invite = Invite(created_by=created_by, **fields)
+            to_create.append(invite)
+            results.append({"row": number, "email": email, "status": "created", "id": str(invite.id)})
+
+    if to_create:
+        with transaction.atomic():
+            # Expired invites for these emails still hold the one-pending-invite slot.
+            Invite.objects.filter(
+                email__in=[invite.email for invite in to_create], is_accepted=False
+            ).delete()
+            Invite.objects.bulk_create(to_create)
+            outbox.enqueue_many(to_create)
+            # bulk_create sends no post_save, so bump the collection here.
+            versioning.bump(versioning.INVITES)
+            changelog.record(changelog.INVITE, changelog.UPSERT, [invite.pk for invite in to_create])
+
+    results.sort(key=lambda r: r["row"])
+    return results
+
+
+def import_invites(records, created_by, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Create invites for ``records`` (as produced by ``iter_records``).
+
+    Yields one result dict per row, an ``{"error": ...}`` if the input could
+    not be read to the end, and a final ``{"summary": {...}}``.
+    """
+    summary = {"rows": 0, "created": 0, "skipped": 0, "invalid": 0, "failed": 0}
+    chunk = []
+
+    def flush():
+        try:
+            results = _process_chunk(chunk, created_by)
+        except Exception:
+            logger.exception("Invite import chunk of %d rows failed", len(chunk))
+            results = [{"row": number, "status": "failed", "error": "Could not be saved."} for number, _ in chunk]
+        for result in results:
+            summary["rows"] += 1
+            summary[result["status"]] += 1
+            yield result
+        chunk.clear()
+
+    records = iter(records)
+    while True:
+        try:
+            row = next(records, None)
+        except (InvalidUpload, csv.Error) as exc:
+            # Rows read so far are still imported; the rest of the file can't be.
+            yield from flush()
+            yield {"error": str(exc)}
+            break
+        if row is None:
+            yield from flush()
+            break
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield from flush()
+
+    yield {"summary": summary}
@@ -0,0 +1,123 @@
+"""
+Invite lifecycle: issuing, expiry and cleanup.
+
+Each email has at most one pending invite, enforced by the partial unique
+constraint ``invite_one_pending_per_email``. ``issue`` replaces whatever
+invite is pending for the email, so the newest link is the only one that
+works. Pending invites expire ``TTL_DAYS`` after they are issued.
+
+``delete_expired`` purges expired invites (and, optionally, accepted ones
+past a retention period) in small batches: each batch selects a bounded set
+of primary keys through the partial ``expires_at`` index and deletes them in
+its own short transaction, so the table is never locked for long. It backs
+``manage.py cleanup_invites``.
+
+Configured with ``settings.ACCOUNTS_INVITES``::
+
+    ACCOUNTS_INVITES = {
+        "TTL_DAYS": 7,                  # how long a pending invite works
+        "ACCEPTED_RETENTION_DAYS": None,  # purge accepted invites after this; None keeps them
+        "CLEANUP_BATCH_SIZE": 500,
+        "CLEANUP_PAUSE": 0.1,           # seconds to sleep between batches
+    }
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from core.db import write_lock
+
+from . import changelog, outbox, versioning
+from .models import INVITE_TTL_DAYS, Invite
+
+User = get_user_model()
+
+DEFAULTS = {
+    "TTL_DAYS": INVITE_TTL_DAYS,
+    "ACCEPTED_RETENTION_DAYS": None,
+    "CLEANUP_BATCH_SIZE": 500,
+    "CLEANUP_PAUSE": 0.1,
+}
+
+ISSUE_ATTEMPTS = 3
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, "ACCOUNTS_INVITES", {})}
+
+
+def pending(now=None):
+    """Invites that can still be accepted."""
+    return Invite.objects.filter(is_accepted=False, expires_at__gt=now or timezone.now())
+
+
+def issue(email, created_by, **fields):
+    """
+    Create an invite for ``email``, replacing the one pending for it, if any,
+    and queue its email (see ``accounts.outbox``).
+
+    A concurrent ``issue`` for the same email can win the unique constraint
+    between our delete and insert; the loser retries and replaces it.
+    """
+    email = User.objects.normalize_email(email)
+    for attempt in range(ISSUE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                Invite.objects.filter(email=email, is_accepted=False).delete()
+                invite = Invite.objects.create(email=email, created_by=created_by, **fields)
+                outbox.enqueue(invite)
+                return invite
+        except IntegrityError:
+            if attempt == ISSUE_ATTEMPTS - 1:
+                raise
+
+
+def _raw_delete(ids):
+    # Nothing references Invite, so skip the collector and its per-row
+    # post_delete signals; callers bump the invites version once per batch.
+    return Invite.objects.filter(pk__in=ids)._raw_delete(Invite.objects.db)
+
+
+def _purge(queryset, batch_size, pause, dry_run):
+    if dry_run:
+        return queryset.count()
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            write_lock(Invite)
+            ids = list(queryset.values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += _raw_delete(ids)
+            versioning.bump(versioning.INVITES)
+            changelog.record(changelog.INVITE, changelog.DELETE, ids)
+        if len(ids) < batch_size:
+            return deleted
+        if pause:
+            time.sleep(pause)
+
+
+def delete_expired(batch_size=None, pause=None, accepted_retention_days=None, dry_run=False, now=None):
+    """
+    Delete expired pending invites and, when ``accepted_retention_days`` is
+    set, accepted invites older than that. Returns ``{"expired": n, "accepted": n}``
+    (the counts that would be deleted with ``dry_run``).
+    """
+    options = get_options()
+    batch_size = batch_size or options["CLEANUP_BATCH_SIZE"]
+    pause = options["CLEANUP_PAUSE"] if pause is None else pause
+    if accepted_retention_days is None:
+        accepted_retention_days = options["ACCEPTED_RETENTION_DAYS"]
+    now = now or timezone.now()
+
+    expired = Invite.objects.filter(is_accepted=False, expires_at__lte=now).order_by("expires_at")
+    result = {"expired": _purge(expired, batch_size, pause, dry_run), "accepted": 0}
+    if accepted_retention_days is not None:
+        cutoff = now - timedelta(days=accepted_retention_days)
+        accepted = Invite.objects.filter(is_accepted=True, created_at__lt=cutoff).order_by("created_at")
+        result["accepted"] = _purge(accepted, batch_size, pause, dry_run)
+    return result
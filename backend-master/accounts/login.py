@@ -0,0 +1,229 @@
+"""
+Password checks isolated from the request workers.
+
+Hashing a password (PBKDF2 by default) is deliberately slow, so a burst of
+logins can occupy every worker and stall the rest of the API. Here all hashing
+runs on a small dedicated thread pool (``hashlib`` releases the GIL while it
+works) with a bounded number of queued jobs: once the pool and its queue are
+full, further logins are refused straight away with ``429`` instead of piling
+up. Attempts are also throttled with token buckets: every attempt counts
+against the client IP, and failed ones against the email *from that IP*, so
+someone who knows an address can't lock its owner out from elsewhere.
+
+The buckets are kept per process: with N workers a client gets up to N times
+the configured attempts (less in practice, as a balancer spreads its requests).
+
+When a password was stored with an outdated hasher or iteration count, the new
+hash is computed on the pool and saved by the request thread (rehash-on-login).
+
+Configured with ``settings.ACCOUNTS_LOGIN``::
+
+    ACCOUNTS_LOGIN = {
+        "HASH_WORKERS": 4,          # threads hashing passwords
+        "HASH_QUEUE": 16,           # jobs allowed to wait for a thread
+        "HASH_TIMEOUT": 10,         # seconds a request waits for its job
+        "IP_BURST": 20,             # attempts per IP before throttling...
+        "IP_PER_MINUTE": 10,        # ...and how fast they come back
+        "EMAIL_BURST": 5,           # failed attempts per email and IP...
+        "EMAIL_PER_MINUTE": 2,
+        "TRUST_X_FORWARDED_FOR": False,
+    }
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from threading import BoundedSemaphore, Lock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model, user_login_failed
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework.exceptions import Throttled
+
+from core.lru import LRUCache
+
+User = get_user_model()
+
+DEFAULTS = {
+    "HASH_WORKERS": 4,
+    "HASH_QUEUE": 16,
+    "HASH_TIMEOUT": 10,
+    "IP_BURST": 20,
+    "IP_PER_MINUTE": 10,
+    "EMAIL_BURST": 5,
+    "EMAIL_PER_MINUTE": 2,
+    "TRUST_X_FORWARDED_FOR": False,
+}
+
+OVERLOADED_RETRY_AFTER = 1
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, "ACCOUNTS_LOGIN", {})}
+
+
+class TokenBucketLimiter:
+    """
+    ``capacity`` attempts per key, refilled at ``per_minute``. Buckets live in
+    a bounded LRU and expire once they would be full again anyway.
+    """
+
+    def __init__(self, capacity, per_minute, maxsize=100000):
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self.buckets = LRUCache(maxsize=maxsize, ttl=capacity / self.rate if self.rate else None)
+        self._lock = Lock()
+
+    def _level(self, key, now):
+        tokens, last = self.buckets.get(key) or (self.capacity, now)
+        return min(self.capacity, tokens + (now - last) * self.rate)
+
+    def _wait(self, tokens):
+        return (1 - tokens) / self.rate if self.rate else 60
+
+    def take(self, key):
+        """Consume one token; return 0 if allowed, else seconds until the next token."""
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._level(key, now)
+            if tokens < 1:
+                self.buckets.set(key, (tokens, now))
+                return self._wait(tokens)
+            self.buckets.set(key, (tokens - 1, now))
+            return 0
+
+    def check(self, key):
+        """Like ``take`` without consuming anything."""
+        with self._lock:
+            tokens = self._level(key, time.monotonic())
+        return 0 if tokens >= 1 else self._wait(tokens)
+
+
+class HashingPool:
+    """Thread pool for password hashing that rejects work once it is saturated."""
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.slots = BoundedSemaphore(workers + queue_size)
+        self._executor = None
+        self._lock = Lock()
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def executor(self):
+        # Created on first use so forking servers don't inherit idle threads.
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    def _done(self, future):
+        self.completed += 1
+        self.slots.release()
+
+    def _overloaded(self):
+        self.rejected += 1
+        return Throttled(wait=OVERLOADED_RETRY_AFTER, detail="Too many sign-in attempts in progress, please retry.")
+
+    def submit(self, fn, *args):
+        """Queue ``fn(*args)``; raise ``Throttled`` straight away if the pool is full."""
+        if not self.slots.acquire(blocking=False):
+            raise self._overloaded()
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def run(self, fn, *args, timeout=None):
+        """Run ``fn(*args)`` on the pool; raise ``Throttled`` if it is full or too slow."""
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            raise self._overloaded()
+
+    async def arun(self, fn, *args, timeout=None):
+        """``run`` for async views: waits for the job without blocking the event loop."""
+        future = self.submit(fn, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            raise self._overloaded()
+
+    def stats(self):
+        return {"workers": self.workers, "completed": self.completed, "rejected": self.rejected}
+
+
+_options = get_options()
+pool = HashingPool(_options["HASH_WORKERS"], _options["HASH_QUEUE"])
+ip_limiter = TokenBucketLimiter(_options["IP_BURST"], _options["IP_PER_MINUTE"])
+email_limiter = TokenBucketLimiter(_options["EMAIL_BURST"], _options["EMAIL_PER_MINUTE"])
+
+
+def client_ip(request):
+    if _options["TRUST_X_FORWARDED_FOR"]:
+        forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _failure_key(request, email):
+    return f"{email.lower()}|{client_ip(request)}"
+
+
+def throttle(request, email):
+    """Raise ``Throttled`` when the client IP, or the email from this IP, is out of attempts."""
+    wait = max(ip_limiter.take(client_ip(request)), email_limiter.check(_failure_key(request, email)))
+    if wait:
+        raise Throttled(wait=wait)
+
+
+def _verify(password, encoded):
+    """Return ``(is_correct, upgraded_hash_or_None)``; runs on the pool."""
+    outdated = []
+    correct = check_password(password, encoded, setter=outdated.append)
+    return correct, (make_password(password) if correct and outdated else None)
+
+
+def hash_password(password):
+    """``make_password`` on the pool."""
+    return pool.run(make_password, password, timeout=_options["HASH_TIMEOUT"])
+
+
+async def ahash_password(password):
+    return await pool.arun(make_password, password, timeout=_options["HASH_TIMEOUT"])
+
+
+def authenticate(request, email, password):
+    """
+    Return the active user for ``email``/``password`` or ``None``.
+
+    Raises ``Throttled`` when rate limited or when the hashing pool is full.
+    """
+    throttle(request, email)
+    email = User.objects.normalize_email(email)
+    user = User.objects.filter(**{User.USERNAME_FIELD: email}).first()
+
+    if user is None:
+        # Hash anyway so response time doesn't reveal which emails exist.
+        hash_password(password)
+    else:
+        correct, upgraded = pool.run(_verify, password, user.password, timeout=_options["HASH_TIMEOUT"])
+        if correct and upgraded:
+            user.password = upgraded
+            user.save(update_fields=["password"])
+        if correct and user.is_active:
+            return user
+
+    email_limiter.take(_failure_key(request, email))
+    user_login_failed.send(sender=__name__, credentials={"email": email}, request=request)
+    return None
+
+
+def stats():
+    return pool.stats()
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.invites import delete_expired
+from accounts.outbox import purge_finished
+
+
+class Command(BaseCommand):
+    help = "Delete expired pending invites (and old accepted ones) and old invite emails in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="Rows per delete transaction (default: ACCOUNTS_INVITES['CLEANUP_BATCH_SIZE']).")
+        parser.add_argument("--pause", type=float, default=None,
+                            help="Seconds to sleep between batches (default: ACCOUNTS_INVITES['CLEANUP_PAUSE']).")
+        parser.add_argument("--accepted-older-than", type=int, default=None, metavar="DAYS",
+                            help="Also delete accepted invites created more than DAYS ago.")
+        parser.add_argument("--dry-run", action="store_true", help="Only count what would be deleted.")
+        parser.add_argument("--every", type=int, default=None, metavar="SECONDS",
+                            help="Keep running, cleaning up every SECONDS (for a scheduler-less deployment).")
+
+    def handle(self, *args, **options):
+        while True:
+            counts = delete_expired(
+                batch_size=options["batch_size"],
+                pause=options["pause"],
+                accepted_retention_days=options["accepted_older_than"],
+                dry_run=options["dry_run"],
+            )
+            emails = purge_finished(batch_size=options["batch_size"], dry_run=options["dry_run"])
+            verb = "Would delete" if options["dry_run"] else "Deleted"
+            self.stdout.write(self.style.SUCCESS(
+                f"{verb} {counts['expired']} expired and {counts['accepted']} accepted invites, "
+                f"and {emails} finished invite emails."
+            ))
+            if not options["every"]:
+                return
+            time.sleep(options["every"])
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.changelog import compact
+
+
+class Command(BaseCommand):
+    help = "Drop superseded and expired entries from the user/invite change log in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="Rows per delete transaction (default: ACCOUNTS_CHANGELOG['COMPACT_BATCH_SIZE']).")
+        parser.add_argument("--retention-days", type=int, default=None, metavar="DAYS",
+                            help="Drop entries older than DAYS (default: ACCOUNTS_CHANGELOG['RETENTION_DAYS']).")
+        parser.add_argument("--dry-run", action="store_true", help="Only count what would be deleted.")
+        parser.add_argument("--every", type=int, default=None, metavar="SECONDS",
+                            help="Keep running, compacting every SECONDS (for a scheduler-less deployment).")
+
+    def handle(self, *args, **options):
+        while True:
+            counts = compact(
+                batch_size=options["batch_size"],
+                retention_days=options["retention_days"],
+                dry_run=options["dry_run"],
+            )
+            verb = "Would delete" if options["dry_run"] else "Deleted"
+            self.stdout.write(self.style.SUCCESS(
+                f"{verb} {counts['superseded']} superseded and {counts['expired']} expired change log entries."
+            ))
+            if not options["every"]:
+                return
+            time.sleep(options["every"])
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from accounts.outbox import run
+
+
+class Command(BaseCommand):
+    help = "Deliver queued invite emails over one pooled SMTP connection, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="Emails claimed per batch (default: ACCOUNTS_INVITE_EMAILS['BATCH_SIZE']).")
+        parser.add_argument("--poll-interval", type=float, default=None, metavar="SECONDS",
+                            help="Wait when nothing is due (default: ACCOUNTS_INVITE_EMAILS['POLL_INTERVAL']).")
+        parser.add_argument("--once", action="store_true",
+                            help="Exit once nothing is due instead of polling forever.")
+
+    def handle(self, *args, **options):
+        def report(counts):
+            self.stdout.write(
+                f"Sent {counts['sent']}, retrying {counts['retried']}, failed {counts['failed']}, "
+                f"cancelled {counts['cancelled']}, deferred {counts['deferred']}."
+            )
+
+        totals = run(
+            batch_size=options["batch_size"],
+            poll_interval=options["poll_interval"],
+            once=options["once"],
+            on_batch=report if options["verbosity"] >= 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: sent {totals['sent']}, retrying {totals['retried']}, failed {totals['failed']}, "
+            f"cancelled {totals['cancelled']}."
+        ))
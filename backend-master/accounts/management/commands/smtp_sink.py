@@ -0,0 +1,48 @@
+import os
+from email.parser import BytesHeaderParser
+
+from django.core.management.base import BaseCommand
+
+from core.smtp_sink import SMTPSink
+
+
+class Command(BaseCommand):
+    help = "Run a local SMTP server that accepts every message (for trying send_invite_emails)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=1025)
+        parser.add_argument("--save-dir", help="Also write each message to DIR/<n>.eml.")
+        parser.add_argument("--fail-every", type=int, default=0, metavar="N",
+                            help="Answer every N-th message with a temporary 451 error.")
+        parser.add_argument("--reject-domain", action="append", default=[], metavar="DOMAIN",
+                            help="Refuse recipients at DOMAIN with a permanent 550 error (repeatable).")
+
+    def handle(self, *args, **options):
+        save_dir = options["save_dir"]
+        if save_dir:
+            os.makedirs(save_dir, exist_ok=True)
+        quiet = options["verbosity"] < 1
+
+        def on_message(number, sender, recipients, data):
+            if save_dir:
+                with open(os.path.join(save_dir, f"{number}.eml"), "wb") as fh:
+                    fh.write(data)
+            if not quiet:
+                subject = BytesHeaderParser().parsebytes(data).get("Subject", "")
+                self.stdout.write(f"#{number} {sender} -> {', '.join(recipients)}: {subject}")
+
+        server = SMTPSink(
+            (options["host"], options["port"]),
+            on_message=on_message,
+            fail_every=options["fail_every"],
+            reject_domains=options["reject_domain"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"SMTP sink listening on {options['host']}:{options['port']}."))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Received {server.received} messages.")
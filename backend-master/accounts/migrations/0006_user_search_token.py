@@ -0,0 +1,75 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:05
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# A frozen copy of accounts.search.user_tokens as of this migration, so later
+# changes to the live module can't change or break it.
+TOKEN_MAX_LENGTH = 64
+_SPLIT_RE = re.compile(r'[^0-9a-z]+')
+
+
+def _normalize(value):
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return value.lower().strip()
+
+
+def _parts(value):
+    return [p for p in _SPLIT_RE.split(value) if p]
+
+
+def user_tokens(email, first_name, last_name):
+    tokens = set()
+    for name in (first_name, last_name):
+        name = _normalize(name)
+        tokens.update(name.split())
+        tokens.update(_parts(name))
+    email = _normalize(email)
+    if email:
+        tokens.add(email)
+        local, _, domain = email.partition('@')
+        tokens.update(t for t in (local, domain) if t)
+        tokens.update(_parts(local))
+        tokens.update(_parts(domain))
+    return {t[:TOKEN_MAX_LENGTH] for t in tokens if t}
+
+
+def backfill_search_tokens(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    UserSearchToken = apps.get_model('accounts', 'UserSearchToken')
+    rows = User.objects.values_list('id', 'email', 'first_name', 'last_name')
+    batch = []
+    for pk, email, first_name, last_name in rows.iterator(chunk_size=2000):
+        batch.extend(UserSearchToken(user_id=pk, token=t) for t in user_tokens(email, first_name, last_name))
+        if len(batch) >= 2000:
+            UserSearchToken.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        UserSearchToken.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_user_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('token', 'user'), name='user_search_token_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_search_tokens, migrations.RunPython.noop),
+    ]
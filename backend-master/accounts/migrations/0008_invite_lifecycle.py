@@ -0,0 +1,58 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:30
+
+from datetime import timedelta
+
+import accounts.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def backfill_expiry(apps, schema_editor):
+    # Existing invites expire one TTL after they were sent, not after the migration.
+    Invite = apps.get_model('accounts', 'Invite')
+    days = getattr(settings, 'ACCOUNTS_INVITES', {}).get('TTL_DAYS', 7)
+    Invite.objects.update(expires_at=F('created_at') + timedelta(days=days))
+
+
+def drop_duplicate_pending(apps, schema_editor):
+    # Keep only the newest pending invite per email before adding the constraint.
+    Invite = apps.get_model('accounts', 'Invite')
+    pending = Invite.objects.filter(is_accepted=False)
+    duplicated = pending.values('email').annotate(n=Count('id')).filter(n__gt=1).values_list('email', flat=True)
+    for email in duplicated:
+        stale = pending.filter(email=email).order_by('-created_at').values_list('id', flat=True)[1:]
+        Invite.objects.filter(id__in=list(stale)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_resource_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invite',
+            name='expires_at',
+            field=models.DateTimeField(default=accounts.models.invite_expiry),
+        ),
+        migrations.RunPython(backfill_expiry, migrations.RunPython.noop),
+        migrations.RunPython(drop_duplicate_pending, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='invite',
+            index=models.Index(fields=['email', 'is_accepted'], name='invite_email_accepted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invite',
+            index=models.Index(fields=['created_at'], name='invite_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invite',
+            index=models.Index(condition=models.Q(('is_accepted', False)), fields=['expires_at'], name='invite_pending_expiry_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='invite',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_accepted', False)), fields=('email',), name='invite_one_pending_per_email'),
+        ),
+    ]
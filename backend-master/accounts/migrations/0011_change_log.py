@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_invite_email_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('user', 'User'), ('invite', 'Invite')], max_length=8)),
+                ('object_id', models.CharField(max_length=36)),
+                ('op', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=8)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'object_id', 'id'], name='changelog_object_idx'), models.Index(fields=['created_at'], name='changelog_created_idx')],
+            },
+        ),
+    ]
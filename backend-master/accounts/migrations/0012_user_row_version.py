@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_change_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='row_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
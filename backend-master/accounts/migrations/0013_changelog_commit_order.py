@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:16
+
+from django.db import migrations, models
+from django.db.models import F, Max
+from django.utils import timezone
+
+
+def backfill_seq(apps, schema_editor):
+    # Existing entries keep their id as cursor, so clients' cursors stay valid.
+    ChangeLogEntry = apps.get_model('accounts', 'ChangeLogEntry')
+    ResourceVersion = apps.get_model('accounts', 'ResourceVersion')
+    ChangeLogEntry.objects.update(seq=F('id'))
+    head = ChangeLogEntry.objects.aggregate(head=Max('id'))['head'] or 0
+    ResourceVersion.objects.update_or_create(
+        key='changes:seq', defaults={'version': head, 'modified': timezone.now()}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_user_row_version'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='changelogentry',
+            name='changelog_object_idx',
+        ),
+        migrations.AddField(
+            model_name='changelogentry',
+            name='seq',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_seq, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['kind', 'object_id', 'seq'], name='changelog_object_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(condition=models.Q(('seq__isnull', True)), fields=['id'], name='changelog_unsequenced_idx'),
+        ),
+    ]
@@ -1,7 +1,13 @@
-from django.db import models
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.utils import timezone
 import uuid
 
+INVITE_TTL_DAYS = 7
+
 
 class UserManager(BaseUserManager):
     use_in_migrations = True
@@ -29,6 +35,10 @@ class UserManager(BaseUserManager):
         return self._create_user(email, password, **extra_fields)
 
 
+class RowVersionConflict(Exception):
+    """The row was written by someone else since the version the caller read."""
+
+
 class User(AbstractUser):
     class Roles(models.TextChoices):
         ADMIN = "ADMIN", "Admin"
@@ -51,16 +61,95 @@ class User(AbstractUser):
     nationality = models.CharField(max_length=50, blank=True)
     marital_status = models.CharField(max_length=10, blank=True)
 
+    # Embedded in JWTs; bumped to revoke every outstanding token (see accounts.tokens).
+    token_version = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped by every write to the row; lets a client update only the version it read
+    # (see save_at_version).
+    row_version = models.PositiveIntegerField(default=0, editable=False)
+
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
     objects = UserManager()
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Keyset pagination of the user directory (newest first).
+            models.Index(fields=["date_joined", "id"], name="user_joined_id_idx"),
+            models.Index(fields=["role", "date_joined", "id"], name="user_role_joined_idx"),
+            models.Index(fields=["is_active", "date_joined", "id"], name="user_active_joined_idx"),
+        ]
+
+    # Changing any of these revokes the user's tokens.
+    TOKEN_FIELDS = ("role", "is_active")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        user._token_state = user._get_token_state()
+        return user
+
+    def _get_token_state(self):
+        # Deferred fields are left out rather than loaded.
+        return {name: self.__dict__[name] for name in self.TOKEN_FIELDS if name in self.__dict__}
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        loaded = getattr(self, "_token_state", None)
+        if loaded and any(self.__dict__.get(name, value) != value for name, value in loaded.items()):
+            self.token_version += 1
+            if update_fields is not None:
+                update_fields = kwargs["update_fields"] = {*update_fields, "token_version"}
+        # last_login is not part of any user representation (see accounts.signals).
+        if self.pk is not None and not (update_fields is not None and set(update_fields) <= {"last_login"}):
+            self.row_version += 1
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "row_version"}
+        # post_save runs outside Django's own transaction: keep what it records
+        # (change log, search tokens) in the one that writes the row.
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+        self._token_state = self._get_token_state()
+
+    def save_at_version(self, row_version, update_fields):
+        """
+        Save ``update_fields`` only if the row is still at ``row_version``, in
+        the one ``UPDATE``; raise ``RowVersionConflict`` if it was changed since.
+        """
+        self._expected_row_version = row_version
+        self.row_version = row_version
+        try:
+            # Its own savepoint: a conflict leaves the caller's transaction usable.
+            with transaction.atomic():
+                self.save(update_fields=update_fields)
+        finally:
+            self._expected_row_version = None
+
+    def _do_update(self, base_qs, *args, **kwargs):
+        expected = getattr(self, "_expected_row_version", None)
+        if expected is None:
+            return super()._do_update(base_qs, *args, **kwargs)
+        if not super()._do_update(base_qs.filter(row_version=expected), *args, **kwargs):
+            raise RowVersionConflict
+        return True
+
     def __str__(self):
         return f"{self.email} ({self.role})"
 
 
+def invite_expiry():
+    days = getattr(settings, "ACCOUNTS_INVITES", {}).get("TTL_DAYS", INVITE_TTL_DAYS)
+    return timezone.now() + timedelta(days=days)
+
+
 class Invite(models.Model):
+    """
+    An invitation for ``email`` to sign up as a client.
+
+    At most one invite per email is pending (not accepted) at a time: issuing
+    a new one replaces it (see ``accounts.invites``). Pending invites stop
+    working at ``expires_at`` and are purged by ``manage.py cleanup_invites``.
+    """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     email = models.EmailField()
     department = models.CharField(max_length=32, blank=True)
@@ -69,6 +158,139 @@ class Invite(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="created_invites")
     is_accepted = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(default=invite_expiry)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["email", "is_accepted"], name="invite_email_accepted_idx"),
+            models.Index(fields=["created_at"], name="invite_created_idx"),
+            # Cleanup scans only pending invites, oldest expiry first.
+            models.Index(
+                fields=["expires_at"], condition=models.Q(is_accepted=False), name="invite_pending_expiry_idx"
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["email"], condition=models.Q(is_accepted=False), name="invite_one_pending_per_email"
+            ),
+        ]
+
+    @property
+    def is_expired(self):
+        return not self.is_accepted and self.expires_at <= timezone.now()
+
+    def save(self, *args, **kwargs):
+        # With the change log entry post_save records for it (see User.save).
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Invite({self.email}) accepted={self.is_accepted}"
+
+
+class InviteEmail(models.Model):
+    """
+    An invite email waiting in the outbox, or the record of one that was sent.
+
+    Rows are inserted in the same transaction as their invite and delivered by
+    ``manage.py send_invite_emails`` (see ``accounts.outbox``). A pending row
+    is due at ``available_at``; claiming it pushes ``available_at`` forward by
+    a lease, so a worker that dies mid-send only delays it. ``invite_id`` is
+    not a foreign key: invites are purged with raw deletes, and an email whose
+    invite is gone is simply cancelled.
+    """
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        SENT = "sent", "Sent"
+        FAILED = "failed", "Failed"
+        CANCELLED = "cancelled", "Cancelled"
+
+    invite_id = models.UUIDField()
+    to_email = models.EmailField()
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim due rows, oldest first, from pending ones only.
+            models.Index(
+                fields=["available_at"], condition=models.Q(status="pending"), name="invite_email_due_idx"
+            ),
+            models.Index(fields=["finished_at"], name="invite_email_finished_idx"),
+        ]
+
+    def __str__(self):
+        return f"InviteEmail({self.to_email}) {self.status}"
+
+
+class UserSearchToken(models.Model):
+    """
+    One normalized search token (name part, email, email part) for a user.
+
+    Maintained from ``User`` save signals by ``accounts.search``; prefix
+    lookups are answered with a range scan on the ``token`` index.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="search_tokens")
+    token = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["token", "user"], name="user_search_token_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.token} -> {self.user_id}"
+
+
+class ResourceVersion(models.Model):
+    """
+    Monotonic version counter for a cacheable resource ("user:<id>", "users", "invites").
+
+    Bumped from ``accounts.signals`` on every write, so read endpoints can answer
+    conditional requests (ETag / Last-Modified) without serializing anything.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    modified = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.key}@{self.version}"
+
+
+class ChangeLogEntry(models.Model):
+    """
+    One write to a user or an invite, for incremental sync (see ``accounts.changelog``).
+
+    Entries are appended from ``accounts.signals`` and from the bulk write
+    paths that bypass signals, and trimmed by ``manage.py compact_changelog``.
+    ``seq``, the sync cursor, is handed out once the entry is committed, in
+    commit order (``changelog.sequence``); until then it is null.
+    """
+    class Kind(models.TextChoices):
+        USER = "user", "User"
+        INVITE = "invite", "Invite"
+
+    class Op(models.TextChoices):
+        UPSERT = "upsert", "Upsert"
+        DELETE = "delete", "Delete"
+
+    kind = models.CharField(max_length=8, choices=Kind.choices)
+    object_id = models.CharField(max_length=36)
+    op = models.CharField(max_length=8, choices=Op.choices)
+    created_at = models.DateTimeField(auto_now_add=True)
+    seq = models.BigIntegerField(null=True, blank=True, unique=True)
+
+    class Meta:
+        indexes = [
+            # Compaction looks for newer entries about the same object.
+            models.Index(fields=["kind", "object_id", "seq"], name="changelog_object_seq_idx"),
+            models.Index(fields=["created_at"], name="changelog_created_idx"),
+            models.Index(fields=["id"], condition=models.Q(seq__isnull=True), name="changelog_unsequenced_idx"),
+        ]
 
     def __str__(self):
-        return f"Invite({self.email}) accepted={self.is_accepted}"
\ No newline at end of file
+        return f"#{self.seq or '-'} {self.op} {self.kind}:{self.object_id}"
@@ -0,0 +1,318 @@
+"""
+Durable outbox for invite emails.
+
+Creating an invite never talks to SMTP. ``enqueue`` inserts an ``InviteEmail``
+row in the same transaction as the invite (one ``INSERT``, or one
+``bulk_create`` per import chunk), so an email is queued if and only if its
+invite was committed. ``manage.py send_invite_emails`` delivers the queue:
+
+* ``claim`` takes a batch of due rows and leases them by moving
+  ``available_at`` ``LEASE_SECONDS`` ahead, in one short transaction. On
+  Postgres the rows are selected ``FOR UPDATE SKIP LOCKED``, so concurrent
+  workers take disjoint batches without waiting on each other; on SQLite a
+  claim takes the database write lock first (``core.db.write_lock``), which
+  serializes claims. A worker that dies mid-batch only delays
+  its rows until the lease runs out.
+* ``deliver`` renders each message and sends it over one SMTP connection that
+  is kept open across batches while there is work (``Mailer``) and closed when
+  the queue runs dry. Sent rows are marked in one ``UPDATE`` per batch, so
+  delivery is at-least-once: a worker killed mid-batch resends the batch
+  after the lease. Temporary failures are retried with exponential backoff
+  (``RETRY_BASE`` doubling up to ``RETRY_MAX``) until ``MAX_ATTEMPTS``;
+  permanent ones (5xx) fail at once. If the server cannot be reached, the
+  rest of the batch is put back without using up attempts.
+* Rows whose invite was replaced, accepted, expired or deleted are cancelled
+  instead of sent.
+
+Finished rows are purged by ``manage.py cleanup_invites`` after
+``RETENTION_DAYS``. ``manage.py smtp_sink`` runs a local SMTP stand-in
+(``core/smtp_sink.py``) to try all of this without a real mail server.
+
+Configured with ``settings.ACCOUNTS_INVITE_EMAILS``::
+
+    ACCOUNTS_INVITE_EMAILS = {
+        "ENABLED": True,       # queue an email for every new invite
+        "ACCEPT_URL": "http://localhost:5173/accept-invite?token={token}",
+        "SUBJECT": "You're invited to ZenStays",
+        "FROM_EMAIL": None,    # None = DEFAULT_FROM_EMAIL
+        "BATCH_SIZE": 50,
+        "LEASE_SECONDS": 300,
+        "MAX_ATTEMPTS": 6,
+        "RETRY_BASE": 30,      # seconds before the first retry
+        "RETRY_MAX": 3600,
+        "POLL_INTERVAL": 2,    # seconds a worker waits when the queue is empty
+        "RETENTION_DAYS": 7,   # keep sent/failed/cancelled rows this long
+    }
+"""
+import random
+import smtplib
+import time
+from collections import Counter
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from core.db import write_lock
+
+from .models import Invite, InviteEmail
+
+DEFAULTS = {
+    "ENABLED": True,
+    "ACCEPT_URL": "http://localhost:5173/accept-invite?token={token}",
+    "SUBJECT": "You're invited to ZenStays",
+    "FROM_EMAIL": None,
+    "BATCH_SIZE": 50,
+    "LEASE_SECONDS": 300,
+    "MAX_ATTEMPTS": 6,
+    "RETRY_BASE": 30,
+    "RETRY_MAX": 3600,
+    "POLL_INTERVAL": 2,
+    "RETENTION_DAYS": 7,
+}
+
+BODY = (
+    "Hello{name},\n"
+    "\n"
+    "You have been invited to join ZenStays. Choose a password to activate your account:\n"
+    "\n"
+    "{url}\n"
+    "\n"
+    "This link expires on {expires:%Y-%m-%d %H:%M} UTC.\n"
+)
+
+# The connection (not the message) failed: reconnecting may help, the next message would fail too.
+TRANSPORT_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    smtplib.SMTPHeloError,
+    smtplib.SMTPAuthenticationError,
+)
+
+Status = InviteEmail.Status
+
+PURGE_BATCH_SIZE = 500
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, "ACCOUNTS_INVITE_EMAILS", {})}
+
+
+# ---------- Enqueueing (request path) ----------
+def enqueue(invite):
+    """Queue the email for ``invite``; call inside the transaction that created it."""
+    if get_options()["ENABLED"]:
+        InviteEmail.objects.create(invite_id=invite.id, to_email=invite.email)
+
+
+def enqueue_many(invites):
+    if invites and get_options()["ENABLED"]:
+        InviteEmail.objects.bulk_create(
+            [InviteEmail(invite_id=invite.id, to_email=invite.email) for invite in invites]
+        )
+
+
+# ---------- Claiming ----------
+def claim(batch_size=None, now=None):
+    """Lease up to ``batch_size`` due emails for this worker and return them."""
+    options = get_options()
+    now = now or timezone.now()
+    due = InviteEmail.objects.filter(status=Status.PENDING, available_at__lte=now).order_by("available_at")
+    with transaction.atomic():
+        write_lock(InviteEmail)
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        jobs = list(due[:batch_size or options["BATCH_SIZE"]])
+        if not jobs:
+            return []
+        lease_until = now + timedelta(seconds=options["LEASE_SECONDS"])
+        InviteEmail.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            available_at=lease_until, attempts=F("attempts") + 1
+        )
+    for job in jobs:
+        job.attempts += 1
+        job.available_at = lease_until
+    return jobs
+
+
+# ---------- Sending ----------
+class Mailer:
+    """One email backend connection, opened on first use and reused until ``close``."""
+
+    def __init__(self):
+        self.connection = None
+
+    def send(self, message):
+        try:
+            self._send(message)
+        except smtplib.SMTPServerDisconnected:
+            # Servers drop idle connections; reconnect once before giving up.
+            self.close()
+            self._send(message)
+
+    def _send(self, message):
+        if self.connection is None:
+            self.connection = get_connection(fail_silently=False)
+            self.connection.open()
+        message.connection = self.connection
+        self.connection.send_messages([message])
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except OSError:
+                pass  # The server already went away.
+            finally:
+                self.connection = None
+
+
+def render(job, invite, options):
+    name = " ".join(filter(None, [invite.first_name, invite.last_name]))
+    body = BODY.format(
+        name=f" {name}" if name else "",
+        url=options["ACCEPT_URL"].format(token=invite.id),
+        expires=invite.expires_at.astimezone(dt_timezone.utc),
+    )
+    return EmailMessage(options["SUBJECT"], body, options["FROM_EMAIL"] or settings.DEFAULT_FROM_EMAIL, [job.to_email])
+
+
+def _is_transport(exc):
+    return isinstance(exc, TRANSPORT_ERRORS) or not isinstance(exc, smtplib.SMTPException)
+
+
+def _is_permanent(exc):
+    if _is_transport(exc):
+        return False
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    return isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code >= 500
+
+
+def retry_delay(attempts, options):
+    delay = min(options["RETRY_BASE"] * 2 ** (attempts - 1), options["RETRY_MAX"])
+    # Jitter, so emails that failed together don't all come back together.
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _fail(job, exc, options, now):
+    error = f"{type(exc).__name__}: {exc}"[:1000]
+    if _is_permanent(exc) or job.attempts >= options["MAX_ATTEMPTS"]:
+        InviteEmail.objects.filter(pk=job.pk).update(status=Status.FAILED, finished_at=now, last_error=error)
+        return "failed"
+    InviteEmail.objects.filter(pk=job.pk).update(
+        available_at=now + timedelta(seconds=retry_delay(job.attempts, options)), last_error=error
+    )
+    return "retried"
+
+
+def deliver(jobs, mailer):
+    """
+    Send the claimed ``jobs`` through ``mailer``. Returns counts of ``sent``,
+    ``retried``, ``failed``, ``cancelled`` and ``deferred`` (put back after a
+    connection failure).
+    """
+    options = get_options()
+    counts = Counter()
+    invites = Invite.objects.in_bulk([job.invite_id for job in jobs])
+    sent, cancelled = [], []
+
+    for index, job in enumerate(jobs):
+        invite = invites.get(job.invite_id)
+        if invite is None or invite.is_accepted or invite.is_expired:
+            cancelled.append(job.pk)
+            continue
+        try:
+            mailer.send(render(job, invite, options))
+        except OSError as exc:  # smtplib.SMTPException and socket errors
+            if not _is_transport(exc):
+                counts[_fail(job, exc, options, timezone.now())] += 1
+                continue
+            # The server is unreachable: an outage must not use up attempts, so
+            # this and the remaining emails get theirs back and wait a while.
+            mailer.close()
+            deferred = [other.pk for other in jobs[index:]]
+            InviteEmail.objects.filter(pk__in=deferred).update(
+                attempts=F("attempts") - 1,
+                available_at=timezone.now() + timedelta(seconds=options["RETRY_BASE"]),
+                last_error=f"{type(exc).__name__}: {exc}"[:1000],
+            )
+            counts["deferred"] += len(deferred)
+            break
+        else:
+            sent.append(job.pk)
+
+    now = timezone.now()
+    if sent:
+        InviteEmail.objects.filter(pk__in=sent).update(status=Status.SENT, finished_at=now, last_error="")
+    if cancelled:
+        InviteEmail.objects.filter(pk__in=cancelled).update(status=Status.CANCELLED, finished_at=now)
+    counts["sent"] += len(sent)
+    counts["cancelled"] += len(cancelled)
+    return counts
+
+
+def run(batch_size=None, poll_interval=None, once=False, on_batch=None):
+    """
+    Claim and deliver batches until the queue is empty (``once``) or forever,
+    sleeping ``poll_interval`` seconds when there is nothing due. Returns the
+    summed counts.
+    """
+    options = get_options()
+    poll_interval = options["POLL_INTERVAL"] if poll_interval is None else poll_interval
+    mailer = Mailer()
+    totals = Counter()
+    try:
+        while True:
+            jobs = claim(batch_size)
+            if jobs:
+                counts = deliver(jobs, mailer)
+                totals.update(counts)
+                if on_batch:
+                    on_batch(counts)
+                if not counts["deferred"]:
+                    continue
+            else:
+                # Don't hold an idle connection open between bursts.
+                mailer.close()
+                if once:
+                    return totals
+            time.sleep(poll_interval)
+    finally:
+        mailer.close()
+
+
+# ---------- Housekeeping ----------
+def purge_finished(retention_days=None, batch_size=None, dry_run=False, now=None):
+    """Delete sent, failed and cancelled rows finished more than ``retention_days`` ago."""
+    batch_size = batch_size or PURGE_BATCH_SIZE
+    if retention_days is None:
+        retention_days = get_options()["RETENTION_DAYS"]
+    cutoff = (now or timezone.now()) - timedelta(days=retention_days)
+    finished = InviteEmail.objects.filter(finished_at__lt=cutoff).order_by("finished_at")
+    if dry_run:
+        return finished.count()
+    deleted = 0
+    while True:
+        ids = list(finished.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += InviteEmail.objects.filter(pk__in=ids)._raw_delete(InviteEmail.objects.db)
+        if len(ids) < batch_size:
+            return deleted
+
+
+def stats(now=None):
+    """Rows per status and the age in seconds of the oldest due email."""
+    now = now or timezone.now()
+    by_status = dict(InviteEmail.objects.values_list("status").annotate(n=Count("pk")).order_by())
+    oldest = InviteEmail.objects.filter(status=Status.PENDING, available_at__lte=now).aggregate(
+        oldest=Min("available_at")
+    )["oldest"]
+    return {
+        **{status: by_status.get(status, 0) for status in Status.values},
+        "oldest_due_seconds": round((now - oldest).total_seconds(), 1) if oldest else 0,
+    }
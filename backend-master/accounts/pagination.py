@@ -0,0 +1,123 @@
+import base64
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset pagination over ``(-date_joined, -id)``.
+
+    Each page is a range scan on the ``(date_joined, id)`` index that starts
+    right after the last row of the previous page, so the cost of page N does
+    not depend on N (no OFFSET walk).
+
+    Pagination is opt-in: the view only paginates when the client sends
+    ``cursor`` or ``page_size``, so existing callers keep the plain list.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 50
+    max_page_size = 500
+    invalid_cursor_message = "Invalid cursor."
+
+    @staticmethod
+    def get_params(request):
+        # DRF requests have ``query_params``; plain (async view) requests ``GET``.
+        return getattr(request, "query_params", request.GET)
+
+    def is_requested(self, request):
+        params = self.get_params(request)
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def page_queryset(self, queryset, request):
+        """The (unevaluated) queryset of the requested page plus one look-ahead row."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            joined, pk = position
+            queryset = queryset.filter(Q(date_joined__lt=joined) | Q(date_joined=joined, id__lt=pk))
+        return queryset.order_by("-date_joined", "-id")[: self.page_size + 1]
+
+    def set_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        return self.page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        if not self.is_requested(request):
+            return None
+        return self.set_page([row async for row in self.page_queryset(queryset, request)])
+
+    def get_page_size(self, request):
+        try:
+            size = int(self.get_params(request)[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = self.get_params(request).get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            joined_raw, pk_raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii").split("|")
+            joined = parse_datetime(joined_raw)
+            pk = int(pk_raw)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if joined is None:
+            raise NotFound(self.invalid_cursor_message)
+        return joined, pk
+
+    @staticmethod
+    def get_position(obj):
+        # Pages hold model instances or ``values()`` dicts.
+        if isinstance(obj, dict):
+            return obj["date_joined"], obj["id"]
+        return obj.date_joined, obj.pk
+
+    def encode_cursor(self, obj):
+        joined, pk = self.get_position(obj)
+        raw = f"{joined.isoformat()}|{pk}"
+        encoded = base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii").rstrip("=")
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
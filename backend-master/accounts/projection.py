@@ -0,0 +1,126 @@
+"""
+Serializer output straight from ``values()`` rows.
+
+A ``Projection`` is compiled once per serializer class: for every field it
+records the model attribute to read and the cheapest function that produces
+the same representation as the DRF field (identity for strings, booleans and
+numbers, a direct ``isoformat`` for dates, the DRF field itself for anything
+else). Lists are then built from ``queryset.values(...)`` dicts without model
+instances or per-row serializer objects, and sparse fieldsets
+(``?fields=id,email``) only fetch the requested columns.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import fields as drf_fields
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+FIELDS_PARAM = "fields"
+
+_IDENTITY_FIELDS = (
+    drf_fields.CharField,  # includes EmailField
+    drf_fields.BooleanField,
+    drf_fields.IntegerField,
+    drf_fields.ChoiceField,
+)
+
+
+def datetime_repr(value):
+    """``DateTimeField.to_representation`` with the default ISO-8601 format."""
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    value = value.isoformat()
+    return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+
+def date_repr(value):
+    return value.isoformat()
+
+
+def _converter(field):
+    if isinstance(field, _IDENTITY_FIELDS):
+        return None
+    if isinstance(field, drf_fields.DateTimeField):
+        iso = getattr(field, "format", api_settings.DATETIME_FORMAT) in (None, drf_fields.ISO_8601)
+        if iso and not hasattr(field, "timezone"):
+            return datetime_repr
+    elif isinstance(field, drf_fields.DateField):
+        if getattr(field, "format", api_settings.DATE_FORMAT) in (None, drf_fields.ISO_8601):
+            return date_repr
+    return field.to_representation
+
+
+class Projection:
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.columns = {}
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if field.source == "*" or "." in field.source:
+                raise ImproperlyConfigured(
+                    f"{serializer_class.__name__}.{name} is not a plain model field and cannot be projected."
+                )
+            self.columns[name] = (field.source, _converter(field))
+        self.field_names = tuple(self.columns)
+        self._compiled = {}
+
+    def select(self, params):
+        """Field names requested with ``?fields=`` (all fields when absent)."""
+        raw = params.get(FIELDS_PARAM, "")
+        requested = [f.strip() for f in raw.split(",") if f.strip()]
+        if not requested:
+            return self.field_names
+        unknown = [f for f in requested if f not in self.columns]
+        if unknown:
+            raise ValidationError({FIELDS_PARAM: [f"Unknown field(s): {', '.join(unknown)}."]})
+        return tuple(dict.fromkeys(requested))
+
+    def sources(self, names, extra=()):
+        """Model columns to pass to ``values()`` for ``names`` (plus ``extra``)."""
+        return list(dict.fromkeys([*(self.columns[n][0] for n in names), *extra]))
+
+    def compile(self, names):
+        """Return ``row -> dict`` for ``values()`` rows, limited to ``names``."""
+        key = ("row", tuple(names))
+        if key not in self._compiled:
+            self._compiled[key] = self._compile_rows(names)
+        return self._compiled[key]
+
+    def compile_instance(self, names):
+        """Like ``compile`` but reading attributes of a model instance."""
+        key = ("instance", tuple(names))
+        if key not in self._compiled:
+            self._compiled[key] = self._compile_instances(names)
+        return self._compiled[key]
+
+    def _compile_rows(self, names):
+        plan = [(name, *self.columns[name]) for name in names]
+
+        def extract(row):
+            out = {}
+            for name, source, convert in plan:
+                value = row[source]
+                out[name] = value if convert is None or value is None else convert(value)
+            return out
+
+        return extract
+
+    def _compile_instances(self, names):
+        plan = [(name, *self.columns[name]) for name in names]
+
+        def extract(obj):
+            out = {}
+            for name, source, convert in plan:
+                value = getattr(obj, source)
+                out[name] = value if convert is None or value is None else convert(value)
+            return out
+
+        return extract
+
+
+@lru_cache(maxsize=None)
+def projection(serializer_class):
+    return Projection(serializer_class)
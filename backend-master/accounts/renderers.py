@@ -0,0 +1,101 @@
+import csv
+import io
+import json
+from decimal import Decimal
+
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional
+    msgpack = None
+
+
+def _rows(data):
+    if data is None:
+        return []
+    if isinstance(data, dict):
+        return [data]
+    return list(data)
+
+
+class CSVRenderer(BaseRenderer):
+    """Renders a list of flat dicts as CSV (also used for format negotiation)."""
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = _rows(data)
+        if not rows:
+            return b""
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(rows[0].keys()), extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+        return buffer.getvalue().encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Renders a list of dicts as newline-delimited JSON."""
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return "".join(json.dumps(row) + "\n" for row in _rows(data)).encode(self.charset)
+
+
+def _default(obj):
+    """Fallback for types orjson/msgpack don't encode natively (as DRF's encoder does)."""
+    if isinstance(obj, (Promise, Decimal)):
+        return str(obj)
+    return JSONEncoder().default(obj)
+
+
+class ORJSONRenderer(BaseRenderer):
+    """``application/json`` via orjson, several times faster than the stdlib on large lists."""
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Compact binary alternative, sent for ``Accept: application/msgpack``."""
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+def fast_renderer_classes():
+    """
+    The renderers above whose library is installed, ahead of the default ones.
+
+    Views with several renderers answer ``Vary: Accept``, and their ETags
+    include the negotiated media type (see ``accounts.versioning``).
+    """
+    fast = []
+    if orjson is not None:
+        fast.append(ORJSONRenderer)
+    if msgpack is not None:
+        fast.append(MessagePackRenderer)
+    return [*fast, *api_settings.DEFAULT_RENDERER_CLASSES]
@@ -0,0 +1,147 @@
+"""
+Prefix search over user names and emails.
+
+Every user is broken into a handful of normalized tokens (lower-cased,
+accent-stripped name parts, the full email, its local part, domain and their
+pieces) stored in ``UserSearchToken``. A query term matches a user when it is
+a prefix of one of that user's tokens, and a multi-term query requires every
+term to match. Each term is answered by a range scan on the token index, so
+the cost grows with the number of matches, not with the size of the table.
+"""
+import re
+import unicodedata
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .models import UserSearchToken
+
+User = get_user_model()
+
+TOKEN_MAX_LENGTH = UserSearchToken._meta.get_field("token").max_length
+INDEXED_FIELDS = frozenset({"email", "first_name", "last_name"})
+MAX_QUERY_TERMS = 5
+
+_SPLIT_RE = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(value):
+    """Lower-case and strip accents so ``Élodie`` and ``elodie`` index alike."""
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(ch for ch in value if not unicodedata.combining(ch))
+    return value.lower().strip()
+
+
+def _parts(value):
+    return [p for p in _SPLIT_RE.split(value) if p]
+
+
+def user_tokens(email, first_name, last_name):
+    """Return the set of search tokens for the given user fields."""
+    tokens = set()
+
+    for name in (first_name, last_name):
+        name = normalize(name)
+        tokens.update(name.split())
+        tokens.update(_parts(name))
+
+    email = normalize(email)
+    if email:
+        tokens.add(email)
+        local, _, domain = email.partition("@")
+        tokens.update(t for t in (local, domain) if t)
+        tokens.update(_parts(local))
+        tokens.update(_parts(domain))
+
+    return {t[:TOKEN_MAX_LENGTH] for t in tokens if t}
+
+
+def query_terms(query):
+    """Split a raw query into normalized terms, longest (most selective) first."""
+    terms = {t[:TOKEN_MAX_LENGTH] for t in normalize(query).split() if t}
+    return sorted(terms, key=len, reverse=True)[:MAX_QUERY_TERMS]
+
+
+def _prefix_upper_bound(term):
+    # Smallest string greater than every string starting with ``term``.
+    return term[:-1] + chr(ord(term[-1]) + 1)
+
+
+def matching_user_ids(term):
+    """Sub-query of user ids having a token that starts with ``term``."""
+    return (
+        UserSearchToken.objects
+        .filter(token__gte=term, token__lt=_prefix_upper_bound(term))
+        .values("user_id")
+    )
+
+
+def search_users(query, queryset=None):
+    """Filter ``queryset`` (all users by default) down to users matching ``query``."""
+    if queryset is None:
+        queryset = User.objects.all()
+
+    terms = query_terms(query)
+    if not terms:
+        return queryset.none()
+
+    for term in terms:
+        queryset = queryset.filter(id__in=matching_user_ids(term))
+    return queryset
+
+
+@transaction.atomic
+def index_user(user):
+    """Bring the stored tokens of ``user`` in line with its current fields."""
+    wanted = user_tokens(user.email, user.first_name, user.last_name)
+    current = set(UserSearchToken.objects.filter(user_id=user.pk).values_list("token", flat=True))
+
+    stale = current - wanted
+    if stale:
+        UserSearchToken.objects.filter(user_id=user.pk, token__in=stale).delete()
+
+    missing = wanted - current
+    if missing:
+        UserSearchToken.objects.bulk_create(
+            [UserSearchToken(user_id=user.pk, token=t) for t in missing],
+            ignore_conflicts=True,
+        )
+
+
+def index_users(ids):
+    """``index_user`` for many users at once, for write paths that skip the signals."""
+    ids = list(ids)
+    if not ids:
+        return
+    with transaction.atomic():
+        unindex_users(ids)
+        rows = User.objects.filter(pk__in=ids).values_list("id", "email", "first_name", "last_name")
+        UserSearchToken.objects.bulk_create([
+            UserSearchToken(user_id=pk, token=t)
+            for pk, email, first_name, last_name in rows
+            for t in user_tokens(email, first_name, last_name)
+        ])
+
+
+def unindex_users(ids):
+    """Drop the tokens of the users ``ids``."""
+    tokens = UserSearchToken.objects.filter(user_id__in=list(ids))
+    return tokens._raw_delete(tokens.db)
+
+
+def rebuild_index(batch_size=2000):
+    """Rebuild the whole index from the user table; returns the number of users indexed."""
+    count = 0
+    with transaction.atomic():
+        UserSearchToken.objects.all().delete()
+        rows = User.objects.values_list("id", "email", "first_name", "last_name").order_by("id")
+        batch = []
+        for pk, email, first_name, last_name in rows.iterator(chunk_size=batch_size):
+            batch.extend(UserSearchToken(user_id=pk, token=t) for t in user_tokens(email, first_name, last_name))
+            count += 1
+            if len(batch) >= batch_size:
+                UserSearchToken.objects.bulk_create(batch, batch_size=batch_size)
+                batch = []
+        if batch:
+            UserSearchToken.objects.bulk_create(batch, batch_size=batch_size)
+    return count
@@ -3,22 +3,38 @@ from uuid import UUID
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 
+from . import bulk, changelog, invites, login, versioning
 from .models import Invite
 
 User = get_user_model()
 
 
+# ---------- Login ----------
+class LoginSerializer(serializers.Serializer):
+    email = serializers.CharField()
+    password = serializers.CharField(write_only=True, trim_whitespace=False)
+
+
 # ---------- Admin creates invite ----------
 class InviteCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Invite
-        fields = ["id", "email", "first_name", "last_name"]
+        fields = ["id", "email", "first_name", "last_name", "expires_at"]
+        read_only_fields = ["expires_at"]
 
     def create(self, validated_data):
-        user = self.context["request"].user
-        return Invite.objects.create(created_by=user, **validated_data)
+        # Replaces any invite still pending for this email.
+        return invites.issue(created_by=self.context["request"].user, **validated_data)
+
+
+# ---------- Invite rows in the change feed ----------
+class InviteListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Invite
+        fields = ["id", "email", "first_name", "last_name", "department", "is_accepted", "created_at", "expires_at"]
 
 
 # ---------- Client accepts invite ----------
@@ -53,29 +69,51 @@ class AcceptInviteSerializer(serializers.Serializer):
         if invite.is_accepted:
             raise serializers.ValidationError({"detail": "This invite has already been used."})
 
+        if invite.is_expired:
+            raise serializers.ValidationError({"detail": "This invite has expired."})
+
         attrs["invite"] = invite
         return attrs
 
-    @transaction.atomic
     def create(self, validated_data):
         invite: Invite = validated_data["invite"]
 
-        user = User.objects.create_user(
-            email=invite.email,
-            password=validated_data["password"],
-            first_name=validated_data.get("first_name") or invite.first_name,
-            last_name=validated_data.get("last_name") or invite.last_name,
-            role=User.Roles.CLIENT,
-        )
-
-        invite.is_accepted = True
-        invite.save(update_fields=["is_accepted"])
+        # Hash on the shared hashing pool, outside the transaction (async
+        # callers hash beforehand and pass ``password_hash`` to ``save``).
+        password_hash = validated_data.get("password_hash") or login.hash_password(validated_data["password"])
+
+        with transaction.atomic():
+            # Claim the invite first: it may have been accepted, replaced or
+            # purged since validation.
+            claimed = Invite.objects.filter(
+                pk=invite.pk, is_accepted=False, expires_at__gt=timezone.now()
+            ).update(is_accepted=True)
+            if not claimed:
+                raise serializers.ValidationError({"detail": "This invite is no longer valid."})
+
+            user = User(
+                email=User.objects.normalize_email(invite.email),
+                password=password_hash,
+                first_name=validated_data.get("first_name") or invite.first_name,
+                last_name=validated_data.get("last_name") or invite.last_name,
+                role=User.Roles.CLIENT,
+            )
+            user.save()
+
+            invite.is_accepted = True
+            # update() sends no post_save.
+            versioning.bump(versioning.INVITES)
+            changelog.record(changelog.INVITE, changelog.UPSERT, [invite.pk])
 
         return {"email": user.email}
 
 
 # ---------- Current user ----------
 class UserMeSerializer(serializers.ModelSerializer):
+    # Read: the version of the row. Write (optional): the version the client
+    # edited, so the update is refused if the row changed since.
+    row_version = serializers.IntegerField(min_value=0, required=False)
+
     class Meta:
         model = User
         fields = [
@@ -88,8 +126,27 @@ class UserMeSerializer(serializers.ModelSerializer):
             "location",
             "bio",
             "join_date",
+            "row_version",
         ]
 
+    def update(self, instance, validated_data):
+        """
+        Write only the fields whose value changes, in one ``UPDATE`` (no write,
+        and no signals, if none does). With ``row_version`` the update only
+        applies to that version of the row, else ``RowVersionConflict``.
+        """
+        expected = validated_data.pop("row_version", None)
+        self.changed_fields = [name for name, value in validated_data.items() if getattr(instance, name) != value]
+        if not self.changed_fields:
+            return instance
+        for name in self.changed_fields:
+            setattr(instance, name, validated_data[name])
+        if expected is None:
+            instance.save(update_fields=self.changed_fields)
+        else:
+            instance.save_at_version(expected, self.changed_fields)
+        return instance
+
 
 # ---------- User list for Admin ----------
 class UserListSerializer(serializers.ModelSerializer):
@@ -103,4 +160,16 @@ class UserListSerializer(serializers.ModelSerializer):
             "role",
             "is_active",
             "date_joined",
-        ]
\ No newline at end of file
+        ]
+
+
+# ---------- Change feed query ----------
+class ChangesQuerySerializer(serializers.Serializer):
+    since = serializers.IntegerField(min_value=0, required=False)
+    limit = serializers.IntegerField(min_value=1, required=False)
+
+
+# ---------- Bulk user actions for Admin ----------
+class UserBulkActionSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=bulk.ACTIONS)
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=10000)
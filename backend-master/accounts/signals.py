@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import changelog, search, versioning
+from .models import Invite
+
+User = get_user_model()
+
+# Sent by ``accounts.bulk.delete_users`` inside the deleting transaction, once
+# per chunk, with the ``ids`` of users deleted without per-row signals (their
+# nullable references already cleared), for apps that derived data from them.
+users_bulk_deleted = Signal()
+
+
+@receiver(post_save, sender=User, dispatch_uid="accounts.search.index_user")
+def update_search_index(sender, instance, created, update_fields=None, **kwargs):
+    # Saves that don't touch indexed fields (e.g. last_login) are skipped.
+    if update_fields is not None and not search.INDEXED_FIELDS.intersection(update_fields):
+        return
+    search.index_user(instance)
+
+
+@receiver(post_delete, sender=User, dispatch_uid="accounts.search.unindex_user")
+def remove_from_search_index(sender, instance, **kwargs):
+    # The tokens cascade with the user; this also covers databases without FK enforcement.
+    search.unindex_users([instance.pk])
+
+
+@receiver(post_save, sender=User, dispatch_uid="accounts.user_cache.invalidate_on_save")
+@receiver(post_delete, sender=User, dispatch_uid="accounts.user_cache.invalidate_on_delete")
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Imported here: accounts.authentication pulls in simplejwt and DRF, which
+    # would otherwise load at django.setup() time in every process.
+    from .authentication import token_versions, user_cache
+
+    # Drop now, and again once the transaction commits, so a concurrent request
+    # can't re-cache the pre-commit row for the rest of the TTL.
+    for cache in (user_cache, token_versions):
+        cache.invalidate(instance.pk)
+    transaction.on_commit(lambda: [cache.invalidate(instance.pk) for cache in (user_cache, token_versions)])
+
+
+@receiver(post_save, sender=User, dispatch_uid="accounts.versioning.user_save")
+def bump_user_version(sender, instance, update_fields=None, **kwargs):
+    # last_login is not part of any user representation.
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    versioning.bump(versioning.user_key(instance.pk), versioning.USERS)
+
+
+@receiver(post_delete, sender=User, dispatch_uid="accounts.versioning.user_delete")
+def bump_user_version_on_delete(sender, instance, **kwargs):
+    versioning.bump(versioning.user_key(instance.pk), versioning.USERS)
+
+
+@receiver(post_save, sender=User, dispatch_uid="accounts.changelog.user_save")
+def log_user_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    changelog.record(changelog.USER, changelog.UPSERT, [instance.pk])
+
+
+@receiver(post_delete, sender=User, dispatch_uid="accounts.changelog.user_delete")
+def log_user_delete(sender, instance, **kwargs):
+    changelog.record(changelog.USER, changelog.DELETE, [instance.pk])
+
+
+@receiver(post_save, sender=Invite, dispatch_uid="accounts.changelog.invite_save")
+def log_invite_save(sender, instance, **kwargs):
+    changelog.record(changelog.INVITE, changelog.UPSERT, [instance.pk])
+
+
+@receiver(post_delete, sender=Invite, dispatch_uid="accounts.changelog.invite_delete")
+def log_invite_delete(sender, instance, **kwargs):
+    changelog.record(changelog.INVITE, changelog.DELETE, [instance.pk])
+
+
+@receiver(post_save, sender=Invite, dispatch_uid="accounts.versioning.invite_save")
+@receiver(post_delete, sender=Invite, dispatch_uid="accounts.versioning.invite_delete")
+def bump_invite_version(sender, instance, **kwargs):
+    versioning.bump(versioning.INVITES)
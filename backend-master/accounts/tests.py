@@ -1,3 +1,1255 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import smtplib
+import threading
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core import instrumentation
+from core.response_cache import ResponseCache, response_cache
+
+from . import async_views, bulk, changelog, export, invite_import, invites, login, outbox, renderers, search, versioning
+from .authentication import ClaimsJWTAuthentication, ClaimsUser, token_versions, user_cache
+from .models import ChangeLogEntry, Invite, InviteEmail, ResourceVersion, UserSearchToken
+from .projection import projection
+from .serializers import UserListSerializer, UserMeSerializer
+from .tokens import ClaimsTokenObtainPairSerializer
+
+User = get_user_model()
+
+FAST_HASHER = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+
+def reset_caches():
+    # These live for the whole process, not for a test's transaction.
+    response_cache.clear()
+    user_cache.clear()
+    token_versions.clear()
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+class UsersKeysetPaginationTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.admin = User.objects.create_user(email="admin@example.com", role=User.Roles.ADMIN)
+        now = timezone.now()
+        # Pairs of users joined at the same instant, so pages must break ties on id.
+        for i in range(7):
+            User.objects.create_user(email=f"user{i}@example.com", date_joined=now - timedelta(days=i // 2))
+        self.client = client_for(self.admin)
+
+    def ordered_emails(self):
+        return list(User.objects.order_by("-date_joined", "-id").values_list("email", flat=True))
+
+    def test_pages_cover_every_user_once_in_order(self):
+        emails, url, pages = [], "/api/users/?page_size=3&fields=email", 0
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page["results"]), 3)
+            emails += [row["email"] for row in page["results"]]
+            url = page["next"]
+            pages += 1
+        self.assertEqual(emails, self.ordered_emails())
+        self.assertEqual(pages, 3)
+
+    def test_cursor_is_stable_under_inserts(self):
+        first = self.client.get("/api/users/?page_size=4&fields=email").json()
+        User.objects.create_user(email="newcomer@example.com")
+        rest = self.client.get(first["next"]).json()
+        self.assertEqual(
+            [row["email"] for row in first["results"] + rest["results"]],
+            [email for email in self.ordered_emails() if email != "newcomer@example.com"],
+        )
+
+    def test_plain_list_without_paging_parameters(self):
+        response = self.client.get("/api/users/")
+        self.assertIsInstance(response.json(), list)
+        self.assertEqual(len(response.json()), User.objects.count())
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get("/api/users/?cursor=not-a-cursor").status_code, 404)
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.user = User.objects.create_user(email="guest42@example.com", first_name="Élodie", last_name="Martin")
+
+    def tokens(self, user):
+        return set(UserSearchToken.objects.filter(user=user).values_list("token", flat=True))
+
+    def found(self, query):
+        return list(search.search_users(query).values_list("pk", flat=True))
+
+    def test_save_indexes_the_user(self):
+        self.assertEqual(self.tokens(self.user), search.user_tokens(self.user.email, "Élodie", "Martin"))
+        self.assertEqual(self.found("elo mart"), [self.user.pk])
+
+    def test_renaming_replaces_stale_tokens(self):
+        self.user.first_name = "Camille"
+        self.user.save()
+        self.assertEqual(self.found("camil"), [self.user.pk])
+        self.assertNotIn("elodie", self.tokens(self.user))
+
+    def test_delete_removes_tokens(self):
+        pk = self.user.pk
+        self.user.delete()
+        self.assertFalse(UserSearchToken.objects.filter(user_id=pk).exists())
+
+    def test_bulk_delete_removes_tokens(self):
+        bulk.delete_users([self.user.pk])
+        self.assertFalse(UserSearchToken.objects.filter(user_id=self.user.pk).exists())
+
+    def test_index_users_after_a_set_based_update(self):
+        User.objects.filter(pk=self.user.pk).update(last_name="Durand")
+        search.index_users([self.user.pk])
+        self.assertEqual(self.found("durand"), [self.user.pk])
+        self.assertEqual(self.found("martin"), [])
+
+    def test_search_endpoint(self):
+        admin = User.objects.create_user(email="admin@example.com", role=User.Roles.ADMIN)
+        response = client_for(admin).get("/api/users/search/?q=martin&fields=email")
+        self.assertEqual(response.json(), [{"email": "guest42@example.com"}])
+
+
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.user = User.objects.create_user(email="admin@example.com", first_name="Ada", role=User.Roles.ADMIN)
+        self.token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+
+    def authenticate(self):
+        return ClaimsJWTAuthentication().get_user(AccessToken(str(self.token)))
+
+    def test_claims_need_no_user_row(self):
+        self.authenticate()  # reads the token version
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+            self.assertIsInstance(user, ClaimsUser)
+            self.assertEqual((user.pk, user.id, user.role, user.is_active), (self.user.pk, self.user.pk, "ADMIN", True))
+            self.assertTrue(user.is_authenticated)
+
+    def test_other_attributes_load_the_user_once(self):
+        user = self.authenticate()
+        with self.assertNumQueries(1):
+            self.assertEqual(user.first_name, "Ada")
+            self.assertEqual(user.email, "admin@example.com")
+        # Later requests find it in the user cache.
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate().first_name, "Ada")
+
+    def test_role_checks_run_on_claims(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.assertEqual(client.get("/api/users/").status_code, 200)
+        User.objects.filter(pk=self.user.pk).update(role=User.Roles.CLIENT, token_version=F("token_version") + 1)
+        token_versions.clear()
+        self.assertEqual(client.get("/api/users/").status_code, 401)
+
+
+class InviteImportTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.admin = User.objects.create_user(email="admin@example.com", role=User.Roles.ADMIN)
+        self.client = client_for(self.admin)
+
+    def post_body(self, body, content_type):
+        return self.client.generic("POST", "/api/invites/bulk/", body, content_type=content_type)
+
+    def report(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_detect_format(self):
+        cases = [
+            (("text/csv", ""), invite_import.CSV),
+            (("application/octet-stream", "people.CSV"), invite_import.CSV),
+            (("application/x-ndjson; charset=utf-8", ""), invite_import.NDJSON),
+            (("text/plain", "people.jsonl"), invite_import.NDJSON),
+            (("application/pdf", "people.pdf"), None),
+        ]
+        for args, expected in cases:
+            with self.subTest(args=args):
+                self.assertEqual(invite_import.detect_format(*args), expected)
+
+    def test_csv_rows_are_reported_one_by_one(self):
+        Invite.objects.create(email="pending@example.com", created_by=self.admin)
+        body = (
+            "\ufeffEmail,First_Name,last_name\n"
+            "new@example.com,New,Person\n"
+            "admin@example.com,,\n"
+            "pending@example.com,,\n"
+            "not-an-email,,\n"
+            ",,\n"
+            "new@example.com,Again,\n"
+        ).encode()
+        lines = self.report(self.post_body(body, "text/csv"))
+        self.assertEqual([line.get("status") for line in lines[:-1]],
+                         ["created", "skipped", "skipped", "invalid", "invalid", "skipped"])
+        self.assertEqual([line["row"] for line in lines[:-1]], [2, 3, 4, 5, 6, 7])
+        self.assertEqual((lines[1]["reason"], lines[2]["reason"], lines[5]["reason"]),
+                         ("user_exists", "invite_pending", "invite_pending"))
+        self.assertEqual(lines[4]["error"], "Missing email.")
+        self.assertEqual(lines[-1], {"summary": {"rows": 6, "created": 1, "skipped": 3, "invalid": 2, "failed": 0}})
+        invite = Invite.objects.get(email="new@example.com")
+        self.assertEqual((invite.first_name, invite.last_name, str(invite.pk)), ("New", "Person", lines[0]["id"]))
+        self.assertTrue(InviteEmail.objects.filter(invite_id=invite.pk).exists())
+
+    def test_ndjson_upload(self):
+        upload = SimpleUploadedFile(
+            "people.ndjson",
+            b'{"email": "one@example.com"}\n\n[1, 2]\n{"email": "two@example.com", "first_name": "Two"}\nnot json\n',
+            content_type="application/octet-stream",
+        )
+        lines = self.report(self.client.post("/api/invites/bulk/", {"file": upload}))
+        self.assertEqual([(line.get("row"), line.get("status")) for line in lines[:-1]],
+                         [(1, "created"), (3, "invalid"), (4, "created"), (5, "invalid")])
+        self.assertEqual(lines[1]["error"], "Malformed row.")
+        self.assertEqual(lines[-1]["summary"]["created"], 2)
+
+    def test_invalid_uploads_are_refused_before_streaming(self):
+        cases = [
+            (b"", "text/csv", 400),
+            (b"name,phone\nAda,1\n", "text/csv", 400),
+            (b"\xff\xfe\n", "application/x-ndjson", 400),
+            (b"email\n", "application/pdf", 415),
+        ]
+        for body, content_type, expected in cases:
+            with self.subTest(body=body):
+                self.assertEqual(self.post_body(body, content_type).status_code, expected)
+        self.assertEqual(self.client.post("/api/invites/bulk/", {}).status_code, 400)
+        self.assertFalse(Invite.objects.exists())
+
+    def test_a_file_that_breaks_mid_way_ends_with_an_error(self):
+        lines = self.report(self.post_body(b"email\nok@example.com\n\xff@example.com\n", "text/csv"))
+        self.assertEqual(lines[0]["status"], "created")
+        self.assertEqual(lines[1], {"error": "Line 3 is not valid UTF-8."})
+        self.assertEqual(lines[2]["summary"]["created"], 1)
+        self.assertTrue(Invite.objects.filter(email="ok@example.com").exists())
+
+    def test_a_chunk_that_fails_to_save_is_rolled_back(self):
+        records = invite_import.iter_records(["email", "a@example.com", "b@example.com", "c@example.com"], "csv")
+        with mock.patch.object(outbox, "enqueue_many", side_effect=[RuntimeError("boom"), None]):
+            with self.assertLogs("accounts.invite_import", "ERROR"):
+                results = list(invite_import.import_invites(records, self.admin, chunk_size=2))
+        self.assertEqual([r.get("status") for r in results[:-1]], ["failed", "failed", "created"])
+        self.assertEqual(list(Invite.objects.values_list("email", flat=True)), ["c@example.com"])
+        self.assertEqual(results[-1]["summary"]["failed"], 2)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.admin = User.objects.create_user(email="admin@example.com", first_name="Ada", role=User.Roles.ADMIN)
+        self.active = User.objects.create_user(email="cleo@example.com", first_name="Cleo", role=User.Roles.CLIENT)
+        self.inactive = User.objects.create_user(
+            email="dora@example.com", first_name="Dora", role=User.Roles.CLIENT, is_active=False
+        )
+        self.client = client_for(self.admin)
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def csv_rows(self, response):
+        return list(csv.reader(io.StringIO(self.body(response).decode())))
+
+    def test_csv_has_a_header_row_then_users_by_id(self):
+        response = self.client.get("/api/users/export/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertRegex(response["Content-Disposition"], r'^attachment; filename="users-\d{8}-\d{6}\.csv"$')
+
+        header, *rows = self.csv_rows(response)
+        self.assertEqual(header, export.EXPORT_FIELDS)
+        self.assertEqual([row[0] for row in rows], [str(u.pk) for u in (self.admin, self.active, self.inactive)])
+        dora = dict(zip(header, rows[2]))
+        self.assertEqual((dora["email"], dora["role"], dora["is_active"]), ("dora@example.com", "CLIENT", "false"))
+
+    def test_values_match_the_api(self):
+        api = {row["id"]: row for row in self.client.get("/api/users/").json()}
+        header, *rows = self.csv_rows(self.client.get("/api/users/export/"))
+        for row in rows:
+            exported = dict(zip(header, row))
+            self.assertEqual(exported["date_joined"], api[int(exported["id"])]["date_joined"])
+
+        lines = self.body(self.client.get("/api/users/export/?format=ndjson")).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [api[u.pk] for u in (self.admin, self.active, self.inactive)])
+
+    def test_ndjson(self):
+        response = self.client.get("/api/users/export/?format=ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+        self.assertTrue(response["Content-Disposition"].endswith('.ndjson"'))
+        rows = [json.loads(line) for line in self.body(response).splitlines()]
+        self.assertEqual(list(rows[0]), export.EXPORT_FIELDS)
+        self.assertIs(rows[2]["is_active"], False)
+
+    def test_gzip(self):
+        for fmt, plain in (("csv", "/api/users/export/"), ("ndjson", "/api/users/export/?format=ndjson")):
+            with self.subTest(fmt=fmt):
+                response = self.client.get(f"/api/users/export/?format={fmt}&gzip=1")
+                self.assertEqual(response["Content-Type"], "application/gzip")
+                self.assertTrue(response["Content-Disposition"].endswith(f'.{fmt}.gz"'))
+                self.assertEqual(gzip.decompress(self.body(response)), self.body(self.client.get(plain)))
+
+    def test_filters(self):
+        cases = [
+            ("role=client", ["cleo@example.com", "dora@example.com"]),
+            ("is_active=false", ["dora@example.com"]),
+            ("role=client&is_active=true", ["cleo@example.com"]),
+            ("search=dora", ["dora@example.com"]),
+        ]
+        for query, emails in cases:
+            with self.subTest(query=query):
+                header, *rows = self.csv_rows(self.client.get(f"/api/users/export/?{query}"))
+                self.assertEqual(header, export.EXPORT_FIELDS)
+                self.assertEqual([row[1] for row in rows], emails)
+
+    def test_no_matches_still_has_the_header(self):
+        self.assertEqual(self.csv_rows(self.client.get("/api/users/export/?search=nobody")), [export.EXPORT_FIELDS])
+        self.assertEqual(self.body(self.client.get("/api/users/export/?format=ndjson&search=nobody")), b"")
+
+    def test_admin_only(self):
+        self.assertEqual(client_for(self.active).get("/api/users/export/").status_code, 403)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.admin = User.objects.create_user(email="admin@example.com", role=User.Roles.ADMIN, first_name="Ada")
+        self.client = client_for(self.admin)
+
+    def write(self, fn, *args, **kwargs):
+        # Versions are bumped once the writing transaction commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            return fn(*args, **kwargs)
+
+    def test_if_none_match_on_me(self):
+        self.write(versioning.bump, versioning.user_key(self.admin.pk))
+        first = self.client.get("/api/auth/me/")
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("Accept", first["Vary"])
+        with self.assertNumQueries(1):
+            second = self.client.get("/api/auth/me/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b"")
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_a_write_changes_the_etag(self):
+        etag = self.client.get("/api/auth/me/")["ETag"]
+        response = self.write(self.client.patch, "/api/auth/me/", {"first_name": "Grace"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.client.force_authenticate(User.objects.get(pk=self.admin.pk))
+        response = self.client.get("/api/auth/me/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["first_name"], "Grace")
+
+    def test_me_body_is_read_past_a_stale_user_cache(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(self.admin).access_token
+
+        def authenticate():
+            return ClaimsJWTAuthentication().get_user(AccessToken(str(token)))
+
+        self.assertEqual(authenticate().first_name, "Ada")  # now in the user cache
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        etag = client.get("/api/auth/me/")["ETag"]
+
+        # A PATCH served by another worker: this one's user cache still has Ada.
+        User.objects.filter(pk=self.admin.pk).update(first_name="Grace")
+        self.write(versioning.bump, versioning.user_key(self.admin.pk))
+        self.assertEqual(authenticate().first_name, "Ada")
+
+        response = client.get("/api/auth/me/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["first_name"], "Grace")
+        # What was cached under the new ETag is the new body too.
+        cached = client.get("/api/auth/me/")
+        self.assertEqual((cached["X-Cache"], cached["ETag"]), ("HIT", response["ETag"]))
+        self.assertEqual(cached.json()["first_name"], "Grace")
+
+    def test_users_list(self):
+        first = self.client.get("/api/users/?role=admin")
+        self.assertEqual(self.client.get("/api/users/?role=admin", HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+        # Another query string is another representation.
+        self.assertEqual(self.client.get("/api/users/?role=client", HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 200)
+
+        self.write(User.objects.create_user, email="new@example.com")
+        response = self.client.get("/api/users/?role=admin", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_etags_differ_per_user(self):
+        other = User.objects.create_user(email="other@example.com")
+        etag = self.client.get("/api/auth/me/")["ETag"]
+        response = client_for(other).get("/api/auth/me/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["email"], "other@example.com")
+
+
+class RequestStatsTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        instrumentation.registry.reset()
+        self.admin = User.objects.create_user(email="admin@example.com", role=User.Roles.ADMIN)
+
+    def endpoints(self):
+        return instrumentation.as_dict()["endpoints"]
+
+    def test_requests_and_queries_are_recorded_per_view(self):
+        client = client_for(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            client.get("/api/users/")
+        first_queries = len(queries)  # the log is reset by the next request
+        client.get("/api/users/?role=admin")
+        client.get("/api/auth/me/")
+        b"".join(client.get("/api/users/export/").streaming_content)
+
+        endpoints = self.endpoints()
+        self.assertEqual(set(endpoints), {"GET users-list", "GET me", "GET users-export"})
+        users = endpoints["GET users-list"]
+        self.assertEqual((users["requests"], users["errors"], users["streamed"]), (2, 0, 0))
+        self.assertEqual(users["max_queries"], first_queries)
+        self.assertEqual(sum(users["histogram"].values()), 2)
+        self.assertEqual(endpoints["GET users-export"]["streamed"], 1)
+
+    def test_reporting_formats(self):
+        stats = instrumentation.EndpointStats()
+        for elapsed_ms, queries, status_code in ((3, 1, 200), (30, 2, 200), (30, 2, 200), (6000, 9, 500)):
+            stats.record(elapsed_ms, queries, 1.5, status_code)
+        data = instrumentation.as_dict({"GET users-list": stats})["endpoints"]["GET users-list"]
+        self.assertEqual((data["requests"], data["errors"], data["max_queries"], data["avg_queries"]), (4, 1, 9, 3.5))
+        self.assertEqual((data["p50_ms"], data["p95_ms"], data["max_ms"]), (50, 6000, 6000))
+        self.assertEqual((data["histogram"]["5"], data["histogram"]["50"], data["histogram"]["+Inf"]), (1, 2, 1))
+
+        text = instrumentation.as_prometheus({'GET say "hi"': stats})
+        labels = 'method="GET",view="say \\"hi\\""'
+        for line in (
+            f'http_request_duration_seconds_bucket{{{labels},le="0.005"}} 1',
+            f'http_request_duration_seconds_bucket{{{labels},le="0.05"}} 3',
+            f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 4',
+            f"http_request_duration_seconds_count{{{labels}}} 4",
+            f"http_requests_errors_total{{{labels}}} 1",
+            f"db_queries_total{{{labels}}} 14",
+            f"db_query_duration_seconds_total{{{labels}}} 0.006",
+        ):
+            self.assertIn(line + "\n", text)
+
+    @override_settings(REQUEST_STATS={"SLOW_REQUEST_MS": 0})
+    def test_slow_requests_are_logged_with_their_sql(self):
+        client = client_for(self.admin)  # the middleware reads its options on the first request
+        with self.assertLogs("core.instrumentation.slow", "WARNING") as logs:
+            client.get("/api/users/?role=admin")
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("Slow request GET users-list /api/users/?role=admin", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
+
+    @override_settings(REQUEST_STATS={"ENABLED": False})
+    def test_disabled(self):
+        client_for(self.admin).get("/api/users/")
+        self.assertEqual(self.endpoints(), {})
+
+    def test_stats_endpoints_are_admin_only(self):
+        client = client_for(self.admin)
+        client.get("/api/users/")
+        data = client.get("/api/_stats/").json()
+        self.assertEqual(data["endpoints"]["GET users-list"]["requests"], 1)
+        self.assertIn("response_cache", data)
+
+        response = client.get("/api/_stats/prometheus/")
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn(b'http_request_duration_seconds_count{method="GET",view="users-list"} 1', response.content)
+
+        other = client_for(User.objects.create_user(email="client@example.com", role=User.Roles.CLIENT))
+        self.assertEqual(other.get("/api/_stats/").status_code, 403)
+        self.assertEqual(other.get("/api/_stats/prometheus/").status_code, 403)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        User.objects.create_user(email="owner@example.com", password="right-password")
+        # No refill, so the tests don't depend on timing.
+        self.ip_limiter = login.TokenBucketLimiter(5, 0)
+        self.email_limiter = login.TokenBucketLimiter(2, 0)
+        for name in ("ip_limiter", "email_limiter"):
+            patcher = mock.patch.object(login, name, getattr(self, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def login(self, password, ip="10.0.0.1", email="owner@example.com"):
+        return APIClient().post("/api/auth/login/", {"email": email, "password": password}, REMOTE_ADDR=ip)
+
+    def test_failed_attempts_lock_the_email_from_that_ip_only(self):
+        self.assertEqual([self.login("wrong").status_code for _ in range(2)], [401, 401])
+        response = self.login("right-password")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "60")
+        # The owner, elsewhere, is not locked out.
+        self.assertEqual(self.login("right-password", ip="10.0.0.2").status_code, 200)
+
+    def test_successful_logins_are_not_charged_to_the_email(self):
+        self.assertEqual([self.login("right-password").status_code for _ in range(4)], [200] * 4)
+
+    def test_every_attempt_counts_against_the_ip(self):
+        statuses = [self.login("wrong", email=f"user{i}@example.com").status_code for i in range(6)]
+        self.assertEqual(statuses, [401] * 5 + [429])
+        self.assertEqual(self.login("right-password", ip="10.0.0.2").status_code, 200)
+
+    def test_a_full_hashing_pool_is_refused_straight_away(self):
+        pool = login.HashingPool(1, 0)
+        pool.slots.acquire()
+        with mock.patch.object(login, "pool", pool):
+            response = self.login("right-password")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(pool.stats()["rejected"], 1)
+
+
+# The project URLs with the async views in front, as accounts.urls wires them
+# when ACCOUNTS_ASYNC_VIEWS is on.
+urlpatterns = [
+    path("api/auth/me/", async_views.me, name="me"),
+    path("api/invites/", async_views.invite_create, name="invite-create"),
+    path("api/invites/accept/", async_views.invite_accept, name="invite-accept"),
+    path("api/users/", async_views.users_list, name="users-list"),
+    path("", include(settings.ROOT_URLCONF)),
+]
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.admin = User.objects.create_user(email="admin@example.com", first_name="Ada", role=User.Roles.ADMIN)
+        self.member = User.objects.create_user(email="member@example.com", role=User.Roles.CLIENT)
+
+    def token(self, user):
+        return str(ClaimsTokenObtainPairSerializer.get_token(user).access_token)
+
+    def auth(self, user):
+        return {"HTTP_AUTHORIZATION": f"Bearer {self.token(user)}"}
+
+    def call(self, method, url, user=None, data=None, **extra):
+        """Request ``url`` from the async views."""
+        if user is not None:
+            extra.update(self.auth(user))
+        if data is not None:
+            extra.update(data=json.dumps(data), content_type="application/json")
+        with self.settings(ROOT_URLCONF=__name__):
+            return getattr(self.client, method)(url, **extra)
+
+    def test_reads_match_the_drf_views(self):
+        for url in ("/api/auth/me/", "/api/auth/me/?fields=id,email", "/api/users/", "/api/users/?role=client&page_size=1"):
+            with self.subTest(url=url):
+                drf = client_for(self.admin).get(url, HTTP_ACCEPT="application/json")
+                response = self.call("get", url, self.admin)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), drf.json())
+                self.assertEqual(response["ETag"], drf["ETag"])
+
+    def test_me_conditional_get_and_stale_user_cache(self):
+        etag = self.call("get", "/api/auth/me/", self.admin)["ETag"]
+        self.assertEqual(self.call("get", "/api/auth/me/", self.admin, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # This worker's user cache still has Ada after the change below.
+        self.assertEqual(ClaimsJWTAuthentication().get_user(AccessToken(self.token(self.admin))).first_name, "Ada")
+        User.objects.filter(pk=self.admin.pk).update(first_name="Grace")
+        with self.captureOnCommitCallbacks(execute=True):
+            versioning.bump(versioning.user_key(self.admin.pk))
+        response = self.call("get", "/api/auth/me/", self.admin, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["first_name"], "Grace")
+
+    def test_me_patch(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.call("patch", "/api/auth/me/", self.admin, {"first_name": "Grace"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["first_name"], "Grace")
+        self.assertEqual(User.objects.get(pk=self.admin.pk).first_name, "Grace")
+
+        response = self.call("patch", "/api/auth/me/", self.admin, {"first_name": "x" * 200})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("first_name", response.json())
+
+        stale = self.call("patch", "/api/auth/me/", self.admin, {"first_name": "Ada", "row_version": 0})
+        self.assertEqual(stale.status_code, 409)
+        self.assertEqual(stale.json()["code"], "row_version_conflict")
+        self.assertEqual(stale.json()["current"]["first_name"], "Grace")
+
+    def test_authentication_and_admin_checks(self):
+        response = self.call("get", "/api/auth/me/")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["WWW-Authenticate"], 'Bearer realm="api"')
+        self.assertEqual(self.call("get", "/api/auth/me/", HTTP_AUTHORIZATION="Bearer nope").status_code, 401)
+        self.assertEqual(self.call("get", "/api/users/", self.member).status_code, 403)
+        self.assertEqual(self.call("post", "/api/invites/", self.member, {"email": "guest@example.com"}).status_code, 403)
+        self.assertEqual(self.call("delete", "/api/auth/me/", self.admin).status_code, 405)
+
+    def test_invite_create_and_accept(self):
+        response = self.call("post", "/api/invites/", self.admin, {"email": "guest@example.com", "first_name": "Guest"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["email"], "guest@example.com")
+        invite = Invite.objects.get(email="guest@example.com")
+        self.assertEqual(self.call("post", "/api/invites/", self.admin, {"email": "bad"}).status_code, 400)
+
+        body = {"token": str(invite.pk), "password": "a-long-passphrase"}
+        response = self.call("post", "/api/invites/accept/", data=body)
+        self.assertEqual((response.status_code, response.json()), (201, {"email": "guest@example.com"}))
+        self.assertTrue(User.objects.get(email="guest@example.com").check_password("a-long-passphrase"))
+        self.assertEqual(self.call("post", "/api/invites/accept/", data=body).status_code, 400)
+
+
+class ProjectionTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.admin = User.objects.create_user(email="admin@example.com", first_name="Ada", role=User.Roles.ADMIN)
+        User.objects.create_user(
+            email="full@example.com", first_name="Élodie", last_name="Haddad", role=User.Roles.CLIENT,
+            phone="+216 20 000 000", location="Tunis", bio="Line one\nline two", is_active=False,
+            date_joined=timezone.now().replace(microsecond=123456),
+        )
+        User.objects.create_user(email="bare@example.com", date_joined=timezone.now().replace(microsecond=0))
+        self.client = client_for(self.admin)
+
+    def assert_parity(self):
+        for serializer_class in (UserListSerializer, UserMeSerializer):
+            p = projection(serializer_class)
+            rows = User.objects.order_by("id").values(*p.sources(p.field_names, extra=("id",)))
+            for user, row in zip(User.objects.order_by("id"), rows):
+                with self.subTest(serializer=serializer_class.__name__, email=user.email):
+                    expected = dict(serializer_class(user).data)
+                    self.assertEqual(p.compile(p.field_names)(row), expected)
+                    self.assertEqual(p.compile_instance(p.field_names)(user), expected)
+
+    def test_matches_the_serializers(self):
+        self.assert_parity()
+
+    @override_settings(TIME_ZONE="Africa/Tunis")
+    def test_matches_the_serializers_in_another_time_zone(self):
+        self.assert_parity()
+        self.assertTrue(self.client.get("/api/users/?fields=date_joined").json()[0]["date_joined"].endswith("+01:00"))
+
+    def test_fields_selection(self):
+        rows = self.client.get("/api/users/?fields=email, id,email,").json()
+        self.assertEqual([list(row) for row in rows], [["email", "id"]] * 3)
+        self.assertEqual(list(self.client.get("/api/auth/me/?fields=row_version,email").json()), ["row_version", "email"])
+        self.assertEqual(list(self.client.get("/api/users/?fields=").json()[0]), list(UserListSerializer.Meta.fields))
+
+        for url in ("/api/users/?fields=email,password,nope", "/api/auth/me/?fields=token_version"):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("Unknown field(s)", response.json()["fields"][0])
+        self.assertEqual(
+            self.client.get("/api/users/?fields=email,password,nope").json(),
+            {"fields": ["Unknown field(s): password, nope."]},
+        )
+
+    @skipUnless(renderers.orjson, "orjson is not installed")
+    def test_json_is_rendered_by_orjson(self):
+        for accept in ("application/json", "*/*"):
+            with self.subTest(accept=accept):
+                reset_caches()
+                with mock.patch.object(renderers.orjson, "dumps", wraps=renderers.orjson.dumps) as dumps:
+                    response = self.client.get("/api/users/", HTTP_ACCEPT=accept)
+                dumps.assert_called_once()
+                self.assertEqual(response["Content-Type"], "application/json")
+                self.assertIn("Accept", response["Vary"])
+        self.assertEqual(self.client.get("/api/users/", HTTP_ACCEPT="application/xml").status_code, 406)
+
+    @skipUnless(renderers.msgpack, "msgpack is not installed")
+    def test_msgpack(self):
+        as_json = self.client.get("/api/users/", HTTP_ACCEPT="application/json")
+        as_msgpack = self.client.get("/api/users/", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(as_msgpack["Content-Type"], "application/msgpack")
+        self.assertEqual(renderers.msgpack.unpackb(as_msgpack.content), as_json.json())
+        # Same versions, different representations.
+        self.assertNotEqual(as_msgpack["ETag"], as_json["ETag"])
+        response = self.client.get("/api/users/", HTTP_ACCEPT="application/json", HTTP_IF_NONE_MATCH=as_msgpack["ETag"])
+        self.assertEqual(response.status_code, 200)
+
+        me = self.client.get("/api/auth/me/?fields=id,email", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(renderers.msgpack.unpackb(me.content), {"id": self.admin.pk, "email": "admin@example.com"})
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class InviteLifecycleTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.admin = User.objects.create_user(email="admin@example.com", role=User.Roles.ADMIN)
+
+    def accept(self, invite):
+        return APIClient().post("/api/invites/accept/", {"token": str(invite.pk), "password": "a-long-passphrase"})
+
+    def test_issue_replaces_the_pending_invite(self):
+        first = invites.issue("guest@example.com", self.admin)
+        second = invites.issue("guest@example.com", self.admin)
+        self.assertEqual(list(Invite.objects.values_list("pk", flat=True)), [second.pk])
+        self.assertEqual(self.accept(first).status_code, 400)
+        self.assertEqual(self.accept(second).status_code, 201)
+
+    def test_one_pending_invite_per_email(self):
+        Invite.objects.create(email="guest@example.com", created_by=self.admin)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Invite.objects.create(email="guest@example.com", created_by=self.admin)
+        # Accepted invites don't count.
+        Invite.objects.update(is_accepted=True)
+        Invite.objects.create(email="guest@example.com", created_by=self.admin)
+
+    def test_create_endpoint(self):
+        response = client_for(self.admin).post("/api/invites/", {"email": "guest@example.com"})
+        self.assertEqual(response.status_code, 201)
+        invite = Invite.objects.get()
+        ttl = timedelta(days=invites.get_options()["TTL_DAYS"])
+        self.assertAlmostEqual(invite.expires_at - invite.created_at, ttl, delta=timedelta(seconds=5))
+
+    def test_accepting_creates_a_client_once(self):
+        invite = invites.issue("guest@example.com", self.admin, first_name="Guest")
+        self.assertEqual(self.accept(invite).status_code, 201)
+        user = User.objects.get(email="guest@example.com")
+        self.assertEqual((user.role, user.first_name), (User.Roles.CLIENT, "Guest"))
+        self.assertTrue(user.check_password("a-long-passphrase"))
+        self.assertEqual(self.accept(invite).json()["detail"], ["This invite has already been used."])
+
+    def test_expired_invites_cannot_be_accepted(self):
+        invite = invites.issue("guest@example.com", self.admin)
+        Invite.objects.filter(pk=invite.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.accept(invite).json()["detail"], ["This invite has expired."])
+        self.assertFalse(User.objects.filter(email="guest@example.com").exists())
+
+    def test_delete_expired(self):
+        now = timezone.now()
+        for i in range(3):
+            invites.issue(f"old{i}@example.com", self.admin, expires_at=now - timedelta(days=1))
+        live = invites.issue("live@example.com", self.admin)
+        accepted = invites.issue("done@example.com", self.admin)
+        Invite.objects.filter(pk=accepted.pk).update(is_accepted=True, created_at=now - timedelta(days=40))
+
+        self.assertEqual(invites.delete_expired(dry_run=True), {"expired": 3, "accepted": 0})
+        self.assertEqual(Invite.objects.count(), 5)
+        result = invites.delete_expired(batch_size=2, pause=0, accepted_retention_days=30)
+        self.assertEqual(result, {"expired": 3, "accepted": 1})
+        self.assertEqual(list(Invite.objects.values_list("pk", flat=True)), [live.pk])
+
+
+class BulkActionTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.admin = User.objects.create_user(
+            email="admin@example.com", role=User.Roles.ADMIN, is_staff=True, is_superuser=True
+        )
+        self.users = [User.objects.create_user(email=f"user{i}@example.com", role=User.Roles.ADMIN) for i in range(3)]
+        self.ids = [user.pk for user in self.users]
+        for user in self.users:
+            invites.issue(f"guest-of-{user.pk}@example.com", user)
+        invites.issue("guest-of-admin@example.com", self.admin)
+
+    def post(self, action, ids):
+        return client_for(self.admin).post("/api/users/bulk/", {"action": action, "ids": ids}, format="json")
+
+    def logged(self, op, after=0):
+        entries = ChangeLogEntry.objects.filter(kind=changelog.USER, op=op, pk__gt=after)
+        return set(entries.values_list("object_id", flat=True))
+
+    def test_delete_removes_users_and_what_cascades(self):
+        response = self.post("delete", self.ids[:2] + [999999])
+        self.assertEqual(response.json(), {
+            "action": "delete", "requested": 3, "users": 2, "invites": 2, "not_found": [999999],
+        })
+        self.assertEqual(set(User.objects.values_list("pk", flat=True)), {self.admin.pk, self.ids[2]})
+        self.assertEqual(Invite.objects.filter(created_by_id__in=self.ids[:2]).count(), 0)
+        self.assertEqual(Invite.objects.count(), 2)
+        self.assertFalse(UserSearchToken.objects.filter(user_id__in=self.ids[:2]).exists())
+        self.assertEqual(self.logged(changelog.DELETE), {str(pk) for pk in self.ids[:2]})
+
+    def test_chunks_give_the_same_result(self):
+        self.assertEqual(bulk.delete_users(self.ids, chunk_size=2), {"users": 3, "invites": 3})
+        self.assertEqual(list(User.objects.values_list("pk", flat=True)), [self.admin.pk])
+
+    def test_own_account_is_refused(self):
+        for action in ("delete", "deactivate"):
+            self.assertEqual(self.post(action, [self.admin.pk, self.ids[0]]).status_code, 400)
+        self.assertEqual(User.objects.filter(is_active=True).count(), 4)
+
+    def test_deactivate_and_reactivate(self):
+        User.objects.filter(pk=self.ids[0]).update(is_active=False)
+        before = dict(User.objects.values_list("pk", "token_version"))
+        mark = ChangeLogEntry.objects.latest("pk").pk
+        self.assertEqual(self.post("deactivate", self.ids).json()["users"], 2)
+        after = dict(User.objects.values_list("pk", "token_version"))
+        self.assertEqual([after[pk] - before[pk] for pk in self.ids], [0, 1, 1])
+        self.assertEqual(self.logged(changelog.UPSERT, after=mark), {str(pk) for pk in self.ids[1:]})
+        self.assertEqual(self.post("reactivate", self.ids).json()["users"], 3)
+        self.assertEqual(User.objects.filter(is_active=False).count(), 0)
+
+    # The API-only profile (core.settings_api) leaves out the admin site.
+    @skipUnless(django_apps.is_installed("django.contrib.admin"), "the admin is not installed")
+    def test_admin_action_asks_for_confirmation(self):
+        client = APIClient()
+        client.force_login(self.admin)
+        data = {"action": "delete_users", "_selected_action": self.ids[:2]}
+        response = client.post("/admin/accounts/user/", data)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "user0@example.com")
+        self.assertEqual(User.objects.count(), 4)
+
+        client.post("/admin/accounts/user/", {**data, "post": "yes"})
+        self.assertEqual(User.objects.count(), 2)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.admin = User.objects.create_user(email="admin@example.com", role=User.Roles.ADMIN)
+
+    def get(self, user, url):
+        response = client_for(user).get(url)
+        self.assertEqual(response.status_code, 200)
+        return response["X-Cache"]
+
+    def race(self, cache, compute, threads=8):
+        """Call ``get_or_set`` for one key from ``threads`` threads at once."""
+        barrier = threading.Barrier(threads)
+        statuses = []
+
+        def worker():
+            barrier.wait()
+            statuses.append(cache.get_or_set("test", "rc:test:key", compute)[1])
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return sorted(statuses)
+
+    def test_concurrent_misses_compute_once(self):
+        cache, calls = ResponseCache(), []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)  # long enough for every thread to miss
+            return b"body", True
+
+        statuses = self.race(cache, compute)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(statuses.count("miss"), 1)
+        self.assertIn("coalesced", statuses)
+        self.assertLessEqual(set(statuses), {"miss", "coalesced", "hit"})
+        stats = cache.stats()["caches"]["test"]
+        self.assertEqual((stats["misses"], stats["stores"], stats["coalesced"] + stats["hits"]), (1, 1, 7))
+
+    def test_uncacheable_results_are_not_shared(self):
+        cache, calls = ResponseCache(), []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return "a 404 response", False
+
+        statuses = self.race(cache, compute, threads=3)
+        self.assertEqual((len(calls), statuses), (3, ["miss"] * 3))
+        self.assertEqual(cache.stats()["caches"]["test"]["stores"], 0)
+
+    def test_entries_are_keyed_on_versions(self):
+        cache = ResponseCache()
+        self.assertNotEqual(
+            cache.make_key("users", ["url"], {versioning.USERS: 1}), cache.make_key("users", ["url"], {versioning.USERS: 2})
+        )
+        self.assertEqual(self.get(self.admin, "/api/users/"), "MISS")
+        self.assertEqual(self.get(self.admin, "/api/users/"), "HIT")
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(email="new@example.com")
+        response = client_for(self.admin).get("/api/users/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertIn("new@example.com", [row["email"] for row in response.json()])
+        self.assertEqual(self.get(self.admin, "/api/users/"), "HIT")
+
+    def test_admins_share_entries_and_other_users_get_their_own(self):
+        hr = User.objects.create_user(email="hr@example.com", role="HR")
+        owner = User.objects.create_user(email="owner@example.com", role=User.Roles.CLIENT)
+        other = User.objects.create_user(email="other@example.com", role=User.Roles.CLIENT)
+        url = "/api/analytics/summary/?start=2025-01-01&end=2025-01-31"
+
+        self.assertEqual(self.get(self.admin, url), "MISS")
+        self.assertEqual(self.get(hr, url), "HIT")  # scope "admin"
+        self.assertEqual(self.get(owner, url), "MISS")  # scope "user:<pk>"
+        self.assertEqual(self.get(owner, url), "HIT")
+        self.assertEqual(self.get(other, url), "MISS")
+
+        self.assertEqual(self.get(hr, "/api/users/"), "MISS")
+        self.assertEqual(self.get(self.admin, "/api/users/"), "HIT")
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        login.ip_limiter.buckets.clear()
+        self.user = User.objects.create_user(email="admin@example.com", password="right-password")
+        self.tokens = APIClient().post(
+            "/api/auth/login/", {"email": "admin@example.com", "password": "right-password"}
+        ).json()
+
+    def me(self, access=None):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {access or self.tokens['access']}")
+        return client.get("/api/auth/me/")
+
+    def refresh(self):
+        return APIClient().post("/api/auth/refresh/", {"refresh": self.tokens["refresh"]})
+
+    def assertRevoked(self):
+        self.assertEqual(self.me().status_code, 401)
+        self.assertEqual(self.refresh().status_code, 401)
+
+    def test_other_edits_keep_tokens_valid(self):
+        self.user.first_name = "Ada"
+        self.user.save()
+        self.assertEqual(self.me().status_code, 200)
+        self.assertEqual(self.refresh().status_code, 200)
+
+    def test_role_change_revokes(self):
+        self.user.role = User.Roles.CLIENT
+        self.user.save()
+        self.assertRevoked()
+
+    def test_deactivation_revokes(self):
+        bulk.set_active([self.user.pk], False)
+        self.assertRevoked()
+        # Reactivating doesn't bring the old tokens back.
+        bulk.set_active([self.user.pk], True)
+        self.assertRevoked()
+
+    def test_delete_revokes(self):
+        self.user.delete()
+        self.assertRevoked()
+
+    def test_revocation_made_elsewhere_applies_after_the_ttl(self):
+        # As if another process had bumped the version.
+        self.assertEqual(self.me().status_code, 200)
+        User.objects.filter(pk=self.user.pk).update(token_version=F("token_version") + 1)
+        self.assertEqual(self.me().status_code, 200)
+        token_versions.local.clear()  # TOKEN_VERSION_TTL elapsed
+        self.assertEqual(self.me().status_code, 401)
+
+    def test_authenticated_requests_skip_the_user_table(self):
+        etag = self.me()["ETag"]
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get("/api/auth/me/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Only the version counters are read.
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn("accounts_user", ctx.captured_queries[0]["sql"])
+
+    def test_refreshed_tokens_carry_the_current_claims(self):
+        # A write that skipped the version bump: the refresh is still accepted.
+        User.objects.filter(pk=self.user.pk).update(role=User.Roles.CLIENT)
+        access = self.refresh().json()["access"]
+        self.assertEqual(AccessToken(access)["role"], User.Roles.CLIENT)
+        self.assertEqual(self.me(access).json()["role"], User.Roles.CLIENT)
+
+
+class FailingMailer:
+    """Stands in for ``outbox.Mailer``: raises ``errors[address]`` for those recipients."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        self.sent = []
+
+    def send(self, message):
+        error = self.errors.get(message.to[0])
+        if error is not None:
+            raise error
+        self.sent.append(message.to[0])
+
+    def close(self):
+        pass
+
+
+class InviteOutboxTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.admin = User.objects.create_user(email="admin@example.com", role=User.Roles.ADMIN)
+        self.invites = [invites.issue(f"guest{i}@example.com", self.admin) for i in range(3)]
+        self.options = outbox.get_options()
+
+    def email(self, i):
+        return InviteEmail.objects.get(to_email=f"guest{i}@example.com")
+
+    def test_claims_lease_the_rows(self):
+        now = timezone.now()
+        jobs = outbox.claim(batch_size=2, now=now)
+        self.assertEqual([job.to_email for job in jobs], ["guest0@example.com", "guest1@example.com"])
+        self.assertEqual([job.to_email for job in outbox.claim(now=now)], ["guest2@example.com"])
+        self.assertEqual(outbox.claim(now=now), [])
+        # Rows of a worker that died come back once the lease runs out.
+        later = now + timedelta(seconds=self.options["LEASE_SECONDS"] + 1)
+        self.assertEqual(len(outbox.claim(now=later)), 3)
+        self.assertEqual(self.email(0).attempts, 2)
+
+    def test_run_sends_every_email_once(self):
+        self.assertEqual(outbox.run(once=True)["sent"], 3)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [f"guest{i}@example.com" for i in range(3)])
+        self.assertIn(str(self.invites[0].pk), mail.outbox[0].body)
+        self.assertEqual(outbox.stats()["sent"], 3)
+        self.assertEqual(outbox.run(once=True)["sent"], 0)
+
+    def test_temporary_failures_back_off(self):
+        mailer = FailingMailer({"guest1@example.com": smtplib.SMTPResponseException(451, b"try later")})
+        before = timezone.now()
+        counts = outbox.deliver(outbox.claim(), mailer)
+        self.assertEqual((counts["sent"], counts["retried"]), (2, 1))
+        job = self.email(1)
+        self.assertEqual((job.status, job.attempts), (InviteEmail.Status.PENDING, 1))
+        delay = (job.available_at - before).total_seconds()
+        self.assertTrue(0.8 * self.options["RETRY_BASE"] <= delay <= 1.2 * self.options["RETRY_BASE"] + 1)
+        self.assertIn("451", job.last_error)
+
+    def test_permanent_failures_and_exhausted_attempts_fail(self):
+        InviteEmail.objects.filter(to_email="guest2@example.com").update(attempts=self.options["MAX_ATTEMPTS"] - 1)
+        mailer = FailingMailer({
+            "guest1@example.com": smtplib.SMTPRecipientsRefused({"guest1@example.com": (550, b"no such user")}),
+            "guest2@example.com": smtplib.SMTPResponseException(451, b"try later"),
+        })
+        self.assertEqual(outbox.deliver(outbox.claim(), mailer)["failed"], 2)
+        self.assertEqual(
+            [self.email(i).status for i in range(3)],
+            [InviteEmail.Status.SENT, InviteEmail.Status.FAILED, InviteEmail.Status.FAILED],
+        )
+
+    def test_unreachable_server_defers_the_rest_of_the_batch(self):
+        mailer = FailingMailer({"guest1@example.com": ConnectionRefusedError(111, "Connection refused")})
+        counts = outbox.deliver(outbox.claim(), mailer)
+        self.assertEqual((counts["sent"], counts["deferred"]), (1, 2))
+        for i in (1, 2):
+            job = self.email(i)
+            # The outage didn't use up an attempt.
+            self.assertEqual((job.status, job.attempts), (InviteEmail.Status.PENDING, 0))
+            self.assertGreater(job.available_at, timezone.now())
+
+    def test_emails_of_stale_invites_are_cancelled(self):
+        invites.issue("guest0@example.com", self.admin)  # replaces the first invite
+        Invite.objects.filter(pk=self.invites[1].pk).update(is_accepted=True)
+        Invite.objects.filter(pk=self.invites[2].pk).update(expires_at=timezone.now())
+        counts = outbox.run(once=True)
+        self.assertEqual((counts["sent"], counts["cancelled"]), (1, 3))
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class ChangesFeedTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin = User.objects.create_user(email="admin@example.com", role=User.Roles.ADMIN)
+        self.client = client_for(self.admin)
+
+    def feed(self, since=None, **params):
+        query = {**params, **({} if since is None else {"since": since})}
+        return self.client.get("/api/users/changes/", query)
+
+    def head(self):
+        return self.feed().json()["cursor"]
+
+    def summary(self, page):
+        return [(change["type"], change["op"], change["id"]) for change in page["changes"]]
+
+    def test_upserts_and_tombstones_after_the_cursor(self):
+        cursor = self.head()
+        with self.captureOnCommitCallbacks(execute=True):
+            kept = User.objects.create_user(email="kept@example.com")
+            gone = User.objects.create_user(email="gone@example.com")
+            gone_pk = gone.pk
+            kept.first_name = "Kept"
+            kept.save()
+            gone.delete()
+            invite = invites.issue("guest@example.com", self.admin)
+
+        page = self.feed(cursor).json()
+        self.assertFalse(page["has_more"])
+        self.assertEqual(self.summary(page), [
+            ("user", "upsert", kept.pk), ("user", "delete", gone_pk), ("invite", "upsert", str(invite.pk)),
+        ])
+        self.assertEqual(page["changes"][0]["data"]["first_name"], "Kept")
+        self.assertEqual(page["changes"][2]["data"]["email"], "guest@example.com")
+        self.assertEqual(page["cursor"], self.head())
+        self.assertEqual(self.feed(page["cursor"]).json()["changes"], [])
+
+    def test_pages(self):
+        cursor = self.head()
+        with self.captureOnCommitCallbacks(execute=True):
+            created = [User.objects.create_user(email=f"user{i}@example.com").pk for i in range(5)]
+        seen, pages = [], 0
+        while True:
+            page = self.feed(cursor, limit=2).json()
+            seen += [change["id"] for change in page["changes"]]
+            cursor, pages = page["cursor"], pages + 1
+            if not page["has_more"]:
+                break
+        self.assertEqual((seen, pages), (created, 3))
+
+    def test_an_entry_committed_late_is_not_skipped(self):
+        cursor = self.head()
+        first = User.objects.create_user(email="first@example.com")
+        second = User.objects.create_user(email="second@example.com")
+        # The second write committed first: only its entry is numbered before the read.
+        counter = ResourceVersion.objects.get(key=changelog.SEQ_KEY)
+        ChangeLogEntry.objects.filter(object_id=str(second.pk)).update(seq=counter.version + 1)
+        ResourceVersion.objects.filter(pk=counter.pk).update(version=counter.version + 1)
+        with mock.patch.object(changelog, "sequence"):
+            page = self.feed(cursor).json()
+        self.assertEqual(self.summary(page), [("user", "upsert", second.pk)])
+        self.assertEqual(self.summary(self.feed(page["cursor"]).json()), [("user", "upsert", first.pk)])
+
+    def test_compaction_keeps_results_and_expires_old_cursors(self):
+        start = self.head()
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create_user(email="user@example.com")
+            for name in ("A", "B", "C"):
+                user.first_name = name
+                user.save()
+        before = self.feed(start).json()
+        self.assertEqual(changelog.compact(retention_days=30), {"superseded": 3, "expired": 0})
+        self.assertEqual(self.feed(start).json(), before)
+
+        ChangeLogEntry.objects.update(created_at=timezone.now() - timedelta(days=31))
+        self.assertEqual(changelog.compact(retention_days=30)["expired"], 2)
+        response = self.feed(start)
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.json()["code"], "cursor_expired")
+        # With the log empty, a fresh cursor still starts after what was dropped.
+        self.assertEqual(self.feed(self.head()).json()["changes"], [])
+
+
+class AtomicWriteTests(TransactionTestCase):
+    """Writes outside a test transaction, as in a request: a change and its log entry commit together."""
+
+    def setUp(self):
+        reset_caches()
+        self.user = User.objects.create_user(email="me@example.com", first_name="Ada")
+
+    def state(self):
+        entries = ChangeLogEntry.objects.filter(kind=changelog.USER, object_id=str(self.user.pk)).count()
+        tokens = set(UserSearchToken.objects.filter(user=self.user).values_list("token", flat=True))
+        return User.objects.values_list("first_name", "row_version").get(pk=self.user.pk), entries, tokens
+
+    def assert_rolled_back(self, write):
+        before = self.state()
+        with mock.patch.object(changelog, "record", side_effect=RuntimeError("log unavailable")):
+            with self.assertRaises(RuntimeError):
+                write()
+        self.assertEqual(self.state(), before)
+
+    def test_failed_log_entry_rolls_back_the_profile_update(self):
+        client = client_for(self.user)
+        self.assert_rolled_back(lambda: client.patch("/api/auth/me/", {"first_name": "Grace"}, format="json"))
+
+        before = self.state()
+        self.assertEqual(client.patch("/api/auth/me/", {"first_name": "Grace"}, format="json").status_code, 200)
+        (name, row_version), entries, tokens = self.state()
+        self.assertEqual((name, row_version, entries), ("Grace", before[0][1] + 1, before[1] + 1))
+        self.assertIn("grace", tokens)
+
+    def test_async_profile_update(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        with self.settings(ROOT_URLCONF=__name__):
+            self.assert_rolled_back(lambda: self.client.patch(
+                "/api/auth/me/", json.dumps({"first_name": "Grace"}), content_type="application/json",
+                HTTP_AUTHORIZATION=f"Bearer {token}",
+            ))
+
+    def test_model_saves(self):
+        def save():
+            self.user.first_name = "Grace"
+            self.user.save()
+        self.assert_rolled_back(save)
+
+        invite = Invite.objects.create(email="guest@example.com", created_by=self.user)
+
+        def save_invite():
+            invite.first_name = "Guest"
+            invite.save()
+        with mock.patch.object(changelog, "record", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                save_invite()
+        self.assertEqual(Invite.objects.get(pk=invite.pk).first_name, "")
+
+
+class ProfileUpdateTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.user = User.objects.create_user(email="me@example.com", first_name="Ada", phone="+216 1", bio="Hi")
+        self.client = client_for(self.user)
+
+    def form(self):
+        # Profile.jsx sends the whole form, row_version included.
+        return self.client.get("/api/auth/me/").json()
+
+    def patch(self, body):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch("/api/auth/me/", body, format="json")
+        writes = [q["sql"] for q in ctx.captured_queries if q["sql"].split(None, 1)[0] in ("INSERT", "UPDATE", "DELETE")]
+        return response, writes
+
+    def test_unchanged_form_writes_nothing(self):
+        form = self.form()
+        response, writes = self.patch(form)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(writes, [])
+        self.assertEqual(response.json()["row_version"], form["row_version"])
+
+    def test_only_changed_columns_are_written(self):
+        form = self.form()
+        response, writes = self.patch({**form, "phone": "+216 2"})
+        self.assertEqual(response.status_code, 200)
+        updates = [sql for sql in writes if sql.startswith('UPDATE "accounts_user"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"phone"', updates[0])
+        self.assertNotIn('"bio"', updates[0])
+        self.assertEqual(response.json()["row_version"], form["row_version"] + 1)
+
+    def test_stale_row_version_is_refused(self):
+        form = self.form()
+        other = User.objects.get(pk=self.user.pk)
+        other.bio = "Changed elsewhere"
+        other.save()
+
+        response, writes = self.patch({**form, "phone": "+216 2"})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["code"], "row_version_conflict")
+        self.assertEqual(response.json()["current"]["bio"], "Changed elsewhere")
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.phone, self.user.bio), ("+216 1", "Changed elsewhere"))
+
+        # The edit, reapplied to the current version, goes through.
+        response, _ = self.patch({"phone": "+216 2", "row_version": response.json()["current"]["row_version"]})
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.phone, self.user.bio), ("+216 2", "Changed elsewhere"))
@@ -0,0 +1,89 @@
+"""
+Role claims in JWTs and token revocation through a per-user token version.
+
+Tokens issued at login (and on refresh) carry the user's ``role``,
+``is_active`` and ``token_version``. ``ClaimsJWTAuthentication`` builds
+``request.user`` from those claims, so role checks such as ``IsAdmin`` need no
+user row; the full row is only loaded if a view reads another attribute.
+
+A token is accepted only while its ``token_version`` matches the user's. The
+version is bumped when the role changes or the account is deactivated (see
+``User.save`` and ``accounts.bulk``), and a deleted user has none, so those
+events revoke every outstanding access and refresh token. Current versions are
+read through ``accounts.authentication.token_versions``, which keeps each one
+in process for ``TOKEN_VERSION_TTL`` seconds (then reads the user cache's
+``SHARED_CACHE`` or runs one primary-key query): a revocation applies at once
+in the process that made it and within those seconds in the others.
+"""
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+User = get_user_model()
+
+ROLE_CLAIM = "role"
+ACTIVE_CLAIM = "is_active"
+VERSION_CLAIM = "token_version"
+
+
+def add_claims(token, user):
+    token[ROLE_CLAIM] = user.role
+    token[ACTIVE_CLAIM] = user.is_active
+    token[VERSION_CLAIM] = user.token_version
+    return token
+
+
+def is_current(token, state):
+    """Whether ``token`` (carrying a version claim) matches the user's ``state``."""
+    version, is_active = state
+    if version is None or token.get(VERSION_CLAIM) != version:
+        return False
+    return is_active or not api_settings.CHECK_USER_IS_ACTIVE
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh that re-reads the user: revoked refresh tokens are refused and the
+    new access token carries the current claims, not the ones from login.
+    """
+    default_error_messages = {
+        "no_active_account": _("No active account found for the given token."),
+        "token_revoked": _("Token has been revoked."),
+    }
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+        # Refresh tokens issued before claims were added have no version to check.
+        if VERSION_CLAIM in refresh and refresh[VERSION_CLAIM] != user.token_version:
+            raise AuthenticationFailed(self.error_messages["token_revoked"], "token_revoked")
+
+        add_claims(refresh, user)
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # The token_blacklist app is not installed.
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data["refresh"] = str(refresh)
+
+        return data
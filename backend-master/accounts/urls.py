@@ -1,18 +1,39 @@
+from django.conf import settings
 from django.urls import path
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from .views import InviteCreateView, AcceptInviteView, MeView, UsersListView, UserDeleteView
+from rest_framework_simplejwt.views import TokenRefreshView
+from .views import LoginView, InviteCreateView, InviteBulkImportView, AcceptInviteView, MeView, UsersListView, UserSearchView, UserExportView, UserDeleteView, UserBulkActionView, UserChangesView
+
+if settings.ACCOUNTS_ASYNC_VIEWS:
+    # Native async views for ASGI deployments (see accounts/async_views.py);
+    # imported only when enabled, so WSGI workers don't load them.
+    from . import async_views
+
+    me_view = async_views.me
+    users_list_view = async_views.users_list
+    invite_create_view = async_views.invite_create
+    invite_accept_view = async_views.invite_accept
+else:
+    me_view = MeView.as_view()
+    users_list_view = UsersListView.as_view()
+    invite_create_view = InviteCreateView.as_view()
+    invite_accept_view = AcceptInviteView.as_view()
 
 urlpatterns = [
     # Auth (login only, no signup)
-    path("auth/login/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
+    path("auth/login/", LoginView.as_view(), name="token_obtain_pair"),
     path("auth/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
-    path("auth/me/", MeView.as_view(), name="me"),
+    path("auth/me/", me_view, name="me"),
 
     # Invitations
-    path("invites/", InviteCreateView.as_view(), name="invite-create"),
-    path("invites/accept/", AcceptInviteView.as_view(), name="invite-accept"),
+    path("invites/", invite_create_view, name="invite-create"),
+    path("invites/bulk/", InviteBulkImportView.as_view(), name="invite-bulk"),
+    path("invites/accept/", invite_accept_view, name="invite-accept"),
 
     # User management
-    path("users/", UsersListView.as_view(), name="users-list"),
+    path("users/", users_list_view, name="users-list"),
+    path("users/search/", UserSearchView.as_view(), name="users-search"),
+    path("users/export/", UserExportView.as_view(), name="users-export"),
+    path("users/bulk/", UserBulkActionView.as_view(), name="users-bulk"),
+    path("users/changes/", UserChangesView.as_view(), name="users-changes"),
     path("users/<int:pk>/", UserDeleteView.as_view(), name="user-delete"),
-]
\ No newline at end of file
+]
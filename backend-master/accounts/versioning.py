@@ -0,0 +1,170 @@
+"""
+Version counters for conditional GETs.
+
+Every write to a user bumps ``user:<id>`` and the ``users`` collection; every
+invite write bumps ``invites`` (after the writing transaction commits). Read
+endpoints derive their ETag and Last-Modified from these counters (one
+primary-key lookup) and return 304 before touching the serializer when the
+client is up to date. The same versions key their cached responses (see
+``core.response_cache``), so bumping a counter also retires those.
+"""
+import functools
+import hashlib
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from .models import ResourceVersion
+
+USERS = "users"
+INVITES = "invites"
+
+JSON = "application/json"
+
+
+def user_key(user_id):
+    return f"user:{user_id}"
+
+
+def bump(*keys):
+    """
+    Increment the counters of ``keys`` once the current transaction commits
+    (right away outside of one).
+
+    Every user write bumps the shared ``users`` row. Bumped after the commit,
+    in its own autocommit statement, that row is locked for one ``UPDATE``
+    instead of until the end of each writing transaction, so concurrent user
+    writes don't queue on it. A reader in between gets the new rows with the
+    old versions: a body newer than its ETag, which is already allowed for.
+    """
+    keys = list(dict.fromkeys(keys))
+    transaction.on_commit(functools.partial(_bump, keys))
+
+
+def _bump(keys):
+    now = timezone.now()
+    # One UPDATE for every counter that exists; only new keys are created one by one.
+    if ResourceVersion.objects.filter(key__in=keys).update(version=F("version") + 1, modified=now) == len(keys):
+        return
+    existing = set(ResourceVersion.objects.filter(key__in=keys).values_list("key", flat=True))
+    for key in keys:
+        if key in existing:
+            continue
+        try:
+            with transaction.atomic():
+                ResourceVersion.objects.create(key=key, version=1, modified=now)
+        except IntegrityError:
+            ResourceVersion.objects.filter(key=key).update(version=F("version") + 1, modified=now)
+
+
+def _versions(rows, keys):
+    rows = {key: (version, modified) for key, version, modified in rows}
+    versions = [rows.get(key, (0, None))[0] for key in keys]
+    stamps = [rows[key][1] for key in keys if key in rows]
+    return versions, (max(stamps) if stamps else None)
+
+
+def current(*keys):
+    """Return ``(versions, last_modified)`` for ``keys`` with a single query."""
+    return _versions(ResourceVersion.objects.filter(key__in=keys).values_list("key", "version", "modified"), keys)
+
+
+async def acurrent(*keys):
+    rows = [row async for row in ResourceVersion.objects.filter(key__in=keys).values_list("key", "version", "modified")]
+    return _versions(rows, keys)
+
+
+def _etag(keys, versions, scope, media_type):
+    raw = "|".join(f"{k}={v}" for k, v in zip(keys, versions)) + "|" + scope + "|" + media_type
+    return '"%s"' % hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+
+def validators(keys, scope="", media_type=JSON):
+    """
+    ETag and Last-Modified for a response built from ``keys``.
+
+    ``scope`` distinguishes representations of the same versions (e.g. the
+    query string of a filtered list), and so does ``media_type`` (JSON and
+    msgpack bodies of one resource get different ETags).
+    """
+    versions, last_modified = current(*keys)
+    return _etag(keys, versions, scope, media_type), last_modified
+
+
+async def avalidators(keys, scope="", media_type=JSON):
+    versions, last_modified = await acurrent(*keys)
+    return _etag(keys, versions, scope, media_type), last_modified
+
+
+def not_modified(request, etag, last_modified):
+    """The 304 response for ``request`` (an ``HttpRequest``), or ``None``."""
+    stamp = int(last_modified.timestamp()) if last_modified is not None else None
+    return get_conditional_response(request, etag=etag, last_modified=stamp)
+
+
+def apply_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    response["Cache-Control"] = "private, no-cache"
+    # The body depends on the negotiated renderer and on who is asking.
+    patch_vary_headers(response, ["Accept", "Authorization"])
+    return response
+
+
+class _NotModified(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """
+    For APIViews: answer ``If-None-Match`` / ``If-Modified-Since`` from version
+    counters right after authentication, before the handler serializes anything.
+    Successful responses carry the ETag / Last-Modified of the resource.
+    Subclasses define ``get_version_keys``; the versions read for a GET are kept
+    in ``versions`` (``{key: version}``), which keys ``cache_response`` entries.
+    """
+    _validators = None
+    versions = None
+
+    def get_version_keys(self, request):
+        raise NotImplementedError
+
+    def get_version_scope(self, request):
+        return request.get_full_path()
+
+    def get_validators(self, request):
+        keys = self.get_version_keys(request)
+        versions, last_modified = current(*keys)
+        self.versions = dict(zip(keys, versions))
+        etag = _etag(keys, versions, self.get_version_scope(request), request.accepted_media_type)
+        return etag, last_modified
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method not in ("GET", "HEAD"):
+            return
+        # Validators are read before the body, so a concurrent write can only
+        # make the body newer than its ETag, never older.
+        self._validators = self.get_validators(request)
+        response = not_modified(request._request, *self._validators)
+        if response is not None:
+            raise _NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if response.status_code == 304 or (200 <= response.status_code < 300 and not response.streaming):
+            if request.method in ("GET", "HEAD") and self._validators is not None:
+                apply_validators(response, *self._validators)
+            elif request.method in ("PUT", "PATCH"):
+                apply_validators(response, *self.get_validators(request))
+        return response
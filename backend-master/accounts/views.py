@@ -1,21 +1,73 @@
+import json
+
 from rest_framework import generics, permissions, status
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from django.contrib.auth.models import update_last_login
 from django.contrib.auth import get_user_model
+from django.http import StreamingHttpResponse
+from core.response_cache import cache_response
+from . import bulk, changelog, invite_import, login, versioning
+from .export import export_response
+from .models import RowVersionConflict
+from .pagination import KeysetPagination
+from .projection import projection
+from .renderers import CSVRenderer, NDJSONRenderer, fast_renderer_classes
+from .search import search_users
+from .tokens import ClaimsTokenObtainPairSerializer
+from .versioning import ConditionalGetMixin
 from .serializers import (
-    InviteCreateSerializer, AcceptInviteSerializer, UserMeSerializer, UserListSerializer
+    LoginSerializer, InviteCreateSerializer, AcceptInviteSerializer, UserMeSerializer, UserListSerializer,
+    UserBulkActionSerializer, ChangesQuerySerializer,
 )
-from .models import Invite
 
 User = get_user_model()
 
+ADMIN_ROLES = ["ADMIN", "admin", "HR", "hr"]
+
 
 class IsAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
             return False
         role = getattr(request.user, "role", "")
-        return role in ["ADMIN", "admin", "HR", "hr"]
+        return role in ADMIN_ROLES
+
+
+def permission_scope(request):
+    """Response cache scope: admins all see the same data, everyone else their own."""
+    if getattr(request.user, "role", "") in ADMIN_ROLES:
+        return "admin"
+    return f"user:{request.user.pk}"
+
+
+class LoginView(APIView):
+    """
+    Obtain a JWT pair, like ``TokenObtainPairView``, but with the password check
+    rate limited and run on the bounded hashing pool (see ``accounts.login``).
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def get_authenticate_header(self, request):
+        # Answer bad credentials with 401 (not 403), as TokenObtainPairView does.
+        return f'{jwt_settings.AUTH_HEADER_TYPES[0]} realm="api"'
+
+    def post(self, request):
+        serializer = LoginSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        user = login.authenticate(request, serializer.validated_data["email"], serializer.validated_data["password"])
+        if user is None:
+            raise AuthenticationFailed("No active account found with the given credentials", "no_active_account")
+
+        if jwt_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, user)
+        refresh = ClaimsTokenObtainPairSerializer.get_token(user)
+        return Response({"refresh": str(refresh), "access": str(refresh.access_token)})
 
 
 class InviteCreateView(generics.CreateAPIView):
@@ -23,31 +75,216 @@ class InviteCreateView(generics.CreateAPIView):
     permission_classes = [permissions.IsAuthenticated, IsAdmin]
 
 
+class InviteBulkImportView(APIView):
+    """
+    Import invites from a CSV or NDJSON upload (``file`` form field, or the raw
+    request body with a ``text/csv`` / ``application/x-ndjson`` content type).
+
+    The per-row report is streamed back as NDJSON, ending with a summary line.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        if request.content_type.startswith("multipart/form-data"):
+            upload = request.FILES.get("file")
+            if upload is None:
+                return Response({"detail": "Missing 'file' upload."}, status=status.HTTP_400_BAD_REQUEST)
+            fmt = invite_import.detect_format(upload.content_type, upload.name)
+            lines = upload
+        else:
+            fmt = invite_import.detect_format(request.content_type)
+            lines = request.stream or []
+
+        if fmt is None:
+            return Response(
+                {"detail": "Upload must be CSV or NDJSON."},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+
+        # Checked before the 200 goes out; later errors are reported in the stream.
+        try:
+            records = invite_import.open_upload(lines, fmt)
+        except invite_import.InvalidUpload as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        results = invite_import.import_invites(records, request.user)
+        return StreamingHttpResponse(
+            (json.dumps(r) + "\n" for r in results),
+            content_type="application/x-ndjson",
+        )
+
+
 class AcceptInviteView(generics.CreateAPIView):
     serializer_class = AcceptInviteSerializer
     permission_classes = [permissions.AllowAny]
 
 
-class MeView(APIView):
+class MeView(ConditionalGetMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = fast_renderer_classes()
 
+    def get_version_keys(self, request):
+        return [versioning.user_key(request.user.pk)]
+
+    @cache_response("me")
     def get(self, request):
-        return Response(UserMeSerializer(request.user).data)
+        # Read from the row, not the (possibly cached) request.user: the body
+        # must be at least as new as the version the ETag was taken from.
+        me = projection(UserMeSerializer)
+        user = User.objects.get(pk=request.user.pk)
+        return Response(me.compile_instance(me.select(request.query_params))(user))
 
     def patch(self, request):
-        serializer = UserMeSerializer(request.user, data=request.data, partial=True)
-        if serializer.is_valid():
+        # Compared against the current row, not the (possibly cached) request.user.
+        user = User.objects.get(pk=request.user.pk)
+        serializer = UserMeSerializer(user, data=request.data, partial=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        me = projection(UserMeSerializer)
+        try:
             serializer.save()
-            return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        except RowVersionConflict:
+            current = User.objects.get(pk=user.pk)
+            return Response(
+                {
+                    "detail": "The profile was changed since it was loaded.",
+                    "code": "row_version_conflict",
+                    "current": me.compile_instance(me.field_names)(current),
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(me.compile_instance(me.field_names)(user))
+
+
+def filter_users(qs, params):
+    """Apply the ``role``, ``is_active`` and ``search`` query filters."""
+    roles = [r.strip().upper() for r in params.get("role", "").split(",") if r.strip()]
+    if roles:
+        qs = qs.filter(role__in=roles)
+
+    is_active = params.get("is_active", "").lower()
+    if is_active in ("true", "1"):
+        qs = qs.filter(is_active=True)
+    elif is_active in ("false", "0"):
+        qs = qs.filter(is_active=False)
+
+    search = params.get("search", "").strip()
+    if search:
+        qs = search_users(search, qs)
+
+    return qs
+
+
+class UsersListView(ConditionalGetMixin, generics.ListAPIView):
+    """
+    Admin user directory.
+
+    Supports server-side filtering (``role``, ``is_active``, ``search``),
+    opt-in keyset pagination (``page_size`` / ``cursor``) and sparse fieldsets
+    (``fields=id,email,role``). Rows are read with ``values()`` and shaped by
+    the serializer's precompiled projection.
+    """
+    serializer_class = UserListSerializer
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+    pagination_class = KeysetPagination
+    renderer_classes = fast_renderer_classes()
+
+    def get_version_keys(self, request):
+        return [versioning.USERS]
+
+    def get_queryset(self):
+        return filter_users(User.objects.all(), self.request.query_params).order_by("-date_joined", "-id")
+
+    @cache_response("users", scope=permission_scope)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        users = projection(self.serializer_class)
+        names = users.select(request.query_params)
+        extract = users.compile(names)
+        # The cursor is built from (date_joined, id), so those are always fetched.
+        rows = self.get_queryset().values(*users.sources(names, extra=("id", "date_joined")))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response([extract(row) for row in page])
+        return Response([extract(row) for row in rows])
 
 
-class UsersListView(generics.ListAPIView):
+class UserExportView(APIView):
+    """
+    Stream the user directory as CSV (default) or NDJSON (``?format=ndjson``).
+
+    Accepts the same filters as the users list; ``?gzip=1`` compresses on the fly.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+
+    def get(self, request):
+        qs = filter_users(User.objects.all(), request.query_params)
+        compress = request.query_params.get("gzip", "").lower() in ("1", "true")
+        return export_response(qs, request.accepted_renderer.format, compress=compress)
+
+
+class UserSearchView(ConditionalGetMixin, generics.ListAPIView):
+    """Prefix search over names and emails: ``/api/users/search/?q=<terms>&limit=<n>``."""
     serializer_class = UserListSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdmin]
+    renderer_classes = fast_renderer_classes()
+    default_limit = 20
+    max_limit = 100
+
+    def get_version_keys(self, request):
+        return [versioning.USERS]
+
+    @cache_response("users-search", scope=permission_scope)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        users = projection(self.serializer_class)
+        names = users.select(request.query_params)
+        extract = users.compile(names)
+        return Response([extract(row) for row in self.get_queryset().values(*users.sources(names))])
 
     def get_queryset(self):
-        return User.objects.all().order_by("-date_joined")
+        params = self.request.query_params
+        try:
+            limit = min(max(int(params.get("limit", self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+        return search_users(params.get("q", "")).order_by("-date_joined", "-id")[:limit]
+
+
+class UserChangesView(APIView):
+    """
+    Incremental sync of the user directory and invites::
+
+        GET /api/users/changes/               -> {"cursor": "812", "has_more": false, "changes": []}
+        GET /api/users/changes/?since=812     -> upserts and tombstones after 812
+
+    Without ``since`` only the current cursor is returned: take it, load the
+    full list, then poll with ``since``. ``410 Gone`` means the cursor is
+    older than the log's retention and the list must be reloaded (see
+    ``accounts.changelog``).
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+    renderer_classes = fast_renderer_classes()
+
+    def get(self, request):
+        query = ChangesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        since = query.validated_data.get("since")
+        if since is None:
+            return Response({"cursor": str(changelog.head()), "has_more": False, "changes": []})
+        try:
+            return Response(changelog.changes(since, query.validated_data.get("limit")))
+        except changelog.CursorExpired:
+            return Response(
+                {"detail": "Cursor is too old; reload the full list.", "code": "cursor_expired"},
+                status=status.HTTP_410_GONE,
+            )
 
 
 class UserDeleteView(generics.DestroyAPIView):
@@ -63,8 +300,39 @@ class UserDeleteView(generics.DestroyAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Delete invites created by this user first (fixes FK constraint)
-        Invite.objects.filter(created_by=instance).delete()
-        
-        self.perform_destroy(instance)
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        # Set-based: the user's invites and other dependent rows go in one statement each.
+        bulk.delete_users([instance.pk])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UserBulkActionView(APIView):
+    """
+    Deactivate, reactivate or delete many users at once::
+
+        POST /api/users/bulk/  {"action": "deactivate", "ids": [12, 13, 14]}
+
+    Users are processed in chunked transactions with set-based statements (see
+    ``accounts.bulk``). Responds with the affected counts and the ids that did
+    not match any user.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def post(self, request):
+        serializer = UserBulkActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        action, ids = serializer.validated_data["action"], serializer.validated_data["ids"]
+
+        if request.user.pk in ids and action != bulk.REACTIVATE:
+            return Response(
+                {"error": "You cannot deactivate or delete your own account."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        found = set(User.objects.filter(pk__in=ids).values_list("pk", flat=True))
+        counts = bulk.apply(action, found)
+        return Response({
+            "action": action,
+            "requested": len(set(ids)),
+            **counts,
+            "not_found": sorted(set(ids) - found),
+        })
\ No newline at end of file
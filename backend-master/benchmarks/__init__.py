@@ -0,0 +1,6 @@
+"""
+Benchmarks for the backend API.
+
+Scripts are run from the backend directory, e.g.
+``python -m benchmarks.asgi_vs_wsgi --help``.
+"""
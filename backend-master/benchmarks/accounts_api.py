@@ -0,0 +1,368 @@
+"""
+Benchmark suite for the accounts API.
+
+Seeds a synthetic dataset (``benchmarks.seed``), then drives every route of
+``accounts/urls.py``:
+
+* in-process, through the DRF test client, one request at a time;
+* over HTTP, with ``benchmarks.loadgen`` against a threaded WSGI server
+  started in this process (idempotent routes only).
+
+Throughput, p50/p95/p99 latency and per-request query counts (from
+``core.instrumentation``) are written as JSON. With ``--baseline`` the run
+fails (exit status 1) when a scenario regresses by more than ``--threshold``
+against a stored result file.
+
+    python -m benchmarks.accounts_api --users 50000 --out bench.json
+    python -m benchmarks.accounts_api --baseline bench.json --threshold 0.25
+
+The database comes from ``benchmarks.settings`` (a temporary SQLite file by
+default) and is recreated on each run unless ``--reuse-db`` is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from .loadgen import percentile, run as loadgen_run
+
+# Scenario metrics compared against the baseline: (key, higher_is_better).
+COMPARED_METRICS = (("throughput_rps", True), ("p95_ms", False), ("avg_queries", False))
+# Latencies below this many ms are too noisy to flag as regressions.
+MIN_COMPARED_MS = 1.0
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: Callable[[int], str]
+    body: Optional[Callable[[int], object]] = None
+    headers: Callable[[int], dict] = lambda i: {}
+    iterations: Optional[int] = None  # overrides --iterations
+    content_type: str = "application/json"
+    http: bool = False  # safe to hammer over HTTP with one fixed request
+    setup: Optional[Callable[[int], None]] = None
+    expected: tuple = (200,)
+    state: dict = field(default_factory=dict)
+
+
+def build_scenarios(ctx):
+    """``ctx`` holds the admin token, a refresh token and helpers; see ``prepare``."""
+    auth = {"HTTP_AUTHORIZATION": f"Bearer {ctx['access']}"}
+
+    def accept_setup(n):
+        ctx["accept_tokens"] = ctx["make_invites"](n)
+
+    def delete_setup(n):
+        ctx["victims"] = ctx["make_users"](n)
+
+    return [
+        Scenario("login", "POST", lambda i: "/api/auth/login/",
+                 body=lambda i: {"email": ctx["user_email"](i), "password": ctx["password"]},
+                 headers=lambda i: {"REMOTE_ADDR": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"},
+                 iterations=50, http=True),
+        Scenario("refresh", "POST", lambda i: "/api/auth/refresh/", body=lambda i: {"refresh": ctx["refresh"]},
+                 http=True),
+        Scenario("me", "GET", lambda i: "/api/auth/me/", headers=lambda i: auth, http=True),
+        Scenario("me_not_modified", "GET", lambda i: "/api/auth/me/",
+                 headers=lambda i: {**auth, "HTTP_IF_NONE_MATCH": ctx["me_etag"]}, http=True, expected=(304,)),
+        Scenario("me_patch", "PATCH", lambda i: "/api/auth/me/", body=lambda i: {"bio": f"bench {i}"},
+                 headers=lambda i: auth),
+        Scenario("users_page", "GET", lambda i: "/api/users/?page_size=50", headers=lambda i: auth, http=True),
+        Scenario("users_filtered", "GET", lambda i: "/api/users/?role=ADMIN&is_active=true&page_size=50",
+                 headers=lambda i: auth, http=True),
+        Scenario("users_search_filter", "GET", lambda i: "/api/users/?search=ela&page_size=50",
+                 headers=lambda i: auth, http=True),
+        Scenario("users_full_list", "GET", lambda i: "/api/users/", headers=lambda i: auth, iterations=3),
+        Scenario("users_search", "GET", lambda i: "/api/users/search/?q=nora%20dub&limit=20",
+                 headers=lambda i: auth, http=True),
+        Scenario("users_export", "GET", lambda i: "/api/users/export/?format=ndjson", headers=lambda i: auth,
+                 iterations=3),
+        Scenario("invite_create", "POST", lambda i: "/api/invites/",
+                 body=lambda i: {"email": f"new-{uuid.uuid4().hex[:12]}@bench.example"},
+                 headers=lambda i: auth, expected=(201,)),
+        Scenario("invite_bulk", "POST", lambda i: "/api/invites/bulk/", content_type="text/csv",
+                 body=lambda i: "email,first_name,last_name\n" + "".join(
+                     f"bulk-{uuid.uuid4().hex[:12]}@bench.example,Bulk,Row\n" for _ in range(100)),
+                 headers=lambda i: auth, iterations=10),
+        Scenario("invite_accept", "POST", lambda i: "/api/invites/accept/",
+                 body=lambda i: {"token": ctx["accept_tokens"][i], "password": "Acc3pt-Password!"},
+                 setup=accept_setup, iterations=20, expected=(201,)),
+        Scenario("user_delete", "DELETE", lambda i: f"/api/users/{ctx['victims'][i]}/", headers=lambda i: auth,
+                 setup=delete_setup, iterations=50, expected=(204,)),
+    ]
+
+
+def prepare(admin):
+    """Tokens and data factories shared by the scenarios."""
+    from django.contrib.auth import get_user_model
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from accounts.models import Invite
+
+    from . import seed
+
+    User = get_user_model()
+    refresh = RefreshToken.for_user(admin)
+    ctx = {
+        "access": str(refresh.access_token),
+        "refresh": str(refresh),
+        "password": seed.PASSWORD,
+        "user_email": lambda i: seed.user_email(i % max(1, User.objects.count() - 1)),
+    }
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {ctx['access']}")
+    ctx["me_etag"] = client.get("/api/auth/me/")["ETag"]
+
+    def make_invites(n):
+        tag = uuid.uuid4().hex[:8]
+        invites = Invite.objects.bulk_create(
+            [Invite(email=f"accept-{tag}-{i}@bench.example", created_by=admin) for i in range(n)]
+        )
+        return [str(invite.id) for invite in invites]
+
+    def make_users(n):
+        tag = uuid.uuid4().hex[:8]
+        users = User.objects.bulk_create([User(email=f"victim-{tag}-{i}@bench.example") for i in range(n)])
+        return [user.pk for user in users]
+
+    ctx["make_invites"] = make_invites
+    ctx["make_users"] = make_users
+    return ctx
+
+
+def _query_stats():
+    from core import instrumentation
+
+    endpoints = instrumentation.as_dict()["endpoints"]
+    if not endpoints:
+        return {"avg_queries": 0.0, "max_queries": 0}
+    busiest = max(endpoints.values(), key=lambda e: e["requests"])
+    return {"avg_queries": busiest["avg_queries"], "max_queries": busiest["max_queries"]}
+
+
+def _summary(latencies, elapsed, statuses):
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "throughput_rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+    }
+
+
+def run_in_process(scenarios, iterations):
+    from collections import Counter
+
+    from rest_framework.test import APIClient
+
+    from core import instrumentation
+
+    client = APIClient()
+    results = {}
+    for scenario in scenarios:
+        n = scenario.iterations or iterations
+        if scenario.setup:
+            scenario.setup(n)
+        instrumentation.registry.reset()
+        latencies, statuses = [], Counter()
+        started = time.perf_counter()
+        for i in range(n):
+            body = scenario.body(i) if scenario.body else None
+            kwargs = dict(scenario.headers(i))
+            if body is not None:
+                if scenario.content_type == "application/json":
+                    kwargs["data"], kwargs["format"] = body, "json"
+                else:
+                    kwargs["data"], kwargs["content_type"] = body, scenario.content_type
+            t0 = time.perf_counter()
+            response = getattr(client, scenario.method.lower())(scenario.path(i), **kwargs)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            latencies.append(time.perf_counter() - t0)
+            statuses[response.status_code] += 1
+        elapsed = time.perf_counter() - started
+        results[scenario.name] = {**_summary(latencies, elapsed, statuses), **_query_stats()}
+        unexpected = sum(v for k, v in statuses.items() if k not in scenario.expected)
+        results[scenario.name]["unexpected_statuses"] = unexpected
+        _report("in-process", scenario.name, results[scenario.name])
+    return results
+
+
+def start_http_server():
+    """Threaded WSGI server for the project, on a free local port."""
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler, allow_reuse_address=True)
+    server.request_queue_size = 1024
+    server.set_app(WSGIHandler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _http_headers(scenario):
+    # Test-client style META keys -> real header names.
+    headers = {}
+    for key, value in scenario.headers(0).items():
+        if key.startswith("HTTP_"):
+            headers[key[5:].replace("_", "-").title()] = value
+    return headers
+
+
+def run_http(scenarios, clients, duration):
+    from core import instrumentation
+
+    server, base_url = start_http_server()
+    results = {}
+    try:
+        for scenario in scenarios:
+            if not scenario.http:
+                continue
+            headers = _http_headers(scenario)
+            body = None
+            if scenario.body:
+                body = json.dumps(scenario.body(0)).encode()
+                headers["Content-Type"] = scenario.content_type
+            instrumentation.registry.reset()
+            result = asyncio.run(loadgen_run(
+                base_url + scenario.path(0), concurrency=clients, duration=duration,
+                method=scenario.method, headers=headers, body=body,
+            ))
+            summary = result.summary()
+            results[scenario.name] = {
+                **{k: summary[k] for k in ("requests", "errors", "statuses", "throughput_rps", "p50_ms", "p95_ms", "p99_ms")},
+                **_query_stats(),
+            }
+            _report("http", scenario.name, results[scenario.name])
+    finally:
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+def _report(mode, name, r):
+    print(
+        f"{mode:10} {name:20} {r['throughput_rps']:>9} req/s  p50 {r['p50_ms']:>8} ms  "
+        f"p95 {r['p95_ms']:>8} ms  p99 {r['p99_ms']:>8} ms  queries {r['avg_queries']:>6}",
+        flush=True,
+    )
+
+
+def compare(results, baseline, threshold):
+    """Return a list of human-readable regressions of ``results`` against ``baseline``."""
+    regressions = []
+    for mode, scenarios in baseline.get("results", {}).items():
+        for name, base in scenarios.items():
+            current = results.get(mode, {}).get(name)
+            if current is None:
+                continue
+            for metric, higher_is_better in COMPARED_METRICS:
+                old, new = base.get(metric), current.get(metric)
+                if old is None or new is None:
+                    continue
+                if metric == "avg_queries":
+                    if new > old:
+                        regressions.append(f"{mode}/{name}: {metric} {old} -> {new}")
+                elif higher_is_better:
+                    if old and new < old * (1 - threshold):
+                        regressions.append(f"{mode}/{name}: {metric} {old} -> {new} (-{(1 - new / old):.0%})")
+                elif old >= MIN_COMPARED_MS and new > old * (1 + threshold):
+                    regressions.append(f"{mode}/{name}: {metric} {old} -> {new} (+{(new / old - 1):.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--invites", type=int, default=20000)
+    parser.add_argument("--iterations", type=int, default=200, help="requests per in-process scenario")
+    parser.add_argument("--http-clients", type=int, default=32)
+    parser.add_argument("--http-duration", type=float, default=5)
+    parser.add_argument("--mode", choices=["all", "inprocess", "http"], default="all")
+    parser.add_argument("--only", action="append", help="run only this scenario (repeatable)")
+    parser.add_argument("--reuse-db", action="store_true", help="keep an existing seeded database")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+    from django.conf import settings
+
+    django.setup()
+    from django.core.management import call_command
+
+    from . import seed
+
+    db_name = str(settings.DATABASES["default"]["NAME"])
+    fresh = settings.DATABASES["default"]["ENGINE"].endswith("sqlite3") and not args.reuse_db
+    if fresh and os.path.exists(db_name):
+        os.remove(db_name)
+    call_command("migrate", verbosity=0)
+
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+    admin = User.objects.filter(email=seed.ADMIN_EMAIL).first()
+    if admin is None or not args.reuse_db:
+        started = time.perf_counter()
+        admin = seed.seed(args.users, args.invites)
+        print(f"seeded {args.users} users and {args.invites} invites in {time.perf_counter() - started:.1f}s")
+
+    scenarios = build_scenarios(prepare(admin))
+    if args.only:
+        scenarios = [s for s in scenarios if s.name in args.only]
+
+    report = {
+        "meta": {
+            "users": args.users,
+            "invites": args.invites,
+            "iterations": args.iterations,
+            "http_clients": args.http_clients,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": settings.DATABASES["default"]["ENGINE"],
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+    if args.mode in ("all", "inprocess"):
+        report["results"]["inprocess"] = run_in_process(scenarios, args.iterations)
+    if args.mode in ("all", "http"):
+        report["results"]["http"] = run_http(scenarios, args.http_clients, args.http_duration)
+
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(report["results"], json.load(fh), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
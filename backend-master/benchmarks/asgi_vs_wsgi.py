@@ -0,0 +1,155 @@
+"""
+Compare the WSGI (sync DRF views) and ASGI (``accounts.async_views``)
+deployments under many concurrent clients.
+
+Each deployment is started from a shell command, warmed up, then driven by
+``benchmarks.loadgen`` with ``--clients`` keep-alive connections per path;
+throughput and latency percentiles are printed and optionally written as JSON.
+Both servers use the database configured for ``DJANGO_SETTINGS_MODULE``
+(``core.settings`` by default) with ``DB_NAME`` defaulting to a throw-away
+SQLite file, as in ``benchmarks.settings``, so the checked-in ``db.sqlite3`` is
+never written. The database is migrated up front and a benchmark admin is
+created for the run; if it did not exist before, it is deleted afterwards.
+
+    python -m benchmarks.asgi_vs_wsgi --clients 1000 --duration 30 --out asgi_vs_wsgi.json
+
+The default commands need ``gunicorn`` and ``uvicorn``; pass ``--wsgi-cmd`` /
+``--asgi-cmd`` for other servers, or ``--wsgi-url`` / ``--asgi-url`` to target
+servers that are already running (start the ASGI one with
+``ACCOUNTS_ASYNC_VIEWS=1``).
+"""
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+from . import loadgen
+
+DEFAULT_PATHS = ["/api/auth/me/", "/api/users/?page_size=50"]
+DEFAULT_WSGI_CMD = "gunicorn core.wsgi:application --bind 127.0.0.1:8101 --workers 4 --threads 8"
+DEFAULT_ASGI_CMD = "uvicorn core.asgi:application --host 127.0.0.1 --port 8102 --workers 4 --no-access-log"
+BENCH_EMAIL = "bench-admin@example.com"
+
+
+def prepare():
+    """Migrate the benchmark database; return an admin access token and the admin if created."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+    django.setup()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    call_command("migrate", verbosity=0)
+    User = get_user_model()
+    user, created = User.objects.get_or_create(email=BENCH_EMAIL, defaults={"role": User.Roles.ADMIN})
+    return str(AccessToken.for_user(user)), user if created else None
+
+
+def wait_for_port(url, timeout=30):
+    parts = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((parts.hostname, parts.port or 80), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not come up within {timeout}s")
+
+
+def start_server(cmd, url, env_overrides):
+    env = {**os.environ, **env_overrides}
+    process = subprocess.Popen(shlex.split(cmd), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(url)
+    except RuntimeError:
+        process.kill()
+        raise
+    return process
+
+
+def url_for(cmd):
+    """Best-effort base URL from a server command line (``--bind``/``--host``/``--port``)."""
+    args = shlex.split(cmd)
+    host, port = "127.0.0.1", "8000"
+    for flag, value in zip(args, args[1:]):
+        if flag in ("--bind", "-b"):
+            host, _, port = value.rpartition(":")
+        elif flag == "--host":
+            host = value
+        elif flag == "--port":
+            port = value
+    return f"http://{host}:{port}"
+
+
+def bench_deployment(name, base_url, paths, token, args):
+    headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+    results = {}
+    for path in paths:
+        url = base_url + path
+        asyncio.run(loadgen.run(url, concurrency=min(args.clients, 50), duration=args.warmup, headers=headers))
+        result = asyncio.run(loadgen.run(url, concurrency=args.clients, duration=args.duration, headers=headers))
+        results[path] = result.summary()
+        s = results[path]
+        print(
+            f"{name:5} {path:32} {s['throughput_rps']:>9} req/s  p50 {s['p50_ms']:>8} ms  "
+            f"p99 {s['p99_ms']:>8} ms  errors {s['errors']}",
+            flush=True,
+        )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=1000, help="concurrent keep-alive clients")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per path")
+    parser.add_argument("--warmup", type=float, default=3, help="warm-up seconds per path")
+    parser.add_argument("--path", dest="paths", action="append", help="path to hit (repeatable)")
+    parser.add_argument("--wsgi-cmd", default=DEFAULT_WSGI_CMD)
+    parser.add_argument("--asgi-cmd", default=DEFAULT_ASGI_CMD)
+    parser.add_argument("--wsgi-url", help="use a running WSGI server instead of starting one")
+    parser.add_argument("--asgi-url", help="use a running ASGI server instead of starting one")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    paths = args.paths or DEFAULT_PATHS
+    # Set before the servers start, so they inherit it.
+    os.environ.setdefault("DB_NAME", os.path.join(tempfile.gettempdir(), "zenstays-bench.sqlite3"))
+    token, created_user = prepare()
+    report = {"clients": args.clients, "duration_s": args.duration, "results": {}}
+
+    try:
+        for name, url, cmd, env in (
+            ("wsgi", args.wsgi_url, args.wsgi_cmd, {"ACCOUNTS_ASYNC_VIEWS": "0"}),
+            ("asgi", args.asgi_url, args.asgi_cmd, {"ACCOUNTS_ASYNC_VIEWS": "1"}),
+        ):
+            process = None
+            if url is None:
+                url = url_for(cmd)
+                process = start_server(cmd, url, env)
+            try:
+                report["results"][name] = bench_deployment(name, url.rstrip("/"), paths, token, args)
+            finally:
+                if process is not None:
+                    process.terminate()
+                    process.wait(timeout=30)
+    finally:
+        if created_user is not None:
+            created_user.delete()
+
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Write throughput under contention for each database profile of ``core.db``.
+
+Every profile runs in its own process (settings are fixed at import) with
+``--threads`` threads issuing write transactions for ``--duration`` seconds.
+Each transaction reads and then writes, like invite acceptance: it checks for
+a pending invite, creates one and updates the creator's profile (whose signal
+handlers bump version counters and refresh the search index). Committed
+transactions, "database is locked"/other errors and latency percentiles are
+reported per profile.
+
+    python -m benchmarks.db_contention --threads 16 --duration 10
+    python -m benchmarks.db_contention --profile postgres   # uses DB_* from the environment
+
+The SQLite profiles use a throw-away database file. The Postgres profile
+writes to the configured database and deletes its rows afterwards.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from .loadgen import percentile
+
+PROFILES = {
+    # The configuration before core.db: rollback journal, deferred transactions,
+    # a new connection per request.
+    "sqlite-untuned": {"DB_ENGINE": "sqlite", "DB_SQLITE_TUNING": "0", "DB_CONN_MAX_AGE": "0"},
+    # The defaults: rollback journal and deferred transactions, persistent connections.
+    "sqlite": {"DB_ENGINE": "sqlite"},
+    # WAL and IMMEDIATE transactions, for a database of its own (see core/db.py).
+    "sqlite-wal": {"DB_ENGINE": "sqlite", "DB_SQLITE_WAL": "1", "DB_SQLITE_TRANSACTION_MODE": "IMMEDIATE"},
+    "postgres": {"DB_ENGINE": "postgres"},
+}
+DEFAULT_PROFILES = ["sqlite-untuned", "sqlite", "sqlite-wal"]
+BENCH_EMAIL = "bench-writer@example.com"
+
+
+# ---------- Worker (runs inside one profile's process) ----------
+def worker(threads, duration):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.db import OperationalError, close_old_connections, connections, transaction
+
+    from accounts.models import Invite
+
+    User = get_user_model()
+    call_command("migrate", verbosity=0)
+    creator, _ = User.objects.get_or_create(email=BENCH_EMAIL, defaults={"role": User.Roles.ADMIN})
+    connections.close_all()
+
+    latencies, errors, locked = [], [0], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def run():
+        user = User.objects.get(pk=creator.pk)
+        while time.perf_counter() < deadline:
+            # Emulate the request cycle: connections are released/reused per "request".
+            close_old_connections()
+            email = f"bench-{uuid.uuid4().hex}@example.com"
+            start = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    if not Invite.objects.filter(email=email, is_accepted=False).exists():
+                        Invite.objects.create(email=email, created_by=user)
+                    user.bio = email
+                    user.save(update_fields=["bio"])
+            except OperationalError as exc:
+                with lock:
+                    errors[0] += 1
+                    locked[0] += "locked" in str(exc)
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+        connections.close_all()
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    Invite.objects.filter(created_by=creator).delete()
+    if settings.DATABASES["default"]["ENGINE"].endswith("postgresql"):
+        creator.delete()
+
+    latencies.sort()
+    return {
+        "engine": settings.DATABASES["default"]["ENGINE"].rsplit(".", 1)[-1],
+        "threads": threads,
+        "committed": len(latencies),
+        "errors": errors[0],
+        "locked_errors": locked[0],
+        "throughput_tps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+# ---------- Driver ----------
+def run_profile(name, threads, duration):
+    env = {**os.environ, **PROFILES[name]}
+    tmpdir = None
+    if env["DB_ENGINE"] == "sqlite":
+        tmpdir = tempfile.TemporaryDirectory()
+        env["DB_NAME"] = os.path.join(tmpdir.name, "bench.sqlite3")
+    try:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.db_contention", "--worker",
+             "--threads", str(threads), "--duration", str(duration)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+    finally:
+        if tmpdir is not None:
+            tmpdir.cleanup()
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profile", dest="profiles", action="append", choices=sorted(PROFILES))
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(worker(args.threads, args.duration)))
+        return 0
+
+    results = {}
+    for name in args.profiles or DEFAULT_PROFILES:
+        results[name] = r = run_profile(name, args.threads, args.duration)
+        print(
+            f"{name:15} {r['throughput_tps']:>8} tx/s  p50 {r['p50_ms']:>8} ms  p99 {r['p99_ms']:>8} ms  "
+            f"errors {r['errors']} (locked {r['locked_errors']})",
+            flush=True,
+        )
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
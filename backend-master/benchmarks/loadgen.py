@@ -0,0 +1,143 @@
+"""
+Minimal closed-loop HTTP/1.1 load generator (stdlib asyncio only).
+
+Each simulated client holds one keep-alive connection and sends its next
+request as soon as the previous response has been read, so ``concurrency``
+is the number of requests in flight. Latencies are recorded per request.
+"""
+import asyncio
+import resource
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+
+def raise_fd_limit(needed):
+    """Lift the soft open-files limit so ``needed`` sockets fit (best effort)."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = needed + 64
+    if soft < wanted:
+        target = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+@dataclass
+class Result:
+    latencies: list = field(default_factory=list)  # seconds
+    statuses: Counter = field(default_factory=Counter)
+    errors: int = 0
+    elapsed: float = 0.0
+
+    def summary(self):
+        values = sorted(self.latencies)
+        return {
+            "requests": len(values),
+            "errors": self.errors,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "elapsed_s": round(self.elapsed, 3),
+            "throughput_rps": round(len(values) / self.elapsed, 1) if self.elapsed else 0.0,
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+        }
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    status = int(status_line.split()[1])
+    length, chunked, close = 0, False, False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding" and "chunked" in value:
+            chunked = True
+        elif name == "connection" and value == "close":
+            close = True
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return status, close
+
+
+def build_request(method, url, headers=None, body=None):
+    parts = urlsplit(url)
+    target = parts.path or "/"
+    if parts.query:
+        target += "?" + parts.query
+    lines = [f"{method} {target} HTTP/1.1", f"Host: {parts.netloc}", "Connection: keep-alive"]
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    body = body or b""
+    if body:
+        lines.append(f"Content-Length: {len(body)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def _client(url, payload, deadline, remaining, result, connect_timeout):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    reader = writer = None
+    while time.perf_counter() < deadline and remaining[0] > 0:
+        remaining[0] -= 1
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), connect_timeout)
+            writer.write(payload)
+            await writer.drain()
+            status, close = await _read_response(reader)
+        except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+            result.errors += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+        result.latencies.append(time.perf_counter() - start)
+        result.statuses[status] += 1
+        if close:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run(url, concurrency=100, requests=None, duration=None, method="GET", headers=None, body=None,
+              connect_timeout=10):
+    """
+    Hit ``url`` with ``concurrency`` clients until ``requests`` have been sent
+    or ``duration`` seconds have passed (at least one must be given).
+    """
+    if requests is None and duration is None:
+        raise ValueError("Give requests or duration.")
+    raise_fd_limit(concurrency)
+    payload = build_request(method, url, headers, body)
+    result = Result()
+    remaining = [requests if requests is not None else float("inf")]
+    start = time.perf_counter()
+    deadline = start + duration if duration is not None else float("inf")
+    await asyncio.gather(*(
+        _client(url, payload, deadline, remaining, result, connect_timeout) for _ in range(concurrency)
+    ))
+    result.elapsed = time.perf_counter() - start
+    return result
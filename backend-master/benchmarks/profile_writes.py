@@ -0,0 +1,244 @@
+"""
+Write cost of profile updates (``PATCH /api/auth/me/``): the full-row save the
+endpoint used to do against the changed-fields save it does now.
+
+``Profile.jsx`` sends the whole form on every save. Each workload replays such
+bodies against ``--users`` users with a ``--bio-size`` character bio:
+
+* ``one_field``: the form with the phone number edited;
+* ``three_fields``: first name, location and phone edited;
+* ``unchanged``: the form saved without edits.
+
+Both paths run the endpoint's steps in-process (load the row, validate, save,
+build the response). ``full_save`` saves through ``ModelSerializer.update``,
+which writes every column; ``changed_fields`` through ``UserMeSerializer``,
+which writes the changed columns only and skips unchanged forms. Reported per
+path and workload: ``UPDATE`` statements on the user table and the columns
+they set, all write statements (signal handlers included) and queries per
+save, and latency. Then each path runs from ``--threads`` threads at once, one
+user per thread, for ``--duration`` seconds: saves per second and "database is
+locked" errors.
+
+    python -m benchmarks.profile_writes --iterations 500 --threads 8 --out profile_writes.json
+
+The database comes from ``benchmarks.settings`` (a temporary SQLite file by
+default) and is recreated on each run.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from .loadgen import percentile
+
+WORKLOADS = ("one_field", "three_fields", "unchanged")
+PATHS = ("full_save", "changed_fields")
+EMAIL_PREFIX = "bench-profile-"
+# Fields Profile.jsx sends that the endpoint ignores.
+FORM_EXTRAS = {"department": "", "gender": "Not set", "date_of_birth": "", "marital_status": "Not set",
+               "nationality": "Not set"}
+FORM_FIELDS = ("first_name", "last_name", "email", "phone", "location", "role", "bio")
+
+_SET_COLUMN_RE = re.compile(r'"\w+" = ')
+
+
+def form(values, workload, i):
+    """The body Profile.jsx would send for the ``i``-th save of ``workload``."""
+    body = {**values, **FORM_EXTRAS}
+    if workload in ("one_field", "three_fields"):
+        body["phone"] = f"+216 {i:08d}"
+    if workload == "three_fields":
+        body["first_name"] = f"Bench{i}"
+        body["location"] = f"City {i % 97}"
+    return body
+
+
+def build_paths():
+    from django.contrib.auth import get_user_model
+    from rest_framework import serializers
+
+    from accounts.projection import projection
+    from accounts.serializers import UserMeSerializer
+
+    User = get_user_model()
+    me = projection(UserMeSerializer)
+
+    def full_save(pk, body):
+        # MeView.patch before: a full-row save and the serializer's representation.
+        user = User.objects.get(pk=pk)
+        serializer = UserMeSerializer(user, data=body, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializers.ModelSerializer.update(serializer, user, serializer.validated_data)
+        return serializer.data
+
+    def changed_fields(pk, body):
+        user = User.objects.get(pk=pk)
+        serializer = UserMeSerializer(user, data=body, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return me.compile_instance(me.field_names)(user)
+
+    return {"full_save": full_save, "changed_fields": changed_fields}
+
+
+def current_forms(pks):
+    """The form as loaded from the stored profiles, so ``unchanged`` really is."""
+    from django.contrib.auth import get_user_model
+
+    rows = get_user_model().objects.filter(pk__in=list(pks)).order_by("pk").values("pk", *FORM_FIELDS)
+    return {row.pop("pk"): row for row in rows}
+
+
+def write_stats(queries):
+    updates = [q["sql"] for q in queries if q["sql"].startswith('UPDATE "accounts_user" SET ')]
+    columns = [len(_SET_COLUMN_RE.findall(sql.split(" SET ", 1)[1].split(" WHERE ", 1)[0])) for sql in updates]
+    writes = [q for q in queries if q["sql"].split(None, 1)[0] in ("INSERT", "UPDATE", "DELETE")]
+    return len(updates), sum(columns), len(writes), len(queries)
+
+
+# ---------- Sequential ----------
+def measure(save, users, workload, iterations):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    forms = current_forms(users)
+    pks = list(forms)
+    latencies = []
+    for i in range(iterations):
+        pk = pks[i % len(pks)]
+        body = form(forms[pk], workload, i)
+        start = time.perf_counter()
+        save(pk, body)
+        latencies.append(time.perf_counter() - start)
+
+    # Statement counts from a separate pass, so capturing doesn't skew the timings.
+    counted = min(iterations, 50)
+    with CaptureQueriesContext(connection) as ctx:
+        for i in range(iterations, iterations + counted):
+            pk = pks[i % len(pks)]
+            save(pk, form(forms[pk], workload, i))
+    updates, columns, writes, queries = write_stats(ctx.captured_queries)
+
+    latencies.sort()
+    return {
+        "user_updates_per_save": round(updates / counted, 2),
+        "columns_per_update": round(columns / updates, 1) if updates else 0,
+        "writes_per_save": round(writes / counted, 2),
+        "queries_per_save": round(queries / counted, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+    }
+
+
+# ---------- Concurrent ----------
+def contend(save, users, workload, threads, duration):
+    from django.db import OperationalError, close_old_connections, connections
+
+    forms = current_forms(list(users)[:threads])
+    latencies, errors, locked = [], [0], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def run(pk):
+        i = 0
+        while time.perf_counter() < deadline:
+            close_old_connections()
+            i += 1
+            start = time.perf_counter()
+            try:
+                save(pk, form(forms[pk], workload, i))
+            except OperationalError as exc:
+                with lock:
+                    errors[0] += 1
+                    locked[0] += "locked" in str(exc)
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+        connections.close_all()
+
+    pool = [threading.Thread(target=run, args=(pk,)) for pk in forms]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "saves_per_s": round(len(latencies) / elapsed, 1),
+        "errors": errors[0],
+        "locked_errors": locked[0],
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+    }
+
+
+# ---------- Driver ----------
+def setup(n_users, bio_size):
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+
+    db = settings.DATABASES["default"]
+    if db["ENGINE"].endswith("sqlite3") and os.path.exists(str(db["NAME"])):
+        os.remove(str(db["NAME"]))
+    call_command("migrate", verbosity=0)
+
+    User = get_user_model()
+    User.objects.filter(email__startswith=EMAIL_PREFIX).delete()
+    bio = ("Loves hosting guests and long walks on the beach. " * (bio_size // 50 + 1))[:bio_size]
+    User.objects.bulk_create([
+        User(email=f"{EMAIL_PREFIX}{i}@example.com", first_name="Bench", last_name=f"User{i}",
+             role=User.Roles.CLIENT, phone="+216 00000000", location="Tunis", bio=bio)
+        for i in range(n_users)
+    ])
+    return list(User.objects.filter(email__startswith=EMAIL_PREFIX).order_by("pk").values_list("pk", flat=True))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--bio-size", type=int, default=1000, help="characters of each user's bio")
+    parser.add_argument("--iterations", type=int, default=300, help="saves per path and workload")
+    parser.add_argument("--threads", type=int, default=8, help="0 skips the concurrent runs")
+    parser.add_argument("--duration", type=float, default=3, help="seconds per concurrent run")
+    parser.add_argument("--workload", dest="workloads", action="append", choices=WORKLOADS)
+    parser.add_argument("--out", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+    django.setup()
+    from django.contrib.auth import get_user_model
+
+    users = setup(max(args.users, args.threads), args.bio_size)
+    paths = build_paths()
+
+    results = {}
+    print(f"{'workload':<14}{'path':<16}{'updates':>9}{'columns':>9}{'writes':>8}{'queries':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'saves/s':>10}{'locked':>8}")
+    for workload in args.workloads or WORKLOADS:
+        for name in PATHS:
+            r = measure(paths[name], users, workload, args.iterations)
+            if args.threads:
+                r["concurrent"] = contend(paths[name], users, workload, args.threads, args.duration)
+            results.setdefault(workload, {})[name] = r
+            concurrent = r.get("concurrent", {})
+            print(f"{workload:<14}{name:<16}{r['user_updates_per_save']:>9}{r['columns_per_update']:>9}"
+                  f"{r['writes_per_save']:>8}{r['queries_per_save']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+                  f"{concurrent.get('saves_per_s', '-'):>10}{concurrent.get('locked_errors', '-'):>8}",
+                  flush=True)
+
+    get_user_model().objects.filter(email__startswith=EMAIL_PREFIX).delete()
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump({"meta": vars(args), "results": results}, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
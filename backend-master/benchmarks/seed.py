@@ -0,0 +1,100 @@
+"""
+Synthetic users and invites for benchmarks, inserted with ``bulk_create``.
+
+All seeded users share one password (hashed once), so logins can be
+benchmarked without paying for a hash per inserted row.
+
+    DJANGO_SETTINGS_MODULE=benchmarks.settings python -m benchmarks.seed --users 50000 --invites 20000
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+from datetime import timedelta
+
+PASSWORD = "bench-Password-1"
+ADMIN_EMAIL = "admin@bench.example"
+FIRST_NAMES = ["Amira", "Bechir", "Chloe", "Dario", "Elodie", "Farah", "Gustav", "Hana", "Ines", "Jonas",
+               "Karim", "Lea", "Malik", "Nora", "Omar", "Paula", "Rami", "Sofia", "Tariq", "Yasmine"]
+LAST_NAMES = ["Ben Ali", "Durand", "Garcia", "Haddad", "Karmeni", "Lambert", "Martin", "Nguyen", "Rossi",
+              "Schmidt", "Trabelsi", "Dubois", "Moreau", "Jaziri", "Fischer", "Costa", "Novak", "Smith"]
+
+
+def user_email(i):
+    return f"user{i:07d}@bench.example"
+
+
+def seed(users=50000, invites=20000, batch_size=5000, seed_value=42):
+    """Insert ``users`` users and ``invites`` invites; returns the admin user."""
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.utils import timezone
+
+    from accounts import search, versioning
+    from accounts.models import Invite
+
+    User = get_user_model()
+    rng = random.Random(seed_value)
+    password = make_password(PASSWORD)
+    now = timezone.now()
+
+    admin = User.objects.filter(email=ADMIN_EMAIL).first()
+    if admin is None:
+        admin = User.objects.create_user(email=ADMIN_EMAIL, password=PASSWORD, role=User.Roles.ADMIN)
+
+    start = User.objects.filter(email__endswith="@bench.example").exclude(pk=admin.pk).count()
+    roles = [User.Roles.CLIENT] * 19 + [User.Roles.ADMIN]
+    rows = (
+        User(
+            email=user_email(i),
+            password=password,
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            role=rng.choice(roles),
+            is_active=rng.random() > 0.05,
+            date_joined=now - timedelta(seconds=start + users - i),
+        )
+        for i in range(start, start + users)
+    )
+    for batch in iter(lambda: list(itertools.islice(rows, batch_size)), []):
+        User.objects.bulk_create(batch, batch_size=batch_size)
+
+    invite_rows = (
+        Invite(
+            email=f"invitee{i:07d}-{rng.getrandbits(32):08x}@bench.example",
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            created_by=admin,
+            is_accepted=i % 3 == 0,
+        )
+        for i in range(invites)
+    )
+    for batch in iter(lambda: list(itertools.islice(invite_rows, batch_size)), []):
+        Invite.objects.bulk_create(batch, batch_size=batch_size)
+
+    # bulk_create sends no signals: index and version the new rows by hand.
+    search.rebuild_index(batch_size=batch_size)
+    versioning.bump(versioning.USERS, versioning.INVITES)
+    return admin
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--invites", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+    django.setup()
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+    seed(args.users, args.invites, args.batch_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
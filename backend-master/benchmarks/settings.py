@@ -0,0 +1,25 @@
+"""
+Settings for the benchmark suite: the project settings against a throw-away
+SQLite file (unless ``DB_ENGINE``/``DB_NAME`` say otherwise), without DEBUG
+query logging, the slow-request log or login throttling skewing the numbers.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DB_NAME", os.path.join(tempfile.gettempdir(), "zenstays-bench.sqlite3"))
+
+from core.settings import *  # noqa: E402,F401,F403
+from core.settings import ACCOUNTS_LOGIN, REQUEST_STATS  # noqa: E402
+
+DEBUG = False
+
+ACCOUNTS_LOGIN = {
+    **ACCOUNTS_LOGIN,
+    "IP_BURST": 10 ** 9,
+    "IP_PER_MINUTE": 10 ** 9,
+    "EMAIL_BURST": 10 ** 9,
+    "EMAIL_PER_MINUTE": 10 ** 9,
+    "HASH_QUEUE": 10 ** 4,
+}
+
+REQUEST_STATS = {**REQUEST_STATS, "SLOW_REQUEST_MS": None}
@@ -0,0 +1,178 @@
+"""
+Worker start-up cost of the full and the API-only settings profiles.
+
+For each profile a fresh interpreter is started ``--runs`` times. Each one
+builds the WSGI application (``django.setup()`` plus the handler and its
+middleware), then serves ``GET --path`` to itself through the WSGI callable,
+with an admin's bearer token, until the response has been read. Reported per
+profile (medians over the runs):
+
+* ``import_ms``: importing Django and the project and building the application;
+* ``first_response_ms``: the first request, which also loads the URLconf and
+  the views;
+* ``ready_ms``: both together, roughly what a new worker costs before it has
+  answered anything;
+* ``process_ms``: wall time of the whole child process, interpreter start-up
+  included;
+* ``warm_ms``: median of the ``--requests`` requests after the first one;
+* the number of modules loaded, installed apps and middleware.
+
+    python -m benchmarks.startup --runs 10
+    python -m benchmarks.startup --profile api=core.settings_api --importtime 15 --out startup.json
+
+Both profiles use the same throw-away SQLite database (``DB_NAME`` from the
+environment, as in ``benchmarks.settings``), migrated once up front.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_PROFILES = ["full=core.settings", "api=core.settings_api"]
+DEFAULT_PATH = "/api/auth/me/"
+BENCH_EMAIL = "bench-admin@example.com"
+RESULT_PREFIX = "STARTUP-RESULT "
+
+
+def child(path, token, requests):
+    """Runs in the measured interpreter; prints one JSON line of timings."""
+    t0 = time.perf_counter()
+    from django.conf import settings
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+    t1 = time.perf_counter()
+
+    from wsgiref.util import setup_testing_defaults
+
+    def request():
+        environ = {"PATH_INFO": path, "HTTP_AUTHORIZATION": f"Bearer {token}"}
+        setup_testing_defaults(environ)
+        status = []
+        body = b"".join(application(environ, lambda s, headers, exc_info=None: status.append(s)))
+        if not status[0].startswith("200"):
+            raise SystemExit(f"GET {path} returned {status[0]}: {body[:200]!r}")
+
+    request()
+    t2 = time.perf_counter()
+    warm = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        request()
+        warm.append((time.perf_counter() - start) * 1000)
+
+    print(RESULT_PREFIX + json.dumps({
+        "import_ms": (t1 - t0) * 1000,
+        "first_response_ms": (t2 - t1) * 1000,
+        "ready_ms": (t2 - t0) * 1000,
+        "warm_ms": statistics.median(warm) if warm else None,
+        "modules": len(sys.modules),
+        "apps": len(settings.INSTALLED_APPS),
+        "middleware": len(settings.MIDDLEWARE),
+    }))
+
+
+def prepare():
+    """Migrate the benchmark database and return an admin access token."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+    django.setup()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+
+    from accounts.tokens import ClaimsTokenObtainPairSerializer
+
+    call_command("migrate", verbosity=0)
+    User = get_user_model()
+    user, _ = User.objects.get_or_create(email=BENCH_EMAIL, defaults={"role": User.Roles.ADMIN})
+    return str(ClaimsTokenObtainPairSerializer.get_token(user).access_token)
+
+
+def run_child(settings_module, args, token, importtime=False):
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings_module}
+    cmd = [sys.executable, *(["-X", "importtime"] if importtime else []), "-m", "benchmarks.startup",
+           "--child", "--path", args.path, "--token", token, "--requests", str(args.requests)]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    elapsed = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"{settings_module}: child failed\n{proc.stdout}{proc.stderr}")
+    line = next(line for line in proc.stdout.splitlines() if line.startswith(RESULT_PREFIX))
+    return {**json.loads(line[len(RESULT_PREFIX):]), "process_ms": elapsed}, proc.stderr
+
+
+def slowest_imports(stderr, limit):
+    """Top-level modules by cumulative import time from ``-X importtime`` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if name.startswith("  ") or not cumulative.strip().isdigit():
+            continue  # nested import, or the header
+        rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def summarize(results):
+    summary = {}
+    for key in ("import_ms", "first_response_ms", "ready_ms", "process_ms", "warm_ms"):
+        values = [r[key] for r in results if r[key] is not None]
+        summary[key] = round(statistics.median(values), 2) if values else None
+    for key in ("modules", "apps", "middleware"):
+        summary[key] = results[-1][key]
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", action="append", dest="profiles", metavar="NAME=SETTINGS",
+                        help=f"Settings profile to measure (repeatable; default: {' '.join(DEFAULT_PROFILES)}).")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per profile.")
+    parser.add_argument("--path", default=DEFAULT_PATH, help="Path of the measured GET request.")
+    parser.add_argument("--requests", type=int, default=20, help="Warm requests after the first one.")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="Also list the N slowest top-level imports of each profile.")
+    parser.add_argument("--out", help="Write the results as JSON to this file.")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--token", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.path, args.token, args.requests)
+        return 0
+
+    os.environ.setdefault("DB_NAME", os.path.join(tempfile.gettempdir(), "zenstays-bench.sqlite3"))
+    token = prepare()
+
+    report = {}
+    for spec in args.profiles or DEFAULT_PROFILES:
+        name, _, settings_module = spec.partition("=")
+        runs = [run_child(settings_module, args, token)[0] for _ in range(args.runs)]
+        report[name] = {"settings": settings_module, **summarize(runs)}
+        if args.importtime:
+            _, stderr = run_child(settings_module, args, token, importtime=True)
+            report[name]["slowest_imports"] = slowest_imports(stderr, args.importtime)
+
+    columns = ("import_ms", "first_response_ms", "ready_ms", "process_ms", "warm_ms", "modules", "apps", "middleware")
+    print(f"{'profile':<10}" + "".join(f"{c:>{len(c) + 2}}" for c in columns))
+    for name, row in report.items():
+        print(f"{name:<10}" + "".join(f"{'-' if row[c] is None else row[c]:>{len(c) + 2}}" for c in columns))
+    for name, row in report.items():
+        if row.get("slowest_imports"):
+            print(f"\nSlowest imports ({name}):")
+            for ms, module in row["slowest_imports"]:
+                print(f"  {ms:8.1f} ms  {module}")
+
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
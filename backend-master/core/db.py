@@ -0,0 +1,164 @@
+"""
+``DATABASES`` built from the environment.
+
+Two profiles, picked with ``DB_ENGINE``:
+
+``sqlite`` (default)
+    The project's ``db.sqlite3`` (or ``DB_NAME``), with a ``busy_timeout`` so
+    writers queue for the lock instead of failing with "database is locked",
+    and a memory-mapped read path. Two more settings help under concurrent
+    writes and are opt-in:
+
+    * ``DB_SQLITE_WAL=1``: WAL journaling, so readers never block the writer,
+      with ``synchronous=NORMAL`` (durable at checkpoints, far fewer fsyncs).
+      The journal mode is stored in the database file, so this rewrites it;
+      it is meant for a deployment's own database, not the ``db.sqlite3``
+      checked into the repository. Switching once is enough
+      (``sqlite3 db.sqlite3 "PRAGMA journal_mode=WAL"``); the setting then
+      only adds ``synchronous=NORMAL``.
+    * ``DB_SQLITE_TRANSACTION_MODE=IMMEDIATE``: every ``atomic()`` block takes
+      the write lock when it starts, read-only ones included. A deferred
+      transaction that reads first and then writes cannot wait for the lock
+      (the busy timeout does not apply to that upgrade), which is where most
+      "database is locked" errors under concurrent writes come from; the code
+      paths that read and then write call ``write_lock`` instead, which gets
+      them the same without serializing everything else.
+
+``postgres``
+    ``DB_NAME``/``DB_USER``/``DB_PASSWORD``/``DB_HOST``/``DB_PORT``. With
+    ``DB_POOL_MAX_SIZE`` > 0 (Django 5.1+, psycopg 3) connections come from a
+    process-wide pool; otherwise they are kept open for ``DB_CONN_MAX_AGE``
+    seconds and health-checked before reuse.
+
+Persistent connections (``DB_CONN_MAX_AGE``, default 60s) apply to both
+profiles, so requests no longer open a fresh connection each time.
+"""
+import os
+
+import django
+from django.db import connections, router
+from django.db.backends.signals import connection_created
+
+SQLITE = "sqlite"
+POSTGRES = "postgres"
+SQLITE_TRANSACTION_MODES = ("DEFERRED", "IMMEDIATE", "EXCLUSIVE")
+
+# Django 5.1 added SQLite "init_command"/"transaction_mode" and the Postgres pool.
+HAS_NATIVE_OPTIONS = django.VERSION >= (5, 1)
+
+
+def _env_int(env, name, default):
+    value = env.get(name, "")
+    return int(value) if value.strip() else default
+
+
+def _env_bool(env, name, default):
+    value = env.get(name, "").strip().lower()
+    if not value:
+        return default
+    return value in ("1", "true", "yes", "on")
+
+
+def sqlite_pragmas(env=os.environ):
+    pragmas = [f"PRAGMA mmap_size={_env_int(env, 'DB_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)}"]
+    if _env_bool(env, "DB_SQLITE_WAL", False):
+        pragmas += ["PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL"]
+    return pragmas
+
+
+def sqlite_transaction_mode(env=os.environ):
+    mode = env.get("DB_SQLITE_TRANSACTION_MODE", "").strip().upper()
+    if mode and mode not in SQLITE_TRANSACTION_MODES:
+        raise ValueError(f"Unsupported DB_SQLITE_TRANSACTION_MODE {mode!r}; use one of {SQLITE_TRANSACTION_MODES}.")
+    return mode or None
+
+
+def sqlite_config(base_dir, env=os.environ):
+    config = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": env.get("DB_NAME") or base_dir / "db.sqlite3",
+        "CONN_MAX_AGE": _env_int(env, "DB_CONN_MAX_AGE", 60),
+        "OPTIONS": {
+            # Passed to sqlite3.connect(), which sets the connection's busy_timeout.
+            "timeout": _env_int(env, "DB_SQLITE_BUSY_TIMEOUT_MS", 5000) / 1000,
+        },
+    }
+    if not _env_bool(env, "DB_SQLITE_TUNING", True):
+        return config
+    if HAS_NATIVE_OPTIONS:
+        config["OPTIONS"]["init_command"] = ";".join(sqlite_pragmas(env))
+        mode = sqlite_transaction_mode(env)
+        if mode:
+            config["OPTIONS"]["transaction_mode"] = mode
+    else:
+        _legacy_pragmas[:] = sqlite_pragmas(env)
+    return config
+
+
+def postgres_config(env=os.environ):
+    config = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": env.get("DB_NAME", "zenstays"),
+        "USER": env.get("DB_USER", ""),
+        "PASSWORD": env.get("DB_PASSWORD", ""),
+        "HOST": env.get("DB_HOST", ""),
+        "PORT": env.get("DB_PORT", ""),
+        "OPTIONS": {},
+    }
+    pool_max = _env_int(env, "DB_POOL_MAX_SIZE", 0)
+    if pool_max > 0 and HAS_NATIVE_OPTIONS:
+        config["OPTIONS"]["pool"] = {
+            "min_size": _env_int(env, "DB_POOL_MIN_SIZE", 2),
+            "max_size": pool_max,
+            "timeout": _env_int(env, "DB_POOL_TIMEOUT", 10),
+        }
+        # The pool owns connection lifetime; Django must not keep its own.
+        config["CONN_MAX_AGE"] = 0
+    else:
+        config["CONN_MAX_AGE"] = _env_int(env, "DB_CONN_MAX_AGE", 60)
+        config["CONN_HEALTH_CHECKS"] = _env_bool(env, "DB_CONN_HEALTH_CHECKS", True)
+    return config
+
+
+def databases(base_dir, env=os.environ):
+    engine = env.get("DB_ENGINE", SQLITE).strip().lower()
+    if engine in (POSTGRES, "postgresql"):
+        return {"default": postgres_config(env)}
+    if engine in (SQLITE, "sqlite3"):
+        return {"default": sqlite_config(base_dir, env)}
+    raise ValueError(f"Unsupported DB_ENGINE {engine!r}; use 'sqlite' or 'postgres'.")
+
+
+# ---------- Taking the SQLite write lock ----------
+def write_lock(model):
+    """
+    Inside ``atomic()``, take the database write lock before reading rows the
+    transaction is going to write (SQLite's counterpart of ``select_for_update``).
+
+    A no-op ``UPDATE`` as the transaction's first statement takes the lock, and
+    waits for it up to the busy timeout. Nothing to do on other databases, or
+    when transactions already start ``IMMEDIATE``/``EXCLUSIVE``.
+    """
+    connection = connections[router.db_for_write(model)]
+    if connection.vendor != "sqlite":
+        return
+    if connection.settings_dict["OPTIONS"].get("transaction_mode") in ("IMMEDIATE", "EXCLUSIVE"):
+        return
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(f"UPDATE {table} SET {pk} = {pk} WHERE 0")
+
+
+# ---------- Django < 5.1: apply the SQLite pragmas on connect ----------
+_legacy_pragmas = []
+
+
+def _apply_legacy_pragmas(sender, connection, **kwargs):
+    if connection.vendor == "sqlite" and _legacy_pragmas:
+        with connection.cursor() as cursor:
+            for pragma in _legacy_pragmas:
+                cursor.execute(pragma)
+
+
+connection_created.connect(_apply_legacy_pragmas)
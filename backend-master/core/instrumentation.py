@@ -0,0 +1,343 @@
+"""
+Per-request latency and query instrumentation.
+
+``RequestStatsMiddleware`` times every request and, through a database
+``execute_wrapper`` installed on each connection as it opens, counts the queries
+it runs and the time spent in them. The wrapper finds the current request's
+recorder in a context variable, so queries the async ORM runs on its worker
+thread are attributed to the right request too.
+Results are aggregated per view (``"GET users-list"``) into per-thread shards:
+each worker thread only ever writes to its own shard, so recording takes no
+locks; readers merge the shards on demand. When a thread ends (servers that
+start one per request) its shard is folded into a base shard and dropped, so
+the number of shards follows the number of live threads.
+
+Streaming responses (exports, bulk import) are recorded when the view returns,
+before their body is produced: their latency and queries only cover the start
+of the response. They are counted as ``streamed`` so they can be told apart.
+
+Requests slower than ``SLOW_REQUEST_MS`` are logged to ``core.instrumentation.slow``
+together with the SQL they ran. Configured with ``settings.REQUEST_STATS``::
+
+    REQUEST_STATS = {
+        "ENABLED": True,
+        "SLOW_REQUEST_MS": 500,    # None disables the slow log
+        "CAPTURE_SQL_LIMIT": 50,   # statements kept per request for the slow log
+    }
+"""
+import contextvars
+import logging
+import threading
+import time
+import weakref
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger("core.instrumentation.slow")
+
+DEFAULTS = {
+    "ENABLED": True,
+    "SLOW_REQUEST_MS": 500,
+    "CAPTURE_SQL_LIMIT": 50,
+}
+
+# Upper bounds (ms) of the latency histogram buckets; the last one is +Inf.
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, "REQUEST_STATS", {})}
+
+
+class EndpointStats:
+    __slots__ = ("requests", "errors", "streamed", "total_ms", "max_ms", "queries", "max_queries", "db_ms", "buckets")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.streamed = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_ms = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS_MS)
+
+    def record(self, elapsed_ms, queries, db_ms, status_code, streamed=False):
+        self.requests += 1
+        if status_code >= 500:
+            self.errors += 1
+        if streamed:
+            self.streamed += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.queries += queries
+        self.max_queries = max(self.max_queries, queries)
+        self.db_ms += db_ms
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                break
+
+    def merge(self, other):
+        self.requests += other.requests
+        self.errors += other.errors
+        self.streamed += other.streamed
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+        self.queries += other.queries
+        self.max_queries = max(self.max_queries, other.max_queries)
+        self.db_ms += other.db_ms
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+
+class _ShardOwner:
+    """Held in a thread's local storage only, so it dies with the thread."""
+    __slots__ = ("shard", "__weakref__")
+
+    def __init__(self):
+        self.shard = {}
+
+
+def _merge_into(target, shard):
+    for key, stats in list(shard.items()):
+        target.setdefault(key, EndpointStats()).merge(stats)
+
+
+class StatsRegistry:
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = {}  # id(shard) -> shard of each live thread
+        self._base = {}    # counts of threads that have ended
+        self._lock = threading.Lock()  # taken per thread start/end and per read, never per request
+        self.started = time.time()
+
+    def _shard(self):
+        owner = getattr(self._local, "owner", None)
+        if owner is None:
+            owner = self._local.owner = _ShardOwner()
+            with self._lock:
+                self._shards[id(owner.shard)] = owner.shard
+            weakref.finalize(owner, self._retire, owner.shard)
+        return owner.shard
+
+    def _retire(self, shard):
+        # The thread is gone; keep its counts, drop its shard.
+        with self._lock:
+            if self._shards.pop(id(shard), None) is not None:
+                _merge_into(self._base, shard)
+
+    def record(self, key, elapsed_ms, queries, db_ms, status_code, streamed=False):
+        shard = self._shard()
+        stats = shard.get(key)
+        if stats is None:
+            stats = shard[key] = EndpointStats()
+        stats.record(elapsed_ms, queries, db_ms, status_code, streamed)
+
+    def snapshot(self):
+        merged = {}
+        with self._lock:
+            _merge_into(merged, self._base)
+            for shard in self._shards.values():
+                _merge_into(merged, shard)
+        return merged
+
+    def reset(self):
+        with self._lock:
+            self._base.clear()
+            for shard in self._shards.values():
+                shard.clear()
+        self.started = time.time()
+
+
+registry = StatsRegistry()
+
+
+class QueryRecorder:
+    """``execute_wrapper`` callable counting queries, DB time and (some) SQL."""
+
+    def __init__(self, capture_limit):
+        self.count = 0
+        self.elapsed = 0.0
+        self.capture_limit = capture_limit
+        self.statements = []
+        self.started = time.perf_counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.elapsed += duration
+            if len(self.statements) < self.capture_limit:
+                self.statements.append((round(duration * 1000, 2), sql))
+
+
+_recorder = contextvars.ContextVar("request_stats_recorder", default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(install)
+
+
+def endpoint_key(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        name = "<unresolved>"
+    else:
+        name = match.view_name or match.route
+    return f"{request.method} {name}"
+
+
+class RequestStatsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.options = get_options()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.options["ENABLED"]:
+            return self.get_response(request)
+
+        recorder, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        self.finish(request, response, recorder)
+        return response
+
+    async def __acall__(self, request):
+        if not self.options["ENABLED"]:
+            return await self.get_response(request)
+
+        recorder, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        self.finish(request, response, recorder)
+        return response
+
+    def start(self):
+        # Connections opened before this module was imported never saw the signal.
+        for conn in connections.all(initialized_only=True):
+            install(conn)
+        recorder = QueryRecorder(self.options["CAPTURE_SQL_LIMIT"])
+        return recorder, _recorder.set(recorder)
+
+    def finish(self, request, response, recorder):
+        elapsed_ms = (time.perf_counter() - recorder.started) * 1000
+        db_ms = recorder.elapsed * 1000
+
+        key = endpoint_key(request)
+        streamed = getattr(response, "streaming", False)
+        registry.record(key, elapsed_ms, recorder.count, db_ms, response.status_code, streamed)
+
+        slow_ms = self.options["SLOW_REQUEST_MS"]
+        if slow_ms is not None and elapsed_ms >= slow_ms:
+            logger.warning(
+                "Slow request %s %s: %.1f ms, %d queries (%.1f ms in DB)\n%s",
+                key,
+                request.get_full_path(),
+                elapsed_ms,
+                recorder.count,
+                db_ms,
+                "\n".join(f"  [{ms} ms] {sql}" for ms, sql in recorder.statements),
+            )
+
+
+# ---------- Reporting ----------
+def as_dict(stats_by_key=None):
+    stats_by_key = registry.snapshot() if stats_by_key is None else stats_by_key
+    endpoints = {}
+    for key, s in sorted(stats_by_key.items()):
+        endpoints[key] = {
+            "requests": s.requests,
+            "errors": s.errors,
+            "streamed": s.streamed,
+            "avg_ms": round(s.total_ms / s.requests, 2) if s.requests else 0.0,
+            "max_ms": round(s.max_ms, 2),
+            "p50_ms": _quantile(s, 0.50),
+            "p95_ms": _quantile(s, 0.95),
+            "p99_ms": _quantile(s, 0.99),
+            "avg_queries": round(s.queries / s.requests, 2) if s.requests else 0.0,
+            "max_queries": s.max_queries,
+            "avg_db_ms": round(s.db_ms / s.requests, 2) if s.requests else 0.0,
+            "histogram": {_bucket_label(b): n for b, n in zip(LATENCY_BUCKETS_MS, s.buckets)},
+        }
+    return {"since": registry.started, "endpoints": endpoints}
+
+
+def _bucket_label(bound):
+    return "+Inf" if bound == float("inf") else str(bound)
+
+
+def _quantile(stats, q):
+    """Upper bound of the histogram bucket holding the ``q`` quantile."""
+    if not stats.requests:
+        return 0.0
+    target = q * stats.requests
+    seen = 0
+    for bound, n in zip(LATENCY_BUCKETS_MS, stats.buckets):
+        seen += n
+        if seen >= target:
+            return round(stats.max_ms, 2) if bound == float("inf") else bound
+    return round(stats.max_ms, 2)
+
+
+def as_prometheus(stats_by_key=None):
+    stats_by_key = registry.snapshot() if stats_by_key is None else stats_by_key
+    lines = [
+        "# HELP http_request_duration_seconds Request latency per view.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for key, s in sorted(stats_by_key.items()):
+        method, view = key.split(" ", 1)
+        labels = f'method="{method}",view="{_escape(view)}"'
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS_MS, s.buckets):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(bound / 1000)
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f"http_request_duration_seconds_sum{{{labels}}} {s.total_ms / 1000:.6f}")
+        lines.append(f"http_request_duration_seconds_count{{{labels}}} {s.requests}")
+
+    for name, help_text, attr, scale in (
+        ("http_requests_errors_total", "Responses with a 5xx status.", "errors", 1),
+        ("db_queries_total", "Database queries issued while serving requests.", "queries", 1),
+        ("db_query_duration_seconds_total", "Time spent in database queries.", "db_ms", 1000),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for key, s in sorted(stats_by_key.items()):
+            method, view = key.split(" ", 1)
+            value = getattr(s, attr) / scale
+            lines.append(f'{name}{{method="{method}",view="{_escape(view)}"}} {value:g}')
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
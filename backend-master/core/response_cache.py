@@ -0,0 +1,307 @@
+"""
+Cache of rendered API responses, keyed on the data's version counters.
+
+Read endpoints decorated with ``cache_response`` store the rendered body of
+their ``200`` responses, keyed on the cache name, the negotiated media type,
+the URL (host, path and query string), a permission scope (one user, or
+everybody who sees the same data, e.g. all admins) and the *versions* the
+response was built from: the ``accounts.versioning`` counters that
+``ConditionalGetMixin`` reads for the view's ETag anyway, so keying costs no
+extra query. A write bumps those counters in the database, which every worker
+reads, so every entry built from the old data stops being addressed at once
+and ages out of the backend; nothing has to be enumerated, deleted or told to
+the other processes. A body is never older than the ETag it is served with.
+
+Backends are pluggable:
+
+* by default an in-process LRU (``core.lru.LRUCache``), one per worker;
+* with ``SHARED_CACHE`` set to a Django cache alias, that cache: a
+  ``FileBasedCache`` or ``RedisCache`` is shared by every worker (an entry is
+  computed once for all of them), and a ``LocMemCache`` is a local stand-in
+  with the same code path.
+
+Concurrent misses for the same key are coalesced (single flight): one thread
+recomputes while the others wait for its result, and with a shared backend a
+short-lived lock entry (``cache.add``) extends this across processes.
+Per-cache hit/miss counters are reported at ``/api/_stats/``.
+
+Configured with ``settings.RESPONSE_CACHE``::
+
+    RESPONSE_CACHE = {
+        "ENABLED": True,
+        "SHARED_CACHE": None,  # django cache alias; None keeps responses in-process
+        "MAXSIZE": 2000,       # entries kept by the in-process backend
+        "TTL": 30,             # seconds an entry stays valid
+        "LOCK_TIMEOUT": 10,    # seconds a request waits for another one's recompute
+    }
+"""
+import functools
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .lru import LRUCache
+
+DEFAULTS = {
+    "ENABLED": True,
+    "SHARED_CACHE": None,
+    "MAXSIZE": 2000,
+    "TTL": 30,
+    "LOCK_TIMEOUT": 10,
+}
+
+KEY_PREFIX = "rc:"
+LOCK_POLL_INTERVAL = 0.05
+
+
+# ---------- Backends ----------
+class LocalBackend:
+    """In-process LRU."""
+    shared = False
+
+    def __init__(self, maxsize, ttl):
+        self.entries = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value, ttl):
+        self.entries.set(key, value, ttl)
+
+    def add_lock(self, key, ttl):
+        return True
+
+    def release_lock(self, key):
+        pass
+
+    def clear(self):
+        self.entries.clear()
+
+
+class DjangoCacheBackend:
+    """Any Django cache (file-based, Redis, Memcached, or LocMem as a stand-in)."""
+    shared = True
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.cache = caches[alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, ttl):
+        self.cache.set(key, value, ttl)
+
+    def add_lock(self, key, ttl):
+        return self.cache.add(f"{key}:lock", 1, ttl)
+
+    def release_lock(self, key):
+        self.cache.delete(f"{key}:lock")
+
+    def clear(self):
+        self.cache.clear()
+
+
+# ---------- Single flight ----------
+class _Call:
+    __slots__ = ("done", "value", "failed")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.failed = False
+
+
+class SingleFlight:
+    """Run ``fn`` once per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, timeout):
+        """Return ``(value, shared)``; ``shared`` is True for callers that waited."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            # If the leader fails or takes too long, compute independently.
+            if call.done.wait(timeout) and not call.failed:
+                return call.value, True
+            return fn(), False
+
+        try:
+            call.value = fn()
+        except BaseException:
+            call.failed = True
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+
+# ---------- Cache ----------
+class CacheStats:
+    __slots__ = ("hits", "misses", "coalesced", "stores", "bypassed")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stores = 0
+        self.bypassed = 0
+
+    def as_dict(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "stores": self.stores,
+            "bypassed": self.bypassed,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+class ResponseCache:
+    def __init__(self, options=None):
+        self.options = {**DEFAULTS, **(options or {})}
+        alias = self.options["SHARED_CACHE"]
+        self.backend = DjangoCacheBackend(alias) if alias else LocalBackend(self.options["MAXSIZE"], self.options["TTL"])
+        self.flight = SingleFlight()
+        self.caches = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.options["ENABLED"]
+
+    def stats_for(self, name):
+        stats = self.caches.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self.caches.setdefault(name, CacheStats())
+        return stats
+
+    def make_key(self, name, parts, versions):
+        """``versions`` maps each version key the response is built from to its counter."""
+        raw = "|".join([*parts, *(f"{key}={version}" for key, version in versions.items())])
+        return f"{KEY_PREFIX}{name}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+    def get_or_set(self, name, key, compute):
+        """
+        Return ``(value, status)`` with status ``"hit"``, ``"coalesced"`` or
+        ``"miss"``. ``compute`` returns ``(value, cacheable)``; only cacheable
+        values are stored and handed to coalesced callers.
+        """
+        stats = self.stats_for(name)
+        value = self.backend.get(key)
+        if value is not None:
+            stats.hits += 1
+            return value, "hit"
+
+        fill = functools.partial(self._fill, key, compute, stats)
+        (value, cacheable), shared = self.flight.do(key, fill, self.options["LOCK_TIMEOUT"])
+        if shared and cacheable:
+            stats.coalesced += 1
+            return value, "coalesced"
+        if shared:
+            # The leader's response can't be reused (e.g. an error); build our own.
+            value, cacheable = fill()
+        stats.misses += 1
+        return value, "miss"
+
+    def _fill(self, key, compute, stats):
+        # Another thread may have stored it between our miss and taking the flight.
+        value = self.backend.get(key)
+        if value is not None:
+            return value, True
+        locked = self.backend.add_lock(key, self.options["LOCK_TIMEOUT"])
+        if not locked:
+            # Another process is recomputing: wait for its result, then give up and compute.
+            deadline = time.monotonic() + self.options["LOCK_TIMEOUT"]
+            while time.monotonic() < deadline:
+                time.sleep(LOCK_POLL_INTERVAL)
+                value = self.backend.get(key)
+                if value is not None:
+                    return value, True
+        try:
+            value, cacheable = compute()
+            if cacheable:
+                self.backend.set(key, value, self.options["TTL"])
+                stats.stores += 1
+            return value, cacheable
+        finally:
+            if locked:
+                self.backend.release_lock(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return {
+            "backend": self.options["SHARED_CACHE"] or "local",
+            "caches": {name: stats.as_dict() for name, stats in sorted(self.caches.items())},
+        }
+
+
+response_cache = ResponseCache(getattr(settings, "RESPONSE_CACHE", None))
+
+
+def user_scope(request):
+    return f"user:{request.user.pk}"
+
+
+def cache_response(name, scope=user_scope):
+    """
+    Decorate the ``get`` handler of a DRF view to serve its rendered ``200``
+    responses from the cache.
+
+    The view must be a ``ConditionalGetMixin`` view: entries are keyed on the
+    versions it read (``view.versions``) for ``get_version_keys(request)``.
+    ``scope(request)`` separates users who may see different data for the same
+    URL; the default gives every user their own entries.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            media_type = request.accepted_media_type or ""
+            versions = getattr(view, "versions", None)
+            # The browsable API page embeds per-user details (CSRF token, user menu).
+            if (not response_cache.enabled or request.method != "GET" or versions is None
+                    or media_type.startswith("text/html")):
+                return handler(view, request, *args, **kwargs)
+
+            key = response_cache.make_key(name, [media_type, request.build_absolute_uri(), scope(request)], versions)
+
+            def compute():
+                response = handler(view, request, *args, **kwargs)
+                if getattr(response, "streaming", False) or response.status_code != 200:
+                    response_cache.stats_for(name).bypassed += 1
+                    return response, False
+                # Render now, as finalize_response would, so the body can be stored.
+                response.accepted_renderer = request.accepted_renderer
+                response.accepted_media_type = media_type
+                response.renderer_context = view.get_renderer_context()
+                response.render()
+                return (response.content, response["Content-Type"]), True
+
+            value, status = response_cache.get_or_set(name, key, compute)
+            if isinstance(value, tuple):
+                content, content_type = value
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = value
+            response["X-Cache"] = status.upper()
+            return response
+        return wrapper
+    return decorator
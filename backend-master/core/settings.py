@@ -1,6 +1,9 @@
+import os
 from datetime import timedelta
 from pathlib import Path
 
+from .db import databases
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = "change-me"
@@ -19,11 +22,13 @@ INSTALLED_APPS = [
     "corsheaders",
     # local
     "accounts",
+    "rentals",
 ]
 
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "core.instrumentation.RequestStatsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -48,7 +53,8 @@ TEMPLATES = [{
 }]
 
 WSGI_APPLICATION = "core.wsgi.application"
-DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / "db.sqlite3"}}
+# ---- Database: SQLite by default (WAL opt-in), Postgres with DB_ENGINE=postgres (see core/db.py)
+DATABASES = databases(BASE_DIR)
 
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -69,7 +75,7 @@ AUTH_USER_MODEL = "accounts.User"
 
 # ---- DRF + JWT
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": ("rest_framework_simplejwt.authentication.JWTAuthentication",),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("accounts.authentication.ClaimsJWTAuthentication",),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.AllowAny",),
 }
 
@@ -77,6 +83,91 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    # Role/is_active/token_version claims and revocation (see accounts/tokens.py)
+    "TOKEN_OBTAIN_SERIALIZER": "accounts.tokens.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "accounts.tokens.ClaimsTokenRefreshSerializer",
+}
+
+# ---- Cached user resolution for JWT auth (see accounts/authentication.py)
+ACCOUNTS_USER_CACHE = {
+    "MAXSIZE": 10000,
+    "TTL": 30,
+    "SHARED_CACHE": None,
+    "SHARED_TTL": 300,
+    # Revocations made by another worker take effect within this many seconds.
+    "TOKEN_VERSION_TTL": 5,
+}
+
+# ---- Serve /auth/me/, /users/ and the invite endpoints from native async views
+# (accounts/async_views.py); turn on when deploying behind an ASGI server
+ACCOUNTS_ASYNC_VIEWS = os.environ.get("ACCOUNTS_ASYNC_VIEWS", "0") == "1"
+
+# ---- Cached rendered responses for read endpoints (see core/response_cache.py)
+RESPONSE_CACHE = {
+    "ENABLED": True,
+    "SHARED_CACHE": None,  # e.g. a FileBasedCache or RedisCache alias in CACHES
+    "MAXSIZE": 2000,
+    "TTL": 30,
+    "LOCK_TIMEOUT": 10,
+}
+
+# ---- Login: password hashing pool and attempt throttling (see accounts/login.py)
+ACCOUNTS_LOGIN = {
+    "HASH_WORKERS": 4,
+    "HASH_QUEUE": 16,
+    "HASH_TIMEOUT": 10,
+    "IP_BURST": 20,
+    "IP_PER_MINUTE": 10,
+    "EMAIL_BURST": 5,  # failed attempts per email and IP; all limits are per worker process
+    "EMAIL_PER_MINUTE": 2,
+    "TRUST_X_FORWARDED_FOR": False,
+}
+
+# ---- Invites: expiry and batched cleanup (see accounts/invites.py, manage.py cleanup_invites)
+ACCOUNTS_INVITES = {
+    "TTL_DAYS": 7,
+    "ACCEPTED_RETENTION_DAYS": None,
+    "CLEANUP_BATCH_SIZE": 500,
+    "CLEANUP_PAUSE": 0.1,
+}
+
+# ---- Invite emails: outbox delivered by `manage.py send_invite_emails` (see accounts/outbox.py)
+ACCOUNTS_INVITE_EMAILS = {
+    "ENABLED": True,
+    "ACCEPT_URL": os.environ.get("INVITE_ACCEPT_URL", "http://localhost:5173/accept-invite?token={token}"),
+    "BATCH_SIZE": 50,
+    "LEASE_SECONDS": 300,
+    "MAX_ATTEMPTS": 6,
+    "RETRY_BASE": 30,
+    "RETRY_MAX": 3600,
+    "RETENTION_DAYS": 7,
+}
+
+# ---- Outgoing mail; the defaults point at `manage.py smtp_sink`
+EMAIL_HOST = os.environ.get("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.environ.get("EMAIL_PORT", "1025"))
+EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.environ.get("EMAIL_USE_TLS", "0") == "1"
+EMAIL_TIMEOUT = 10
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "ZenStays <no-reply@zenstays.local>")
+
+# ---- User/invite change log behind /api/users/changes/ (see accounts/changelog.py, manage.py compact_changelog)
+ACCOUNTS_CHANGELOG = {
+    "RETENTION_DAYS": 30,
+    "PAGE_SIZE": 500,
+    "MAX_PAGE_SIZE": 2000,
+    "COMPACT_BATCH_SIZE": 1000,
+}
+
+# ---- Rentals: longest allowed stay; bounds booking overlap range scans
+RENTALS_MAX_STAY_NIGHTS = 365
+
+# ---- Per-view request stats (see core/instrumentation.py), served at /api/_stats/
+REQUEST_STATS = {
+    "ENABLED": True,
+    "SLOW_REQUEST_MS": 500,  # log slower requests with their SQL; None disables
+    "CAPTURE_SQL_LIMIT": 50,
 }
 
 # ---- CORS (adjust for your frontend origin)
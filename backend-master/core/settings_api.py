@@ -0,0 +1,50 @@
+"""
+API-only settings profile for workers that serve just the JSON routes.
+
+    DJANGO_SETTINGS_MODULE=core.settings_api gunicorn core.wsgi:application
+
+Everything from ``core.settings``, minus what only the admin site and the
+browsable API use: the admin, sessions, messages and staticfiles apps, their
+middleware, CSRF (API clients authenticate with bearer tokens, not cookies)
+and clickjacking protection (no HTML is served), the template engine and the
+browsable API renderer. URLs come from ``core.urls_api``, which leaves out
+``/admin/``. Workers boot faster and each request runs through four
+middleware instead of nine; run the admin from a separate ``core.settings``
+deployment. Compare both with ``python -m benchmarks.startup``.
+
+The test suite also runs under this profile
+(``DJANGO_SETTINGS_MODULE=core.settings_api python manage.py test``); tests of
+the admin site are skipped there.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+API_UNUSED_APPS = {
+    "django.contrib.admin",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+    # Only provides the browsable API's templates and static files.
+    "rest_framework",
+}
+API_UNUSED_MIDDLEWARE = {
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    # DRF authenticates per request (accounts.authentication); nothing reads a session user.
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+}
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in API_UNUSED_APPS]
+MIDDLEWARE = [name for name in MIDDLEWARE if name not in API_UNUSED_MIDDLEWARE]
+
+ROOT_URLCONF = "core.urls_api"
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    # No BrowsableAPIRenderer, so no templates, forms or static files per response.
+    "DEFAULT_RENDERER_CLASSES": ("rest_framework.renderers.JSONRenderer",),
+}
@@ -0,0 +1,110 @@
+"""
+A local SMTP stand-in for development and load tests.
+
+``SMTPSink`` speaks just enough SMTP (``EHLO``/``HELO``, ``MAIL``, ``RCPT``,
+``DATA``, ``RSET``, ``NOOP``, ``QUIT``) for Django's SMTP backend, accepts
+every message and hands it to ``on_message``. Failures can be injected to
+exercise retry paths: ``fail_every=n`` answers every n-th ``DATA`` with a
+temporary ``451`` and recipients at ``reject_domains`` get a permanent ``550``.
+Served by ``manage.py smtp_sink``.
+"""
+import itertools
+import socketserver
+import threading
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, *lines):
+        # Multi-line replies use "250-" on every line but the last.
+        for index, line in enumerate(lines):
+            separator = "-" if index < len(lines) - 1 else " "
+            self.wfile.write(f"{line[:3]}{separator}{line[4:]}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        self.reply(f"220 {server.hostname} ESMTP sink")
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode("utf-8", "replace").rstrip("\r\n").partition(" ")
+            command = command.upper()
+
+            if command == "EHLO":
+                self.reply(f"250 {server.hostname}", "250 8BITMIME", "250 SMTPUTF8")
+            elif command == "HELO":
+                self.reply(f"250 {server.hostname}")
+            elif command == "MAIL":
+                sender, recipients = _address(argument), []
+                self.reply("250 2.1.0 OK")
+            elif command == "RCPT":
+                recipient = _address(argument)
+                if recipient.rpartition("@")[2].lower() in server.reject_domains:
+                    self.reply("550 5.1.1 Mailbox unavailable")
+                else:
+                    recipients.append(recipient)
+                    self.reply("250 2.1.5 OK")
+            elif command == "DATA":
+                if not recipients:
+                    self.reply("503 5.5.1 No valid recipients")
+                    continue
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = self._read_data()
+                if server.should_fail():
+                    self.reply("451 4.3.0 Try again later")
+                else:
+                    number = server.deliver(sender, recipients, data)
+                    self.reply(f"250 2.0.0 Queued as {number}")
+                sender, recipients = None, []
+            elif command == "RSET":
+                sender, recipients = None, []
+                self.reply("250 2.0.0 OK")
+            elif command == "NOOP":
+                self.reply("250 2.0.0 OK")
+            elif command == "QUIT":
+                self.reply("221 2.0.0 Bye")
+                return
+            else:
+                self.reply("502 5.5.2 Command not implemented")
+
+    def _read_data(self):
+        lines = []
+        for line in iter(self.rfile.readline, b""):
+            if line in (b".\r\n", b".\n"):
+                break
+            # Undo dot-stuffing.
+            lines.append(line[1:] if line.startswith(b"..") else line)
+        return b"".join(lines)
+
+
+def _address(argument):
+    # "FROM:<a@b.c> SIZE=123" -> "a@b.c"
+    value = argument.partition(":")[2].strip()
+    return value.partition(">")[0].lstrip("<")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, on_message=None, fail_every=0, reject_domains=(), hostname="localhost"):
+        super().__init__(address, SMTPSinkHandler)
+        self.on_message = on_message
+        self.fail_every = fail_every
+        self.reject_domains = {domain.lower() for domain in reject_domains}
+        self.hostname = hostname
+        self.received = 0
+        self._attempts = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def should_fail(self):
+        return bool(self.fail_every) and next(self._attempts) % self.fail_every == 0
+
+    def deliver(self, sender, recipients, data):
+        with self._lock:
+            self.received += 1
+            number = self.received
+        if self.on_message:
+            self.on_message(number, sender, recipients, data)
+        return number
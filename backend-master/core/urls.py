@@ -4,7 +4,12 @@ URL configuration for core project.
 from django.contrib import admin
 from django.urls import path, include
 
+from .views import PrometheusStatsView, StatsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("api/", include("accounts.urls")),
+    path("api/", include("rentals.urls")),
+    path("api/_stats/", StatsView.as_view(), name="stats"),
+    path("api/_stats/prometheus/", PrometheusStatsView.as_view(), name="stats-prometheus"),
 ]
\ No newline at end of file
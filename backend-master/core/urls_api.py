@@ -0,0 +1,14 @@
+"""
+URL configuration for the API-only profile (``core.settings_api``): the
+routes of ``core.urls`` without the admin site.
+"""
+from django.urls import path, include
+
+from .views import PrometheusStatsView, StatsView
+
+urlpatterns = [
+    path("api/", include("accounts.urls")),
+    path("api/", include("rentals.urls")),
+    path("api/_stats/", StatsView.as_view(), name="stats"),
+    path("api/_stats/prometheus/", PrometheusStatsView.as_view(), name="stats-prometheus"),
+]
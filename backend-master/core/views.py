@@ -0,0 +1,34 @@
+from django.http import HttpResponse
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from accounts import login, outbox
+from accounts.authentication import token_versions, user_cache
+from accounts.views import IsAdmin
+
+from . import instrumentation
+from .response_cache import response_cache
+
+
+class StatsView(APIView):
+    """Per-view request, latency and query statistics of this process."""
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        return Response({
+            **instrumentation.as_dict(),
+            "user_cache": user_cache.stats(),
+            "token_versions": token_versions.stats(),
+            "response_cache": response_cache.stats(),
+            "password_hashing": login.stats(),
+            "invite_outbox": outbox.stats(),
+        })
+
+
+class PrometheusStatsView(APIView):
+    """The same statistics in the Prometheus text exposition format."""
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        return HttpResponse(instrumentation.as_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
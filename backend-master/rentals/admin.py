@@ -0,0 +1,27 @@
+from django.contrib import admin
+
+from .models import Booking, Expense, Property
+
+
+@admin.register(Property)
+class PropertyAdmin(admin.ModelAdmin):
+    list_display = ("name", "area", "owner", "is_active", "created_at")
+    search_fields = ("name", "address")
+    list_filter = ("area", "is_active")
+    raw_id_fields = ("owner",)
+
+
+@admin.register(Booking)
+class BookingAdmin(admin.ModelAdmin):
+    list_display = ("property", "platform", "status", "check_in", "check_out", "revenue")
+    list_filter = ("platform", "status")
+    date_hierarchy = "check_in"
+    raw_id_fields = ("property",)
+
+
+@admin.register(Expense)
+class ExpenseAdmin(admin.ModelAdmin):
+    list_display = ("property", "category", "subcategory", "amount", "incurred_on")
+    list_filter = ("category",)
+    date_hierarchy = "incurred_on"
+    raw_id_fields = ("property",)
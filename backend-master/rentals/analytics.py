@@ -0,0 +1,306 @@
+"""
+Dashboard metrics answered from the rollup tables.
+
+A date range is split into whole months (served from monthly rows) and the
+partial months at either end (served from daily rows), so every query reads at
+most ~62 daily plus one row per month for each property and platform, no matter
+how many bookings are behind them.
+"""
+import calendar
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Optional
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import BookingRollup, Expense, ExpenseRollup, Granularity, Property, area_key
+from .rollups import LOS_FIELDS, month_start
+
+# Version key (ETag and cached responses) of everything computed here; bumped by ``rentals.signals``.
+CACHE_TAG = "analytics"
+
+User = get_user_model()
+
+DATE_RANGES = ("mtd", "ytd", "q1", "q2", "q3", "q4", "last12")
+ZERO = Decimal("0")
+
+
+@dataclass(frozen=True)
+class Filters:
+    start: date  # inclusive
+    end: date  # exclusive
+    area: Optional[str] = None  # area key, e.g. "oldport"
+    client_id: Optional[int] = None
+
+
+def add_months(day, months):
+    index = day.month - 1 + months
+    return day.replace(year=day.year + index // 12, month=index % 12 + 1, day=1)
+
+
+def resolve_range(name, today):
+    """Return ``(start, end_exclusive)`` for one of ``DATE_RANGES``."""
+    if name == "mtd":
+        return month_start(today), today + timedelta(days=1)
+    if name == "ytd":
+        return date(today.year, 1, 1), today + timedelta(days=1)
+    if name in ("q1", "q2", "q3", "q4"):
+        first = date(today.year, 3 * (int(name[1]) - 1) + 1, 1)
+        return first, add_months(first, 3)
+    if name == "last12":
+        current = month_start(today)
+        return add_months(current, -11), add_months(current, 1)
+    raise ValueError(name)
+
+
+def segments(start, end):
+    """Split ``[start, end)`` into ``(granularity, seg_start, seg_end)`` pieces."""
+    pieces = []
+    first_full = start if start.day == 1 else add_months(start, 1)
+    last_full = month_start(end)  # exclusive bound of the whole months
+
+    if first_full >= last_full:
+        return [(Granularity.DAY, start, end)]
+    if start < first_full:
+        pieces.append((Granularity.DAY, start, first_full))
+    pieces.append((Granularity.MONTH, first_full, last_full))
+    if last_full < end:
+        pieces.append((Granularity.DAY, last_full, end))
+    return pieces
+
+
+def bucket_q(start, end):
+    q = Q()
+    for granularity, seg_start, seg_end in segments(start, end):
+        q |= Q(granularity=granularity, bucket__gte=seg_start, bucket__lt=seg_end)
+    return q
+
+
+def _scoped(model, filters):
+    qs = model.objects.filter(bucket_q(filters.start, filters.end))
+    if filters.area:
+        qs = qs.filter(area=filters.area)
+    if filters.client_id is not None:
+        qs = qs.filter(client_id=filters.client_id)
+    return qs
+
+
+def bookings(filters):
+    return _scoped(BookingRollup, filters)
+
+
+def expenses(filters):
+    return _scoped(ExpenseRollup, filters)
+
+
+def properties(filters):
+    qs = Property.objects.filter(is_active=True)
+    if filters.client_id is not None:
+        qs = qs.filter(owner_id=filters.client_id)
+    if filters.area:
+        # Area keys are derived, so match in Python over the (small) area list.
+        names = [a for a in Property.objects.values_list("area", flat=True).distinct() if area_key(a) == filters.area]
+        qs = qs.filter(area__in=names)
+    return qs
+
+
+def _days_per_month(filters):
+    """``{month_start: number of days of that month inside the range}``."""
+    days = {}
+    month = month_start(filters.start)
+    while month < filters.end:
+        last = date(month.year, month.month, calendar.monthrange(month.year, month.month)[1])
+        lo, hi = max(month, filters.start), min(last + timedelta(days=1), filters.end)
+        days[month] = (hi - lo).days
+        month = add_months(month, 1)
+    return days
+
+
+def _ratio(numerator, denominator, scale=1):
+    if not denominator:
+        return 0.0
+    return round(float(numerator) * scale / float(denominator), 2)
+
+
+def _month_label(month):
+    return {"month": month.strftime("%Y-%m"), "label": month.strftime("%b")}
+
+
+# ---------- Metrics ----------
+def summary(filters):
+    revenue = bookings(filters).aggregate(revenue=Sum("revenue"), nights=Sum("nights"), bookings=Sum("bookings"))
+    costs = expenses(filters).aggregate(amount=Sum("amount"))["amount"] or ZERO
+    total_revenue = revenue["revenue"] or ZERO
+    nights = revenue["nights"] or 0
+    property_count = properties(filters).count()
+    available = property_count * (filters.end - filters.start).days
+
+    return {
+        "revenue": total_revenue,
+        "costs": costs,
+        "profit": total_revenue - costs,
+        "profit_margin": _ratio(total_revenue - costs, total_revenue, 100),
+        "bookings": revenue["bookings"] or 0,
+        "nights": nights,
+        "properties": property_count,
+        "occupancy": _ratio(nights, available, 100),
+        "adr": _ratio(total_revenue, nights),
+        "revpar": _ratio(total_revenue, available),
+    }
+
+
+def monthly_revenue(filters):
+    revenue = {
+        row["month"]: row["revenue"]
+        for row in bookings(filters).annotate(month=TruncMonth("bucket")).values("month").annotate(revenue=Sum("revenue"))
+    }
+    costs = {
+        row["month"]: row["amount"]
+        for row in expenses(filters).annotate(month=TruncMonth("bucket")).values("month").annotate(amount=Sum("amount"))
+    }
+    out = []
+    for month in _days_per_month(filters):
+        rev, cost = revenue.get(month) or ZERO, costs.get(month) or ZERO
+        out.append({**_month_label(month), "revenue": rev, "costs": cost, "profit": rev - cost})
+    return out
+
+
+def revenue_by_area(filters):
+    names = {area_key(a): a for a in Property.objects.values_list("area", flat=True).distinct()}
+    rows = bookings(filters).values("area").annotate(value=Sum("revenue")).order_by("-value")
+    return [{"area": row["area"], "name": names.get(row["area"], row["area"]), "value": row["value"]} for row in rows]
+
+
+def revenue_by_client(filters):
+    revenue = {
+        row["client_id"]: row["revenue"]
+        for row in bookings(filters).values("client_id").annotate(revenue=Sum("revenue"))
+    }
+    costs = {
+        row["client_id"]: row["amount"]
+        for row in expenses(filters).values("client_id").annotate(amount=Sum("amount"))
+    }
+    counts = {
+        row["owner_id"]: row["n"]
+        for row in properties(filters).values("owner_id").annotate(n=Count("id"))
+    }
+    ids = [pk for pk in revenue if pk is not None]
+    names = {
+        u["id"]: (f'{u["first_name"]} {u["last_name"]}'.strip() or u["email"])
+        for u in User.objects.filter(id__in=ids).values("id", "email", "first_name", "last_name")
+    }
+    out = []
+    for client_id, rev in revenue.items():
+        cost = costs.get(client_id) or ZERO
+        out.append({
+            "client_id": client_id,
+            "name": names.get(client_id, "Unassigned"),
+            "revenue": rev,
+            "profit": rev - cost,
+            "properties": counts.get(client_id, 0),
+        })
+    return sorted(out, key=lambda r: r["revenue"], reverse=True)
+
+
+def revenue_by_platform(filters):
+    labels = dict(BookingRollup._meta.get_field("platform").choices)
+    rows = list(bookings(filters).values("platform").annotate(value=Sum("revenue")).order_by("-value"))
+    total = sum((row["value"] for row in rows), ZERO)
+    return [
+        {
+            "platform": row["platform"],
+            "name": labels.get(row["platform"], row["platform"]),
+            "value": row["value"],
+            "percent": _ratio(row["value"], total, 100),
+        }
+        for row in rows
+    ]
+
+
+def occupancy_trend(filters):
+    per_month = {
+        row["month"]: row
+        for row in bookings(filters).annotate(month=TruncMonth("bucket")).values("month")
+        .annotate(revenue=Sum("revenue"), nights=Sum("nights"))
+    }
+    property_count = properties(filters).count()
+    out = []
+    for month, days in _days_per_month(filters).items():
+        row = per_month.get(month) or {"revenue": ZERO, "nights": 0}
+        out.append({
+            **_month_label(month),
+            "occupancy": _ratio(row["nights"], property_count * days, 100),
+            "adr": _ratio(row["revenue"], row["nights"]),
+        })
+    return out
+
+
+def cost_breakdown(filters):
+    labels = dict(Expense.Categories.choices)
+    rows = list(expenses(filters).values("category").annotate(value=Sum("amount")).order_by("-value"))
+    total = sum((row["value"] for row in rows), ZERO)
+    return [
+        {
+            "category": row["category"],
+            "name": labels.get(row["category"], row["category"]),
+            "value": row["value"],
+            "percent": _ratio(row["value"], total, 100),
+        }
+        for row in rows
+    ]
+
+
+def maintenance(filters):
+    qs = expenses(filters).filter(category=Expense.Categories.MAINTENANCE)
+    per_month = {
+        row["month"]: row
+        for row in qs.annotate(month=TruncMonth("bucket")).values("month")
+        .annotate(cost=Sum("amount"), tickets=Sum("count"))
+    }
+    trend = []
+    for month in _days_per_month(filters):
+        row = per_month.get(month) or {"cost": ZERO, "tickets": 0}
+        trend.append({**_month_label(month), "cost": row["cost"], "tickets": row["tickets"]})
+    by_category = [
+        {"category": row["subcategory"] or "General", "cost": row["cost"], "tickets": row["tickets"]}
+        for row in qs.values("subcategory").annotate(cost=Sum("amount"), tickets=Sum("count")).order_by("-cost")
+    ]
+    return {"trend": trend, "by_category": by_category}
+
+
+def length_of_stay(filters):
+    totals = bookings(filters).aggregate(**{field: Sum(field) for field in LOS_FIELDS})
+    labels = ["1", "2", "3", "4", "5", "6", "7+"]
+    return [{"nights": label, "bookings": totals[field] or 0} for label, field in zip(labels, LOS_FIELDS)]
+
+
+def property_performance(filters):
+    revenue = {
+        row["property_id"]: row
+        for row in bookings(filters).values("property_id").annotate(revenue=Sum("revenue"), nights=Sum("nights"))
+    }
+    costs = {
+        row["property_id"]: row["amount"]
+        for row in expenses(filters).values("property_id").annotate(amount=Sum("amount"))
+    }
+    days = (filters.end - filters.start).days
+    out = []
+    for prop in properties(filters).select_related("owner").order_by("id"):
+        row = revenue.get(prop.id) or {"revenue": ZERO, "nights": 0}
+        rev, cost = row["revenue"], costs.get(prop.id) or ZERO
+        out.append({
+            "id": prop.id,
+            "name": prop.name,
+            "address": prop.address,
+            "area": prop.area,
+            "client": (prop.owner.get_full_name() or prop.owner.email) if prop.owner else None,
+            "revenue": rev,
+            "occupancy": _ratio(row["nights"], days, 100),
+            "adr": _ratio(rev, row["nights"]),
+            "profit": rev - cost,
+            "profit_margin": _ratio(rev - cost, rev, 100),
+        })
+    return sorted(out, key=lambda r: r["revenue"], reverse=True)
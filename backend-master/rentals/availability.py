@@ -0,0 +1,112 @@
+"""
+Booking calendar: window queries and overlap (double-booking) detection.
+
+Bookings are half-open intervals ``[check_in, check_out)``. Because no stay is
+longer than ``RENTALS_MAX_STAY_NIGHTS`` (enforced by ``Booking.save``), every booking overlapping a window
+``[start, end)`` has ``start - max_stay < check_in < end``, which turns the
+overlap query into a bounded range scan on the ``check_in`` indexes.
+
+In memory, each property's bookings are kept as a run sorted by ``check_in``
+together with the running maximum of ``check_out``. A booking ``[a, b)``
+conflicts with the run iff, among the intervals starting before ``b``, the
+largest ``check_out`` is after ``a``: one ``bisect`` plus one lookup, so a
+conflict check is O(log n) per property even if legacy data overlaps.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+
+from .models import Booking, max_stay_nights
+
+
+def overlapping(queryset, start, end):
+    """Confirmed bookings of ``queryset`` that overlap ``[start, end)``."""
+    return queryset.filter(
+        status=Booking.Statuses.CONFIRMED,
+        check_in__gt=start - timedelta(days=max_stay_nights()),
+        check_in__lt=end,
+        check_out__gt=start,
+    )
+
+
+class SortedRun:
+    """Bookings of one property sorted by check-in, with prefix maxima of check-out."""
+
+    def __init__(self, intervals):
+        # intervals: iterable of (check_in, check_out, booking_id)
+        self.intervals = sorted(intervals)
+        self.starts = [i[0] for i in self.intervals]
+        self.max_end = []
+        running = None
+        for _, check_out, _ in self.intervals:
+            running = check_out if running is None or check_out > running else running
+            self.max_end.append(running)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def has_overlap(self, start, end):
+        idx = bisect_left(self.starts, end) - 1
+        return idx >= 0 and self.max_end[idx] > start
+
+    def overlaps(self, start, end):
+        """All intervals overlapping ``[start, end)`` (walks back only while one can still overlap)."""
+        idx = bisect_left(self.starts, end) - 1
+        found = []
+        while idx >= 0 and self.max_end[idx] > start:
+            check_in, check_out, pk = self.intervals[idx]
+            if check_out > start:
+                found.append(self.intervals[idx])
+            idx -= 1
+        found.reverse()
+        return found
+
+    def occupied_nights(self, start, end):
+        nights = set()
+        for check_in, check_out, _ in self.overlaps(start, end):
+            day = max(check_in, start)
+            while day < min(check_out, end):
+                nights.add(day)
+                day += timedelta(days=1)
+        return len(nights)
+
+
+class BookingCalendar:
+    """
+    Confirmed bookings of many properties over one window, loaded with a
+    single query and indexed per property for overlap checks.
+    """
+
+    def __init__(self, start, end, property_ids=None):
+        self.start = start
+        self.end = end
+        qs = Booking.objects.all()
+        if property_ids is not None:
+            qs = qs.filter(property_id__in=property_ids)
+        rows = overlapping(qs, start, end).values_list("property_id", "check_in", "check_out", "id")
+
+        grouped = defaultdict(list)
+        for property_id, check_in, check_out, pk in rows:
+            grouped[property_id].append((check_in, check_out, pk))
+        self.runs = {property_id: SortedRun(intervals) for property_id, intervals in grouped.items()}
+
+    def run(self, property_id):
+        return self.runs.get(property_id) or SortedRun(())
+
+    def conflicts(self, property_id, check_in, check_out, exclude=None):
+        """Ids of loaded bookings overlapping ``[check_in, check_out)`` for a property."""
+        run = self.run(property_id)
+        if not run.has_overlap(check_in, check_out):
+            return []
+        return [pk for _, _, pk in run.overlaps(check_in, check_out) if pk != exclude]
+
+    def occupancy(self, property_id):
+        nights = self.run(property_id).occupied_nights(self.start, self.end)
+        days = (self.end - self.start).days
+        return nights, round(nights * 100 / days, 2) if days else 0.0
+
+
+def find_conflicts(property_id, check_in, check_out, exclude=None):
+    """Ids of confirmed bookings of one property overlapping ``[check_in, check_out)``."""
+    calendar = BookingCalendar(check_in, check_out, property_ids=[property_id])
+    return calendar.conflicts(property_id, check_in, check_out, exclude=exclude)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from accounts import versioning
+from rentals.analytics import CACHE_TAG
+from rentals.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute booking and expense rollups from the raw tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--property", type=int, action="append", dest="property_ids",
+                            help="Only rebuild this property (repeatable).")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        count = rebuild(property_ids=options["property_ids"], batch_size=options["batch_size"])
+        versioning.bump(CACHE_TAG)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rollups for {count} properties."))
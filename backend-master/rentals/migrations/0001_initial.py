@@ -0,0 +1,107 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Property',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=150)),
+                ('address', models.CharField(blank=True, max_length=255)),
+                ('area', models.CharField(max_length=100)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='properties', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'properties',
+            },
+        ),
+        migrations.CreateModel(
+            name='Expense',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('cleaning', 'Cleaning'), ('maintenance', 'Maintenance'), ('supplies', 'Supplies'), ('platform_fees', 'Platform Fees'), ('overhead', 'Overhead')], max_length=32)),
+                ('subcategory', models.CharField(blank=True, max_length=50)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('incurred_on', models.DateField()),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expenses', to='rentals.property')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExpenseRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('D', 'Day'), ('M', 'Month')], max_length=1)),
+                ('bucket', models.DateField()),
+                ('area', models.CharField(max_length=100)),
+                ('client_id', models.BigIntegerField(blank=True, null=True)),
+                ('category', models.CharField(choices=[('cleaning', 'Cleaning'), ('maintenance', 'Maintenance'), ('supplies', 'Supplies'), ('platform_fees', 'Platform Fees'), ('overhead', 'Overhead')], max_length=32)),
+                ('subcategory', models.CharField(blank=True, max_length=50)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rentals.property')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'bucket'], name='expense_rollup_bucket_idx'), models.Index(fields=['granularity', 'area', 'bucket'], name='expense_rollup_area_idx'), models.Index(fields=['granularity', 'client_id', 'bucket'], name='expense_rollup_client_idx')],
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'bucket', 'property', 'category', 'subcategory'), name='expense_rollup_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BookingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('D', 'Day'), ('M', 'Month')], max_length=1)),
+                ('bucket', models.DateField()),
+                ('area', models.CharField(max_length=100)),
+                ('client_id', models.BigIntegerField(blank=True, null=True)),
+                ('platform', models.CharField(choices=[('airbnb', 'Airbnb'), ('booking', 'Booking.com'), ('vrbo', 'Vrbo'), ('direct', 'Direct')], max_length=16)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('nights', models.IntegerField(default=0)),
+                ('bookings', models.IntegerField(default=0)),
+                ('los_1', models.IntegerField(default=0)),
+                ('los_2', models.IntegerField(default=0)),
+                ('los_3', models.IntegerField(default=0)),
+                ('los_4', models.IntegerField(default=0)),
+                ('los_5', models.IntegerField(default=0)),
+                ('los_6', models.IntegerField(default=0)),
+                ('los_7_plus', models.IntegerField(default=0)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rentals.property')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'bucket'], name='booking_rollup_bucket_idx'), models.Index(fields=['granularity', 'area', 'bucket'], name='booking_rollup_area_idx'), models.Index(fields=['granularity', 'client_id', 'bucket'], name='booking_rollup_client_idx')],
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'bucket', 'property', 'platform'), name='booking_rollup_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Booking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(choices=[('airbnb', 'Airbnb'), ('booking', 'Booking.com'), ('vrbo', 'Vrbo'), ('direct', 'Direct')], default='direct', max_length=16)),
+                ('status', models.CharField(choices=[('confirmed', 'Confirmed'), ('cancelled', 'Cancelled')], default='confirmed', max_length=16)),
+                ('guest_name', models.CharField(blank=True, max_length=150)),
+                ('check_in', models.DateField()),
+                ('check_out', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='rentals.property')),
+            ],
+            options={
+                'constraints': [models.CheckConstraint(condition=models.Q(('check_out__gt', models.F('check_in'))), name='booking_checkout_after_checkin')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['property', 'check_in', 'check_out'], name='booking_property_stay_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['check_in', 'check_out'], name='booking_stay_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:12
+
+import django.db.models.deletion
+import rest_framework.utils.encoders
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0002_booking_stay_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('is_stale', models.BooleanField(default=False)),
+                ('as_of', models.DateField()),
+                ('payload', models.JSONField(encoder=rest_framework.utils.encoders.JSONEncoder)),
+                ('computed_at', models.DateTimeField()),
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='report_snapshot', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
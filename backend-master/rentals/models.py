@@ -0,0 +1,211 @@
+import re
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models
+from rest_framework.utils.encoders import JSONEncoder
+
+
+DEFAULT_MAX_STAY_NIGHTS = 365
+
+
+def max_stay_nights():
+    return getattr(settings, "RENTALS_MAX_STAY_NIGHTS", DEFAULT_MAX_STAY_NIGHTS)
+
+
+def area_key(name):
+    """Normalized area identifier used by filters and rollups ("Old Port" -> "oldport")."""
+    return re.sub(r"[^0-9a-z]+", "", (name or "").lower())
+
+
+class Property(models.Model):
+    name = models.CharField(max_length=150)
+    address = models.CharField(max_length=255, blank=True)
+    area = models.CharField(max_length=100)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="properties",
+    )
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "properties"
+
+    def __str__(self):
+        return f"{self.name} ({self.area})"
+
+
+class Booking(models.Model):
+    class Platforms(models.TextChoices):
+        AIRBNB = "airbnb", "Airbnb"
+        BOOKING = "booking", "Booking.com"
+        VRBO = "vrbo", "Vrbo"
+        DIRECT = "direct", "Direct"
+
+    class Statuses(models.TextChoices):
+        CONFIRMED = "confirmed", "Confirmed"
+        CANCELLED = "cancelled", "Cancelled"
+
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name="bookings")
+    platform = models.CharField(max_length=16, choices=Platforms.choices, default=Platforms.DIRECT)
+    status = models.CharField(max_length=16, choices=Statuses.choices, default=Statuses.CONFIRMED)
+    guest_name = models.CharField(max_length=150, blank=True)
+    check_in = models.DateField()
+    check_out = models.DateField()  # exclusive: the guest leaves that morning
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(condition=models.Q(check_out__gt=models.F("check_in")), name="booking_checkout_after_checkin"),
+        ]
+        indexes = [
+            # Window / overlap queries (see rentals.availability).
+            models.Index(fields=["property", "check_in", "check_out"], name="booking_property_stay_idx"),
+            models.Index(fields=["check_in", "check_out"], name="booking_stay_idx"),
+        ]
+
+    def __str__(self):
+        return f"Booking({self.property_id}, {self.check_in} -> {self.check_out})"
+
+    def clean(self):
+        if self.check_in and self.check_out:
+            self._check_stay()
+        if self.property_id and self.check_in and self.check_out and self.counts_towards_stats():
+            from .availability import find_conflicts
+
+            if find_conflicts(self.property_id, self.check_in, self.check_out, exclude=self.pk):
+                raise ValidationError("The property is already booked for some of these nights.")
+
+    def _check_stay(self):
+        if self.check_out <= self.check_in:
+            raise ValidationError({"check_out": "Check-out must be after check-in."})
+        if self.get_nights() > max_stay_nights():
+            raise ValidationError({"check_out": f"Stays are limited to {max_stay_nights()} nights."})
+
+    def save(self, *args, **kwargs):
+        # Overlap queries rely on the cap (see rentals.availability), whatever the write path.
+        self._check_stay()
+        super().save(*args, **kwargs)
+
+    # Plain methods: the ``property`` field shadows the builtin decorator here.
+    def get_nights(self):
+        return (self.check_out - self.check_in).days
+
+    def counts_towards_stats(self):
+        return self.status == self.Statuses.CONFIRMED
+
+
+class Expense(models.Model):
+    class Categories(models.TextChoices):
+        CLEANING = "cleaning", "Cleaning"
+        MAINTENANCE = "maintenance", "Maintenance"
+        SUPPLIES = "supplies", "Supplies"
+        PLATFORM_FEES = "platform_fees", "Platform Fees"
+        OVERHEAD = "overhead", "Overhead"
+
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name="expenses")
+    category = models.CharField(max_length=32, choices=Categories.choices)
+    subcategory = models.CharField(max_length=50, blank=True)  # e.g. HVAC, Plumbing for maintenance
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    incurred_on = models.DateField()
+    description = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Expense({self.category}, {self.amount} on {self.incurred_on})"
+
+
+class ReportSnapshot(models.Model):
+    """
+    Materialized portfolio report for one client (``/api/assessments/<id>/``).
+
+    Rebuilt lazily when marked stale by a write to the client's properties,
+    bookings or expenses, or when it was computed on an earlier day.
+    """
+    client = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="report_snapshot")
+    version = models.PositiveIntegerField(default=1)
+    is_stale = models.BooleanField(default=False)
+    as_of = models.DateField()
+    payload = models.JSONField(encoder=JSONEncoder)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"ReportSnapshot({self.client_id}, v{self.version})"
+
+    @property
+    def etag(self):
+        return f'"report-{self.client_id}-{self.version}"'
+
+
+# ---------- Pre-aggregated rollups (maintained by rentals.rollups) ----------
+class Granularity(models.TextChoices):
+    DAY = "D", "Day"
+    MONTH = "M", "Month"
+
+
+class BookingRollup(models.Model):
+    """
+    Booking totals for one property and platform over one day or month.
+
+    Revenue and nights are spread over the nights of a stay; booking counts and
+    the length-of-stay histogram are attributed to the check-in bucket.
+    """
+    granularity = models.CharField(max_length=1, choices=Granularity.choices)
+    bucket = models.DateField()
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name="+")
+    area = models.CharField(max_length=100)
+    client_id = models.BigIntegerField(null=True, blank=True)
+    platform = models.CharField(max_length=16, choices=Booking.Platforms.choices)
+
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    nights = models.IntegerField(default=0)
+    bookings = models.IntegerField(default=0)
+    los_1 = models.IntegerField(default=0)
+    los_2 = models.IntegerField(default=0)
+    los_3 = models.IntegerField(default=0)
+    los_4 = models.IntegerField(default=0)
+    los_5 = models.IntegerField(default=0)
+    los_6 = models.IntegerField(default=0)
+    los_7_plus = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["granularity", "bucket", "property", "platform"], name="booking_rollup_key"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["granularity", "bucket"], name="booking_rollup_bucket_idx"),
+            models.Index(fields=["granularity", "area", "bucket"], name="booking_rollup_area_idx"),
+            models.Index(fields=["granularity", "client_id", "bucket"], name="booking_rollup_client_idx"),
+        ]
+
+
+class ExpenseRollup(models.Model):
+    granularity = models.CharField(max_length=1, choices=Granularity.choices)
+    bucket = models.DateField()
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name="+")
+    area = models.CharField(max_length=100)
+    client_id = models.BigIntegerField(null=True, blank=True)
+    category = models.CharField(max_length=32, choices=Expense.Categories.choices)
+    subcategory = models.CharField(max_length=50, blank=True)
+
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["granularity", "bucket", "property", "category", "subcategory"], name="expense_rollup_key"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["granularity", "bucket"], name="expense_rollup_bucket_idx"),
+            models.Index(fields=["granularity", "area", "bucket"], name="expense_rollup_area_idx"),
+            models.Index(fields=["granularity", "client_id", "bucket"], name="expense_rollup_client_idx"),
+        ]
@@ -0,0 +1,102 @@
+"""
+Per-client portfolio reports, materialized into ``ReportSnapshot``.
+
+Reading a fresh snapshot is a single lookup on the client's unique key. Writes
+to a client's properties, bookings or expenses only set ``is_stale`` and bump
+the version with one ``UPDATE``; the report is recomputed (from rollups) on the
+next read and its version bumped again, which also changes the ETag.
+
+The recompute runs outside any transaction, so it is saved with a
+compare-and-set on the version read before computing: if a write marked the
+row stale meanwhile, the new payload is stored but the row stays stale and the
+next read computes it again.
+"""
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from . import analytics
+from .availability import overlapping
+from .models import Booking, Property, ReportSnapshot
+
+TEMPLATE_CODE = "PORTFOLIO"
+TEMPLATE_NAME = "Portfolio Performance"
+UPCOMING_LIMIT = 10
+UPCOMING_DAYS = 90
+
+
+def mark_stale(client_ids):
+    # Always bump the version, even if already stale: a recompute in progress
+    # must see that it missed this write.
+    ids = [pk for pk in set(client_ids) if pk is not None]
+    if ids:
+        ReportSnapshot.objects.filter(client_id__in=ids).update(is_stale=True, version=F("version") + 1)
+
+
+def mark_property_stale(property_id):
+    """Mark the owner's report stale without loading the property."""
+    ReportSnapshot.objects.filter(
+        client_id__in=Property.objects.filter(pk=property_id).values("owner_id")
+    ).update(is_stale=True, version=F("version") + 1)
+
+
+def compute(client, today):
+    filters = analytics.Filters(*analytics.resolve_range("last12", today), client_id=client.pk)
+    upcoming = overlapping(
+        Booking.objects.filter(property__owner=client, check_in__gte=today),
+        today,
+        today + timedelta(days=UPCOMING_DAYS),
+    ).select_related("property").order_by("check_in")[:UPCOMING_LIMIT]
+
+    return {
+        "period": {"start": filters.start, "end": filters.end - timedelta(days=1)},
+        "summary": analytics.summary(filters),
+        "monthly_revenue": analytics.monthly_revenue(filters),
+        "occupancy": analytics.occupancy_trend(filters),
+        "properties": analytics.property_performance(filters),
+        "upcoming_bookings": [
+            {
+                "id": b.id,
+                "property": b.property.name,
+                "platform": b.platform,
+                "check_in": b.check_in,
+                "check_out": b.check_out,
+                "nights": b.get_nights(),
+                "revenue": b.revenue,
+            }
+            for b in upcoming
+        ],
+    }
+
+
+def get_snapshot(client):
+    """Return a fresh snapshot for ``client``, recomputing it only if needed."""
+    today = timezone.localdate()
+    # A first read stores a stale placeholder, so a write made during the first
+    # compute also has a version to bump.
+    snapshot, _ = ReportSnapshot.objects.get_or_create(
+        client=client, defaults={"is_stale": True, "as_of": today, "payload": {}, "computed_at": timezone.now()},
+    )
+    if not snapshot.is_stale and snapshot.as_of == today:
+        return snapshot
+
+    read_version = snapshot.version
+    payload = compute(client, today)
+    values = {"version": F("version") + 1, "as_of": today, "payload": payload, "computed_at": timezone.now()}
+    if not ReportSnapshot.objects.filter(client=client, version=read_version).update(is_stale=False, **values):
+        # Invalidated while computing: keep the newer payload, still stale.
+        ReportSnapshot.objects.filter(client=client).update(is_stale=True, **values)
+    return ReportSnapshot.objects.get(client=client)
+
+
+def render(snapshot):
+    return {
+        "id": snapshot.client_id,
+        "template_code": TEMPLATE_CODE,
+        "template_name": TEMPLATE_NAME,
+        "status": "completed",
+        "version": snapshot.version,
+        "completed_at": snapshot.computed_at,
+        "metrics": snapshot.payload,
+    }
@@ -0,0 +1,210 @@
+"""
+Incremental maintenance of the booking and expense rollup tables.
+
+Every confirmed booking contributes to one daily and one monthly row per night
+it covers (revenue is spread evenly over the nights, to the cent) and adds one
+booking plus a length-of-stay count to its check-in day and month. Expenses
+contribute their amount to the day and month they were incurred.
+
+Writes apply the *difference* between the old and new contributions of a row
+with ``F()`` updates, so concurrent writers never lose increments. ``rebuild``
+recomputes everything for a set of properties from the raw tables.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Booking, BookingRollup, Expense, ExpenseRollup, Granularity, Property, area_key
+
+LOS_FIELDS = ["los_1", "los_2", "los_3", "los_4", "los_5", "los_6", "los_7_plus"]
+
+BOOKING_KEY = ("granularity", "bucket", "platform")
+EXPENSE_KEY = ("granularity", "bucket", "category", "subcategory")
+
+SUM_FIELDS = {
+    BookingRollup: ["revenue", "nights", "bookings", *LOS_FIELDS],
+    ExpenseRollup: ["amount", "count"],
+}
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def los_field(nights):
+    return LOS_FIELDS[min(nights, len(LOS_FIELDS)) - 1]
+
+
+def _spread(total, parts):
+    """Split ``total`` into ``parts`` amounts, to the cent, that add up exactly."""
+    cents = int((Decimal(total) * 100).to_integral_value())
+    base, remainder = divmod(cents, parts)
+    return [Decimal(base + (1 if i < remainder else 0)) / 100 for i in range(parts)]
+
+
+def _buckets(day):
+    return ((Granularity.DAY, day), (Granularity.MONTH, month_start(day)))
+
+
+def booking_contributions(booking):
+    """Return ``{(granularity, bucket, platform): {field: delta}}`` for one booking."""
+    contributions = defaultdict(lambda: defaultdict(int))
+    if booking is None or not booking.counts_towards_stats() or booking.get_nights() <= 0:
+        return contributions
+
+    nights = booking.get_nights()
+    for offset, amount in enumerate(_spread(booking.revenue, nights)):
+        for granularity, bucket in _buckets(booking.check_in + timedelta(days=offset)):
+            deltas = contributions[(granularity, bucket, booking.platform)]
+            deltas["revenue"] += amount
+            deltas["nights"] += 1
+
+    for granularity, bucket in _buckets(booking.check_in):
+        deltas = contributions[(granularity, bucket, booking.platform)]
+        deltas["bookings"] += 1
+        deltas[los_field(nights)] += 1
+
+    return contributions
+
+
+def expense_contributions(expense):
+    """Return ``{(granularity, bucket, category, subcategory): {field: delta}}`` for one expense."""
+    contributions = defaultdict(lambda: defaultdict(int))
+    if expense is None:
+        return contributions
+    for granularity, bucket in _buckets(expense.incurred_on):
+        deltas = contributions[(granularity, bucket, expense.category, expense.subcategory)]
+        deltas["amount"] += Decimal(expense.amount)
+        deltas["count"] += 1
+    return contributions
+
+
+def _net(old, new):
+    """Per-key ``new - old``, dropping keys whose deltas are all zero."""
+    net = defaultdict(lambda: defaultdict(int))
+    for key, deltas in new.items():
+        for field, value in deltas.items():
+            net[key][field] += value
+    for key, deltas in old.items():
+        for field, value in deltas.items():
+            net[key][field] -= value
+    return {key: {f: v for f, v in deltas.items() if v} for key, deltas in net.items() if any(deltas.values())}
+
+
+def _property_dims(property_id):
+    area, owner_id = Property.objects.filter(pk=property_id).values_list("area", "owner_id").get()
+    return {"area": area_key(area), "client_id": owner_id}
+
+
+def _apply(model, key_fields, property_id, net):
+    dims = None
+    for key, deltas in net.items():
+        lookup = dict(zip(key_fields, key), property_id=property_id)
+        updates = {field: F(field) + value for field, value in deltas.items()}
+        if model.objects.filter(**lookup).update(**updates):
+            if any(value < 0 for value in deltas.values()):
+                # Drop rows that no longer count anything.
+                model.objects.filter(**lookup, **{field: 0 for field in SUM_FIELDS[model]}).delete()
+            continue
+        if any(value < 0 for value in deltas.values()):
+            # Nothing to subtract from (e.g. the property is being deleted).
+            continue
+        if dims is None:
+            dims = _property_dims(property_id)
+        try:
+            with transaction.atomic():
+                model.objects.create(**lookup, **dims, **deltas)
+        except IntegrityError:
+            # Another writer created the row first; add to it instead.
+            model.objects.filter(**lookup).update(**updates)
+
+
+def _changed(model, key_fields, contributions, old, new):
+    with transaction.atomic():
+        if old is not None and new is not None and old.property_id == new.property_id:
+            _apply(model, key_fields, new.property_id, _net(contributions(old), contributions(new)))
+            return
+        if old is not None:
+            _apply(model, key_fields, old.property_id, _net(contributions(old), {}))
+        if new is not None:
+            _apply(model, key_fields, new.property_id, _net({}, contributions(new)))
+
+
+def booking_changed(old, new):
+    """Fold a booking insert (``old=None``), update or delete (``new=None``) into the rollups."""
+    _changed(BookingRollup, BOOKING_KEY, booking_contributions, old, new)
+
+
+def expense_changed(old, new):
+    """Fold an expense insert, update or delete into the rollups."""
+    _changed(ExpenseRollup, EXPENSE_KEY, expense_contributions, old, new)
+
+
+def _accumulate(rows, contributions):
+    totals = defaultdict(lambda: defaultdict(int))
+    for row in rows:
+        for key, deltas in contributions(row).items():
+            for field, value in deltas.items():
+                totals[key][field] += value
+    return totals
+
+
+def rebuild_property(prop, batch_size=2000):
+    """Recompute all rollups of one property from its bookings and expenses."""
+    dims = {"area": area_key(prop.area), "client_id": prop.owner_id}
+    bookings = Booking.objects.filter(property=prop).only(
+        "property_id", "platform", "status", "check_in", "check_out", "revenue"
+    )
+    expenses = Expense.objects.filter(property=prop).only(
+        "property_id", "category", "subcategory", "amount", "incurred_on"
+    )
+
+    with transaction.atomic():
+        BookingRollup.objects.filter(property=prop).delete()
+        ExpenseRollup.objects.filter(property=prop).delete()
+
+        totals = _accumulate(bookings.iterator(chunk_size=batch_size), booking_contributions)
+        BookingRollup.objects.bulk_create(
+            [
+                BookingRollup(property=prop, **dict(zip(BOOKING_KEY, key)), **dims, **deltas)
+                for key, deltas in totals.items()
+            ],
+            batch_size=batch_size,
+        )
+
+        totals = _accumulate(expenses.iterator(chunk_size=batch_size), expense_contributions)
+        ExpenseRollup.objects.bulk_create(
+            [
+                ExpenseRollup(property=prop, **dict(zip(EXPENSE_KEY, key)), **dims, **deltas)
+                for key, deltas in totals.items()
+            ],
+            batch_size=batch_size,
+        )
+
+
+def clear_clients(client_ids):
+    """
+    Un-assign the rollups of ``client_ids`` (their properties' owner was cleared
+    with one ``UPDATE``); the same as rebuilding those properties, in one
+    statement per table.
+    """
+    for model in (BookingRollup, ExpenseRollup):
+        model.objects.filter(client_id__in=list(client_ids)).update(client_id=None)
+
+
+def rebuild(property_ids=None, batch_size=2000):
+    """
+    Rebuild rollups for the given properties (all by default), one property per
+    transaction so memory stays bounded by a single property's buckets.
+    """
+    properties = Property.objects.order_by("id")
+    if property_ids is not None:
+        properties = properties.filter(id__in=property_ids)
+    count = 0
+    for prop in properties:
+        rebuild_property(prop, batch_size=batch_size)
+        count += 1
+    return count
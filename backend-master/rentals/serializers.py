@@ -0,0 +1,105 @@
+from datetime import date
+
+from django.db import transaction
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+from core.db import write_lock
+
+from .availability import find_conflicts
+from .models import Booking, Property, max_stay_nights
+
+
+class BookingConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The property is already booked for some of these nights."
+    default_code = "booking_conflict"
+
+
+# ---------- Query parameters ----------
+class DateRangeQuerySerializer(serializers.Serializer):
+    """
+    ``start`` and ``end`` (inclusive, both or neither) of a date-filtered view,
+    at most ``context["max_days"]`` days apart.
+    """
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        start, end = attrs.get("start"), attrs.get("end")
+        if start is None and end is None:
+            return attrs
+        if start is None or end is None or end < start:
+            raise serializers.ValidationError({"detail": "start and end must be dates with start <= end."})
+        max_days = self.context["max_days"]
+        if (end - start).days >= max_days:
+            raise serializers.ValidationError({"detail": f"Ranges are limited to {max_days} days."})
+        if end == date.max:
+            raise serializers.ValidationError({"end": "Date out of range."})
+        return attrs
+
+
+class MonthQuerySerializer(serializers.Serializer):
+    month = serializers.DateField(input_formats=["%Y-%m"])
+
+    def validate_month(self, value):
+        if (value.year, value.month) == (date.max.year, date.max.month):
+            raise serializers.ValidationError("Month out of range.")
+        return value
+
+
+# ---------- Bookings ----------
+class BookingSerializer(serializers.ModelSerializer):
+    nights = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Booking
+        fields = [
+            "id",
+            "property",
+            "platform",
+            "status",
+            "guest_name",
+            "check_in",
+            "check_out",
+            "nights",
+            "revenue",
+        ]
+
+    def get_nights(self, obj):
+        return obj.get_nights()
+
+    def validate(self, attrs):
+        check_in = attrs.get("check_in", getattr(self.instance, "check_in", None))
+        check_out = attrs.get("check_out", getattr(self.instance, "check_out", None))
+        if check_in and check_out:
+            if check_out <= check_in:
+                raise serializers.ValidationError({"check_out": "Check-out must be after check-in."})
+            if (check_out - check_in).days > max_stay_nights():
+                raise serializers.ValidationError({"check_out": f"Stays are limited to {max_stay_nights()} nights."})
+        return attrs
+
+    def check_conflicts(self, validated_data):
+        def value(name, default=None):
+            return validated_data.get(name, getattr(self.instance, name, default))
+
+        if value("status", Booking.Statuses.CONFIRMED) != Booking.Statuses.CONFIRMED:
+            return
+        # Lock the property (the database on SQLite) so two requests can't both pass the check.
+        write_lock(Booking)
+        prop = Property.objects.select_for_update().get(pk=value("property").pk)
+        conflicts = find_conflicts(
+            prop.pk, value("check_in"), value("check_out"), exclude=getattr(self.instance, "pk", None)
+        )
+        if conflicts:
+            raise BookingConflict({"detail": BookingConflict.default_detail, "conflicts": conflicts})
+
+    @transaction.atomic
+    def create(self, validated_data):
+        self.check_conflicts(validated_data)
+        return super().create(validated_data)
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        self.check_conflicts(validated_data)
+        return super().update(instance, validated_data)
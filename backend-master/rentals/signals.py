@@ -0,0 +1,102 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from accounts import versioning
+from accounts.signals import users_bulk_deleted
+
+from . import analytics, reports, rollups
+from .models import Booking, Expense, Property
+
+
+def _stash_previous(instance):
+    # The row as currently stored, so post_save can subtract what it contributed.
+    previous = None
+    if instance.pk is not None:
+        previous = type(instance)._base_manager.filter(pk=instance.pk).first()
+    instance._rollup_previous = previous
+
+
+@receiver(pre_save, sender=Booking, dispatch_uid="rentals.booking.stash")
+@receiver(pre_save, sender=Expense, dispatch_uid="rentals.expense.stash")
+def stash_previous(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _stash_previous(instance)
+
+
+@receiver(post_save, sender=Booking, dispatch_uid="rentals.booking.rollup_save")
+def booking_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        rollups.booking_changed(getattr(instance, "_rollup_previous", None), instance)
+
+
+@receiver(post_delete, sender=Booking, dispatch_uid="rentals.booking.rollup_delete")
+def booking_deleted(sender, instance, **kwargs):
+    rollups.booking_changed(instance, None)
+
+
+@receiver(post_save, sender=Expense, dispatch_uid="rentals.expense.rollup_save")
+def expense_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        rollups.expense_changed(getattr(instance, "_rollup_previous", None), instance)
+
+
+@receiver(post_delete, sender=Expense, dispatch_uid="rentals.expense.rollup_delete")
+def expense_deleted(sender, instance, **kwargs):
+    rollups.expense_changed(instance, None)
+
+
+@receiver(pre_save, sender=Property, dispatch_uid="rentals.property.stash")
+def property_stash(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _stash_previous(instance)
+
+
+@receiver(post_save, sender=Property, dispatch_uid="rentals.property.rekey")
+def property_saved(sender, instance, created, raw=False, **kwargs):
+    # Rollup rows carry the property's area and owner; re-key them if those moved.
+    previous = getattr(instance, "_rollup_previous", None)
+    if raw or created or previous is None:
+        return
+    if previous.area != instance.area or previous.owner_id != instance.owner_id:
+        rollups.rebuild_property(instance)
+
+
+@receiver(users_bulk_deleted, dispatch_uid="rentals.owners.bulk_delete")
+def owners_deleted(sender, ids, **kwargs):
+    # Their properties' owner was cleared without signals; their report
+    # snapshots were deleted with them.
+    rollups.clear_clients(ids)
+    versioning.bump(analytics.CACHE_TAG)
+
+
+@receiver(post_save, sender=Booking, dispatch_uid="rentals.booking.report_save")
+@receiver(post_delete, sender=Booking, dispatch_uid="rentals.booking.report_delete")
+@receiver(post_save, sender=Expense, dispatch_uid="rentals.expense.report_save")
+@receiver(post_delete, sender=Expense, dispatch_uid="rentals.expense.report_delete")
+def invalidate_report(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_rollup_previous", None)
+    reports.mark_property_stale(instance.property_id)
+    if previous is not None and previous.property_id != instance.property_id:
+        reports.mark_property_stale(previous.property_id)
+
+
+@receiver(post_save, sender=Property, dispatch_uid="rentals.property.report_save")
+@receiver(post_delete, sender=Property, dispatch_uid="rentals.property.report_delete")
+def invalidate_property_report(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_rollup_previous", None)
+    reports.mark_stale([instance.owner_id, previous.owner_id if previous else None])
+
+
+@receiver(post_save, sender=Booking, dispatch_uid="rentals.booking.analytics_save")
+@receiver(post_delete, sender=Booking, dispatch_uid="rentals.booking.analytics_delete")
+@receiver(post_save, sender=Expense, dispatch_uid="rentals.expense.analytics_save")
+@receiver(post_delete, sender=Expense, dispatch_uid="rentals.expense.analytics_delete")
+@receiver(post_save, sender=Property, dispatch_uid="rentals.property.analytics_save")
+@receiver(post_delete, sender=Property, dispatch_uid="rentals.property.analytics_delete")
+def invalidate_cached_analytics(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versioning.bump(analytics.CACHE_TAG)
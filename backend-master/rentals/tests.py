@@ -0,0 +1,337 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts import bulk, versioning
+from core.response_cache import response_cache
+
+from . import analytics, reports, rollups
+from .availability import SortedRun, find_conflicts
+from .models import Booking, BookingRollup, Expense, ExpenseRollup, Granularity, Property, ReportSnapshot
+from .serializers import BookingConflict, BookingSerializer
+
+User = get_user_model()
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def booking_rows(prop):
+    return sorted(
+        BookingRollup.objects.filter(property=prop).values_list(
+            "granularity", "bucket", "platform", "area", "client_id", "revenue", "nights", "bookings"
+        )
+    )
+
+
+def expense_rows(prop):
+    return sorted(
+        ExpenseRollup.objects.filter(property=prop).values_list(
+            "granularity", "bucket", "category", "area", "client_id", "amount", "count"
+        )
+    )
+
+
+class RollupSignalTests(TestCase):
+    def setUp(self):
+        response_cache.clear()
+        self.owner = User.objects.create_user(email="owner@example.com", role=User.Roles.CLIENT)
+        self.prop = Property.objects.create(name="Sea view", area="Old Port", owner=self.owner)
+
+    def month(self, day):
+        return BookingRollup.objects.get(
+            property=self.prop, granularity=Granularity.MONTH, bucket=day.replace(day=1)
+        )
+
+    def test_booking_spreads_revenue_over_its_nights(self):
+        # Three nights across a month boundary: 100.00 splits as 33.34 + 33.33 + 33.33.
+        Booking.objects.create(
+            property=self.prop, check_in=date(2025, 1, 30), check_out=date(2025, 2, 2), revenue=Decimal("100")
+        )
+        days = BookingRollup.objects.filter(property=self.prop, granularity=Granularity.DAY).order_by("bucket")
+        self.assertEqual([row.revenue for row in days], [Decimal("33.34"), Decimal("33.33"), Decimal("33.33")])
+        january, february = self.month(date(2025, 1, 1)), self.month(date(2025, 2, 1))
+        self.assertEqual((january.nights, january.bookings, january.los_3), (2, 1, 1))
+        self.assertEqual((february.nights, february.bookings), (1, 0))
+        self.assertEqual((january.area, january.client_id), ("oldport", self.owner.pk))
+
+    def test_updates_and_deletes_apply_the_difference(self):
+        booking = Booking.objects.create(
+            property=self.prop, check_in=date(2025, 3, 1), check_out=date(2025, 3, 3), revenue=Decimal("200")
+        )
+        booking.revenue = Decimal("300")
+        booking.platform = Booking.Platforms.AIRBNB
+        booking.save()
+        self.assertEqual(
+            list(BookingRollup.objects.filter(property=self.prop).values_list("platform", flat=True).distinct()),
+            [Booking.Platforms.AIRBNB],
+        )
+        self.assertEqual(self.month(date(2025, 3, 1)).revenue, Decimal("300"))
+
+        booking.status = Booking.Statuses.CANCELLED
+        booking.save()
+        self.assertEqual(booking_rows(self.prop), [])
+
+        booking.status = Booking.Statuses.CONFIRMED
+        booking.save()
+        booking.delete()
+        self.assertEqual(booking_rows(self.prop), [])
+
+    def test_expenses(self):
+        expense = Expense.objects.create(
+            property=self.prop, category=Expense.Categories.CLEANING, amount=Decimal("40"), incurred_on=date(2025, 4, 9)
+        )
+        Expense.objects.create(
+            property=self.prop, category=Expense.Categories.CLEANING, amount=Decimal("10"), incurred_on=date(2025, 4, 20)
+        )
+        month = ExpenseRollup.objects.get(property=self.prop, granularity=Granularity.MONTH)
+        self.assertEqual((month.amount, month.count), (Decimal("50"), 2))
+        expense.delete()
+        month.refresh_from_db()
+        self.assertEqual((month.amount, month.count), (Decimal("10"), 1))
+
+    def test_moving_a_property_rekeys_its_rollups(self):
+        Booking.objects.create(property=self.prop, check_in=date(2025, 5, 1), check_out=date(2025, 5, 2), revenue=50)
+        other = User.objects.create_user(email="other@example.com")
+        self.prop.area = "Medina"
+        self.prop.owner = other
+        self.prop.save()
+        self.assertEqual(
+            set(BookingRollup.objects.filter(property=self.prop).values_list("area", "client_id")),
+            {("medina", other.pk)},
+        )
+
+    def test_rebuild_matches_incremental_maintenance(self):
+        Booking.objects.create(property=self.prop, check_in=date(2025, 6, 28), check_out=date(2025, 7, 3), revenue=99)
+        edited = Booking.objects.create(
+            property=self.prop, check_in=date(2025, 7, 10), check_out=date(2025, 7, 12), revenue=10
+        )
+        edited.check_out = date(2025, 7, 20)
+        edited.save()
+        Expense.objects.create(
+            property=self.prop, category=Expense.Categories.SUPPLIES, amount=Decimal("7.5"), incurred_on=date(2025, 7, 1)
+        )
+        incremental = booking_rows(self.prop), expense_rows(self.prop)
+        rollups.rebuild([self.prop.pk])
+        self.assertEqual((booking_rows(self.prop), expense_rows(self.prop)), incremental)
+
+
+class AnalyticsViewTests(TestCase):
+    def setUp(self):
+        response_cache.clear()
+        self.admin = User.objects.create_user(email="admin@example.com", role=User.Roles.ADMIN)
+        self.owner = User.objects.create_user(email="owner@example.com", role=User.Roles.CLIENT)
+        other = User.objects.create_user(email="other@example.com")
+        mine = Property.objects.create(name="Mine", area="Old Port", owner=self.owner)
+        theirs = Property.objects.create(name="Theirs", area="Medina", owner=other)
+        Booking.objects.create(property=mine, check_in=date(2025, 1, 10), check_out=date(2025, 1, 12), revenue=200)
+        Booking.objects.create(property=theirs, check_in=date(2025, 1, 10), check_out=date(2025, 1, 11), revenue=80)
+        Expense.objects.create(
+            property=mine, category=Expense.Categories.CLEANING, amount=Decimal("50"), incurred_on=date(2025, 1, 12)
+        )
+
+    def summary(self, user, query=""):
+        return client_for(user).get(f"/api/analytics/summary/?start=2025-01-01&end=2025-01-31{query}")
+
+    def test_summary_filters(self):
+        results = self.summary(self.admin).json()["results"]
+        self.assertEqual((Decimal(results["revenue"]), results["nights"], results["bookings"]), (Decimal("280"), 3, 2))
+        results = self.summary(self.admin, "&area=medina").json()["results"]
+        self.assertEqual(Decimal(results["revenue"]), Decimal("80"))
+
+    def test_clients_only_see_their_own_figures(self):
+        results = self.summary(self.owner, "&client=all").json()["results"]
+        self.assertEqual((Decimal(results["revenue"]), Decimal(results["costs"])), (Decimal("200"), Decimal("50")))
+
+    def test_invalid_filters(self):
+        client = client_for(self.admin)
+        for query in ("start=2025-02-01&end=2025-01-01", "start=2025-01-01", "range=decade", "client=abc",
+                      "start=2000-01-01&end=2025-01-01"):
+            with self.subTest(query=query):
+                self.assertEqual(client.get(f"/api/analytics/summary/?{query}").status_code, 400)
+
+
+class SortedRunTests(TestCase):
+    def test_overlaps_with_a_long_earlier_interval(self):
+        # The 1st-20th stay hides behind shorter ones that start later.
+        run = SortedRun([
+            (date(2025, 1, 1), date(2025, 1, 20), 1),
+            (date(2025, 1, 2), date(2025, 1, 3), 2),
+            (date(2025, 1, 5), date(2025, 1, 6), 3),
+        ])
+        self.assertTrue(run.has_overlap(date(2025, 1, 10), date(2025, 1, 11)))
+        self.assertEqual([pk for *_, pk in run.overlaps(date(2025, 1, 10), date(2025, 1, 11))], [1])
+        self.assertEqual(run.occupied_nights(date(2025, 1, 1), date(2025, 2, 1)), 19)
+
+    def test_check_out_day_is_free(self):
+        run = SortedRun([(date(2025, 1, 1), date(2025, 1, 5), 1)])
+        self.assertFalse(run.has_overlap(date(2025, 1, 5), date(2025, 1, 8)))
+        self.assertFalse(run.has_overlap(date(2024, 12, 28), date(2025, 1, 1)))
+
+
+class BookingConflictTests(TestCase):
+    def setUp(self):
+        response_cache.clear()
+        self.admin = User.objects.create_user(email="admin@example.com", role=User.Roles.ADMIN)
+        self.prop = Property.objects.create(name="Sea view", area="Old Port")
+        self.booking = Booking.objects.create(property=self.prop, check_in=date(2025, 3, 10), check_out=date(2025, 3, 15))
+
+    def post(self, check_in, check_out, **extra):
+        body = {"property": self.prop.pk, "check_in": check_in, "check_out": check_out, **extra}
+        return client_for(self.admin).post("/api/bookings/", body, format="json")
+
+    def test_create_rejects_overlaps_with_409(self):
+        response = self.post("2025-03-14", "2025-03-16")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["conflicts"], [str(self.booking.pk)])
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_back_to_back_and_cancelled_bookings_are_allowed(self):
+        self.assertEqual(self.post("2025-03-15", "2025-03-18").status_code, 201)
+        self.assertEqual(self.post("2025-03-11", "2025-03-12", status="cancelled").status_code, 201)
+
+    def test_update_excludes_itself_but_not_others(self):
+        later = Booking.objects.create(property=self.prop, check_in=date(2025, 3, 20), check_out=date(2025, 3, 22))
+        serializer = BookingSerializer(self.booking, data={"check_out": "2025-03-17"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        serializer = BookingSerializer(later, data={"check_in": "2025-03-16"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(BookingConflict):
+            serializer.save()
+
+    def test_model_clean_detects_overlaps(self):
+        with self.assertRaises(ValidationError):
+            Booking(property=self.prop, check_in=date(2025, 3, 1), check_out=date(2025, 3, 11)).full_clean()
+        self.assertEqual(find_conflicts(self.prop.pk, date(2025, 3, 1), date(2025, 3, 11)), [self.booking.pk])
+
+    @override_settings(RENTALS_MAX_STAY_NIGHTS=30)
+    def test_stays_are_capped_on_every_write_path(self):
+        response = self.post("2025-05-01", "2025-06-15")
+        self.assertEqual(response.status_code, 400)
+        with self.assertRaises(ValidationError):
+            Booking.objects.create(property=self.prop, check_in=date(2025, 5, 1), check_out=date(2025, 6, 15))
+
+    def test_calendar(self):
+        Booking.objects.create(property=self.prop, check_in=date(2025, 2, 27), check_out=date(2025, 3, 2))
+        empty = Property.objects.create(name="Empty", area="Medina")
+        client = client_for(self.admin)
+        with self.assertNumQueries(2):
+            results = client.get("/api/bookings/calendar/?month=2025-03").json()["results"]
+        rows = {row["id"]: row for row in results}
+        self.assertEqual(rows[self.prop.pk]["booked_nights"], 6)
+        self.assertEqual(rows[empty.pk]["bookings"], [])
+        self.assertEqual(client.get("/api/bookings/calendar/?month=2025-13").status_code, 400)
+
+
+class ReportSnapshotTests(TestCase):
+    def setUp(self):
+        response_cache.clear()
+        self.owner = User.objects.create_user(email="owner@example.com", role=User.Roles.CLIENT)
+        self.prop = Property.objects.create(name="Sea view", area="Old Port", owner=self.owner)
+        self.soon = timezone.localdate() + timedelta(days=5)
+        self.book(0)
+
+    def book(self, offset):
+        check_in = self.soon + timedelta(days=offset * 3)
+        return Booking.objects.create(
+            property=self.prop, check_in=check_in, check_out=check_in + timedelta(days=2), revenue=200
+        )
+
+    def upcoming(self, snapshot):
+        return len(snapshot.payload["upcoming_bookings"])
+
+    def test_fresh_snapshot_is_not_recomputed(self):
+        first = reports.get_snapshot(self.owner)
+        self.assertEqual((self.upcoming(first), first.is_stale), (1, False))
+        with mock.patch.object(reports, "compute") as compute, self.assertNumQueries(1):
+            again = reports.get_snapshot(self.owner)
+        compute.assert_not_called()
+        self.assertEqual(again.version, first.version)
+
+    def test_stale_snapshot_is_recomputed_with_a_new_etag(self):
+        client = client_for(self.owner)
+        url = f"/api/assessments/{self.owner.pk}/"
+        first = client.get(url)
+        self.assertEqual(len(first.json()["metrics"]["upcoming_bookings"]), 1)
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+
+        self.book(1)
+        self.assertTrue(ReportSnapshot.objects.get(client=self.owner).is_stale)
+        second = client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second["ETag"], first["ETag"])
+        self.assertEqual(len(second.json()["metrics"]["upcoming_bookings"]), 2)
+        self.assertFalse(ReportSnapshot.objects.get(client=self.owner).is_stale)
+
+    def compute_then_book(self, offset):
+        # The write lands after compute() read its data but before the save.
+        real = reports.compute
+
+        def compute(client, today):
+            payload = real(client, today)
+            self.book(offset)
+            return payload
+        return mock.patch.object(reports, "compute", side_effect=compute)
+
+    def assert_invalidation_kept(self, expected_upcoming):
+        with self.compute_then_book(5):
+            raced = reports.get_snapshot(self.owner)
+        self.assertTrue(raced.is_stale)
+        self.assertEqual(self.upcoming(raced), expected_upcoming)
+
+        fresh = reports.get_snapshot(self.owner)
+        self.assertFalse(fresh.is_stale)
+        self.assertEqual(self.upcoming(fresh), expected_upcoming + 1)
+        self.assertGreater(fresh.version, raced.version)
+
+    def test_invalidation_during_first_compute_is_kept(self):
+        self.assert_invalidation_kept(1)
+
+    def test_invalidation_during_recompute_is_kept(self):
+        reports.get_snapshot(self.owner)
+        self.book(1)  # Already stale when the write below arrives.
+        self.assert_invalidation_kept(2)
+
+    def test_mark_stale_bumps_the_version(self):
+        snapshot = reports.get_snapshot(self.owner)
+        reports.mark_stale([self.owner.pk])
+        reports.mark_property_stale(self.prop.pk)
+        stored = ReportSnapshot.objects.get(client=self.owner)
+        self.assertEqual((stored.is_stale, stored.version), (True, snapshot.version + 2))
+
+
+class OwnerDeletionTests(TestCase):
+    def setUp(self):
+        response_cache.clear()
+        self.owner = User.objects.create_user(email="owner@example.com", role=User.Roles.CLIENT)
+        self.prop = Property.objects.create(name="Sea view", area="Old Port", owner=self.owner)
+        Booking.objects.create(property=self.prop, check_in=date(2025, 1, 10), check_out=date(2025, 1, 12), revenue=200)
+        Expense.objects.create(
+            property=self.prop, category=Expense.Categories.CLEANING, amount=Decimal("50"), incurred_on=date(2025, 1, 12)
+        )
+        reports.get_snapshot(self.owner)
+
+    def test_bulk_delete_unassigns_properties_and_rollups(self):
+        (before,), _ = versioning.current(analytics.CACHE_TAG)
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk.delete_users([self.owner.pk])
+        self.prop.refresh_from_db()
+        self.assertIsNone(self.prop.owner_id)
+        self.assertFalse(ReportSnapshot.objects.exists())
+        for model in (BookingRollup, ExpenseRollup):
+            self.assertEqual(set(model.objects.values_list("client_id", flat=True)), {None})
+        # The same rollups a rebuild gives.
+        incremental = booking_rows(self.prop), expense_rows(self.prop)
+        rollups.rebuild([self.prop.pk])
+        self.assertEqual((booking_rows(self.prop), expense_rows(self.prop)), incremental)
+        self.assertGreater(versioning.current(analytics.CACHE_TAG)[0][0], before)
@@ -0,0 +1,25 @@
+from django.urls import path
+
+from . import analytics
+from .views import AnalyticsView, AssessmentReportView, BookingCalendarView, BookingListCreateView
+
+urlpatterns = [
+    # Bookings / scheduling
+    path("bookings/", BookingListCreateView.as_view(), name="booking-list"),
+    path("bookings/calendar/", BookingCalendarView.as_view(), name="booking-calendar"),
+
+    # Client reports (materialized snapshots)
+    path("assessments/<int:pk>/", AssessmentReportView.as_view(), name="assessment-report"),
+
+    # Dashboard analytics (served from rollups)
+    path("analytics/summary/", AnalyticsView.as_view(metric=analytics.summary), name="analytics-summary"),
+    path("analytics/revenue/monthly/", AnalyticsView.as_view(metric=analytics.monthly_revenue), name="analytics-revenue-monthly"),
+    path("analytics/revenue/by-area/", AnalyticsView.as_view(metric=analytics.revenue_by_area), name="analytics-revenue-area"),
+    path("analytics/revenue/by-client/", AnalyticsView.as_view(metric=analytics.revenue_by_client), name="analytics-revenue-client"),
+    path("analytics/revenue/by-platform/", AnalyticsView.as_view(metric=analytics.revenue_by_platform), name="analytics-revenue-platform"),
+    path("analytics/occupancy/", AnalyticsView.as_view(metric=analytics.occupancy_trend), name="analytics-occupancy"),
+    path("analytics/costs/", AnalyticsView.as_view(metric=analytics.cost_breakdown), name="analytics-costs"),
+    path("analytics/maintenance/", AnalyticsView.as_view(metric=analytics.maintenance), name="analytics-maintenance"),
+    path("analytics/length-of-stay/", AnalyticsView.as_view(metric=analytics.length_of_stay), name="analytics-length-of-stay"),
+    path("analytics/properties/", AnalyticsView.as_view(metric=analytics.property_performance), name="analytics-properties"),
+]
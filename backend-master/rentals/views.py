@@ -0,0 +1,208 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from accounts import versioning
+from accounts.versioning import ConditionalGetMixin
+from accounts.views import IsAdmin, permission_scope
+from core.response_cache import cache_response
+from . import analytics, reports
+from .availability import BookingCalendar, overlapping
+from .models import Booking, Property, area_key
+from .serializers import BookingSerializer, DateRangeQuerySerializer, MonthQuerySerializer
+
+User = get_user_model()
+
+MAX_WINDOW_DAYS = 366
+# Custom analytics ranges; monthly series have one entry per month of the range.
+MAX_RANGE_DAYS = 10 * 366
+
+
+def is_admin(request, view):
+    return IsAdmin().has_permission(request, view)
+
+
+def analytics_scope(request):
+    # Named ranges (ytd, mtd, ...) move with the date.
+    return f"{permission_scope(request)}|{timezone.localdate()}"
+
+
+def parse_range(params, max_days):
+    """Validated ``?start=&end=`` (inclusive) as ``(start, end_exclusive)``, or ``None`` if absent."""
+    data = {name: params[name] for name in ("start", "end") if params.get(name)}
+    serializer = DateRangeQuerySerializer(data=data, context={"max_days": max_days})
+    serializer.is_valid(raise_exception=True)
+    if not serializer.validated_data:
+        return None
+    return serializer.validated_data["start"], serializer.validated_data["end"] + timedelta(days=1)
+
+
+def parse_id(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({name: "Expected an id or 'all'."})
+
+
+class AnalyticsView(ConditionalGetMixin, APIView):
+    """
+    Serves one ``rentals.analytics`` metric, filtered by the dashboard controls:
+
+    * ``range``: ``mtd`` / ``ytd`` (default) / ``q1``-``q4`` / ``last12``, or
+      explicit ``start`` and ``end`` dates (inclusive, ``YYYY-MM-DD``, at most
+      ``MAX_RANGE_DAYS`` apart)
+    * ``area``: area key (e.g. ``oldport``) or ``all``
+    * ``client``: client user id or ``all``; clients only ever see their own data
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    metric = None
+
+    def get_filters(self, request):
+        params = request.query_params
+        today = timezone.localdate()
+
+        explicit = parse_range(params, MAX_RANGE_DAYS)
+        if explicit:
+            start, end = explicit
+        else:
+            name = params.get("range", "ytd").lower()
+            if name not in analytics.DATE_RANGES:
+                raise ValidationError({"range": f"Expected one of {', '.join(analytics.DATE_RANGES)}."})
+            start, end = analytics.resolve_range(name, today)
+
+        area = area_key(params.get("area", "all"))
+        client = params.get("client", "all")
+        client_id = None if client in ("", "all") else parse_id(client, "client")
+
+        if not is_admin(request, self):
+            client_id = request.user.id
+
+        return analytics.Filters(
+            start=start,
+            end=end,
+            area=None if area in ("", "all") else area,
+            client_id=client_id,
+        )
+
+    def get_version_keys(self, request):
+        return [analytics.CACHE_TAG, versioning.USERS]
+
+    def get_version_scope(self, request):
+        # Clients get their own figures for the same URL.
+        return f"{analytics_scope(request)}|{request.get_full_path()}"
+
+    @cache_response("analytics", scope=analytics_scope)
+    def get(self, request):
+        filters = self.get_filters(request)
+        return Response({
+            "start": filters.start,
+            "end": filters.end - timedelta(days=1),
+            "results": self.metric(filters),
+        })
+
+
+def parse_window(params, today):
+    """``?month=YYYY-MM`` or ``?start=&end=`` (inclusive) -> ``(start, end_exclusive)``."""
+    explicit = parse_range(params, MAX_WINDOW_DAYS)
+    if explicit:
+        return explicit
+    first = analytics.month_start(today)
+    if params.get("month"):
+        serializer = MonthQuerySerializer(data={"month": params["month"]})
+        serializer.is_valid(raise_exception=True)
+        first = serializer.validated_data["month"]
+    return first, analytics.add_months(first, 1)
+
+
+class BookingListCreateView(generics.ListCreateAPIView):
+    """
+    GET lists confirmed bookings overlapping a window (``month`` or ``start``/``end``,
+    optional ``property``); POST creates a booking after a double-booking check (409 on conflict).
+    """
+    serializer_class = BookingSerializer
+
+    def get_permissions(self):
+        if self.request.method == "POST":
+            return [permissions.IsAuthenticated(), IsAdmin()]
+        return [permissions.IsAuthenticated()]
+
+    def get_queryset(self):
+        start, end = parse_window(self.request.query_params, timezone.localdate())
+        qs = Booking.objects.all()
+        if not is_admin(self.request, self):
+            qs = qs.filter(property__owner=self.request.user)
+        prop = self.request.query_params.get("property")
+        if prop:
+            qs = qs.filter(property_id=parse_id(prop, "property"))
+        return overlapping(qs, start, end).order_by("property_id", "check_in")
+
+
+class BookingCalendarView(APIView):
+    """
+    Occupancy grid for a window across many properties, answered with two
+    queries (properties, bookings) whatever the number of properties.
+    Filters: ``month`` or ``start``/``end``, ``area``, ``client``.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        start, end = parse_window(params, timezone.localdate())
+
+        props = Property.objects.filter(is_active=True).order_by("id")
+        if not is_admin(request, self):
+            props = props.filter(owner=request.user)
+        elif params.get("client", "all") != "all":
+            props = props.filter(owner_id=parse_id(params["client"], "client"))
+        props = list(props.values("id", "name", "area"))
+
+        area = area_key(params.get("area", "all"))
+        if area not in ("", "all"):
+            props = [p for p in props if area_key(p["area"]) == area]
+
+        calendar = BookingCalendar(start, end, property_ids=[p["id"] for p in props])
+        results = []
+        for prop in props:
+            nights, occupancy = calendar.occupancy(prop["id"])
+            results.append({
+                **prop,
+                "booked_nights": nights,
+                "occupancy": occupancy,
+                "bookings": [
+                    {"id": pk, "check_in": check_in, "check_out": check_out}
+                    for check_in, check_out, pk in calendar.run(prop["id"]).intervals
+                ],
+            })
+
+        return Response({"start": start, "end": end - timedelta(days=1), "results": results})
+
+
+class AssessmentReportView(APIView):
+    """
+    Portfolio report of one client, served from its materialized snapshot.
+
+    Clients may only read their own report. Supports ``If-None-Match``.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        if pk != request.user.id and not is_admin(request, self):
+            raise PermissionDenied()
+        client = request.user if pk == request.user.id else get_object_or_404(User, pk=pk)
+
+        snapshot = reports.get_snapshot(client)
+        etag = snapshot.etag
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(reports.render(snapshot))
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
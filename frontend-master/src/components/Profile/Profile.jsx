@@ -34,6 +34,7 @@ const Profile = () => {
           date_of_birth: data.date_of_birth || "",
           marital_status: data.marital_status || "Not set",
           nationality: data.nationality || "Not set",
+          rowVersion: data.row_version,
         };
 
         setProfileData(formattedData);
@@ -75,6 +76,7 @@ const Profile = () => {
         date_of_birth: editData.date_of_birth,
         marital_status: editData.marital_status,
         nationality: editData.nationality,
+        row_version: profileData.rowVersion,
       };
 
       const { data } = await axios.patch(`${API_BASE}/api/auth/me/`, body, {
@@ -98,10 +100,17 @@ const Profile = () => {
         date_of_birth: data.date_of_birth || "",
         marital_status: data.marital_status || "Not set",
         nationality: data.nationality || "Not set",
+        rowVersion: data.row_version,
       });
 
       setIsEditing(false);
     } catch (error) {
+      if (error.response?.status === 409) {
+        // Changed elsewhere since it was loaded: keep the edits, retry against the current version.
+        setProfileData((prev) => ({ ...prev, rowVersion: error.response.data.current.row_version }));
+        alert("Your profile was changed elsewhere. Review your edits and save again.");
+        return;
+      }
       console.error("Error saving profile:", error);
     }
   };